@@ -0,0 +1,94 @@
+"""Simulate clients retrying after a 429 with each backoff strategy.
+
+Run with `python -m benchmarks.backoff`.
+
+All clients hit the server at the same moment. The server answers at most
+`--capacity` requests per second and rejects the rest, which retry with a delay
+from the strategy. A rejected request is a collision; the less the retries of
+different clients coincide, the fewer collisions and the sooner all are done.
+"""
+
+from __future__ import annotations
+
+import argparse
+import heapq
+import math
+import random
+from collections import Counter
+
+from scrapy_extensions.backoff import BACKOFF_STRATEGIES
+
+
+def simulate(  # noqa: PLR0913
+    strategy: str,
+    *,
+    clients: int,
+    capacity: int,
+    base: float,
+    cap: float,
+    seed: int,
+) -> dict[str, float]:
+    """Requests, collision rate and completion time of one simulation."""
+
+    backoff = BACKOFF_STRATEGIES[strategy]
+    rng = random.Random(seed)  # noqa: S311
+    # (time, client, attempt, previous delay) of each pending request
+    pending = [(0.0, client, 0, base) for client in range(clients)]
+    heapq.heapify(pending)
+    served: Counter[int] = Counter()
+    requests = collisions = 0
+    finished = 0.0
+
+    while pending:
+        time, client, attempt, previous = heapq.heappop(pending)
+        requests += 1
+        second = math.floor(time)
+        if served[second] < capacity:
+            served[second] += 1
+            finished = time
+            continue
+
+        collisions += 1
+        delay = backoff(attempt, previous, base, cap, rng)
+        heapq.heappush(pending, (time + delay, client, attempt + 1, delay))
+
+    return {
+        "requests": requests,
+        "collision_rate": collisions / requests,
+        "finished": finished,
+    }
+
+
+def main() -> None:
+    """Print the simulation results for each strategy."""
+
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.backoff")
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--capacity", type=int, default=20)
+    parser.add_argument("--base", type=float, default=1)
+    parser.add_argument("--cap", type=float, default=60)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(
+        f"{args.clients} clients, {args.capacity} requests/second, "
+        f"delay {args.base}s to {args.cap}s",
+    )
+    print(f"{'strategy':<20} {'requests':>9} {'collisions':>11} {'finished':>9}")
+    for strategy in BACKOFF_STRATEGIES:
+        result = simulate(
+            strategy,
+            clients=args.clients,
+            capacity=args.capacity,
+            base=args.base,
+            cap=args.cap,
+            seed=args.seed,
+        )
+        print(
+            f"{strategy:<20} {result['requests']:>9.0f} "
+            f"{result['collision_rate']:>10.1%} {result['finished']:>8.1f}s",
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Simulate `NicerAutoThrottle` against a server limiting concurrent requests.
+
+Run with `python -m benchmarks.concurrency`.
+
+The server works on up to `--capacity` requests at once, each taking
+`--service-time` seconds; up to as many again wait for a free worker, and any
+more are answered with a 429 right away. A slot starts with a concurrency of
+`--concurrency`, sends requests `slot.delay` seconds apart while it has fewer in
+flight, and the throttle adjusts the slot after every response. The
+simulation compares throttling the delay only with `AUTOTHROTTLE_CONCURRENCY`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import heapq
+from http import HTTPStatus
+from typing import Any
+
+from scrapy.core.downloader import Slot
+
+from benchmarks.throttle import make_throttle, slot_response
+
+# Latency of a request rejected by the server
+REJECT_LATENCY = 0.01
+
+
+def simulate(
+    settings: dict[str, Any],
+    *,
+    capacity: int,
+    service_time: float,
+    concurrency: int,
+    duration: float,
+) -> dict[str, float]:
+    """Throughput, throttled responses and mean in-flight requests of a crawl."""
+
+    throttle = make_throttle(
+        {
+            "AUTOTHROTTLE_START_DELAY": 0,
+            "AUTOTHROTTLE_TARGET_CONCURRENCY": concurrency,
+            **settings,
+        },
+    )
+    slot = Slot(concurrency=concurrency, delay=0)
+    # (time the response arrives, its status, its latency)
+    responses: list[tuple[float, int, float]] = []
+    last_send = -1.0
+    now = ok = throttled = 0.0
+    in_flight_time = 0.0
+
+    while now < duration:
+        next_send = max(last_send + slot.delay, now)
+        if len(responses) >= slot.concurrency or (
+            responses and responses[0][0] <= next_send
+        ):
+            time, status, latency = heapq.heappop(responses)
+            in_flight_time += (time - now) * (len(responses) + 1)
+            now = time
+            throttle._adjust_delay(slot, latency, slot_response(status))  # noqa: SLF001
+            ok += status == HTTPStatus.OK
+            throttled += status == HTTPStatus.TOO_MANY_REQUESTS
+            continue
+
+        in_flight_time += (next_send - now) * len(responses)
+        now = last_send = next_send
+        # Requests beyond the workers queue behind the ones in progress
+        load = sum(status == HTTPStatus.OK for _, status, _ in responses)
+        if load >= 2 * capacity:
+            status, latency = HTTPStatus.TOO_MANY_REQUESTS, REJECT_LATENCY
+        else:
+            status, latency = HTTPStatus.OK, service_time * (1 + load // capacity)
+        heapq.heappush(responses, (now + latency, status, latency))
+
+    return {
+        "throughput": ok / now,
+        "throttled": throttled,
+        "in_flight": in_flight_time / now,
+        "concurrency": slot.concurrency,
+        "delay": slot.delay,
+    }
+
+
+def main() -> None:
+    """Print the results of the simulation for both throttling modes."""
+
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.concurrency")
+    parser.add_argument("--capacity", type=int, default=4)
+    parser.add_argument("--service-time", type=float, default=0.2)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=300)
+    args = parser.parse_args()
+
+    print(
+        f"Server works on {args.capacity} requests at once, "
+        f"{args.service_time}s each (at most "
+        f"{args.capacity / args.service_time:.0f} requests/second)",
+    )
+    print(
+        f"{'mode':<12} {'requests/s':>10} {'429s':>6} {'in flight':>9} "
+        f"{'final concurrency':>17} {'final delay':>11}",
+    )
+    for name, settings in (
+        ("delay", {}),
+        ("concurrency", {"AUTOTHROTTLE_CONCURRENCY": True}),
+    ):
+        result = simulate(
+            settings,
+            capacity=args.capacity,
+            service_time=args.service_time,
+            concurrency=args.concurrency,
+            duration=args.duration,
+        )
+        print(
+            f"{name:<12} {result['throughput']:>10.2f} {result['throttled']:>6.0f} "
+            f"{result['in_flight']:>9.1f} {result['concurrency']:>17} "
+            f"{result['delay']:>10.2f}s",
+        )
+
+
+if __name__ == "__main__":
+    main()
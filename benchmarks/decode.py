@@ -0,0 +1,50 @@
+"""Benchmark reduced-resolution decoding in `calculate_blurhash`.
+
+Run with `python -m benchmarks.decode`.
+"""
+
+from __future__ import annotations
+
+import io
+import timeit
+
+from benchmarks.images import FORMATS, synthetic_image
+from scrapy_extensions.utils import calculate_blurhash
+
+SIZES = ((640, 480), (1920, 1080), (4000, 3000))
+REPEAT = 5
+
+
+def best_time(data: bytes, *, draft: bool) -> float:
+    """Best of `REPEAT` runs of `calculate_blurhash` on the encoded image."""
+
+    return min(
+        timeit.repeat(
+            lambda: calculate_blurhash(io.BytesIO(data), draft=draft),
+            number=1,
+            repeat=REPEAT,
+        ),
+    )
+
+
+def main() -> None:
+    """Print full vs. reduced decoding times per format and size."""
+
+    # JIT-compile the encoder before timing anything
+    calculate_blurhash(io.BytesIO(synthetic_image((64, 64), "PNG")))
+
+    print(f"{'format':<6} {'size':>10} {'full':>9} {'reduced':>9} {'speedup':>8}")
+    for fmt in FORMATS:
+        for size in SIZES:
+            data = synthetic_image(size, fmt)
+            full = best_time(data, draft=False)
+            reduced = best_time(data, draft=True)
+            print(
+                f"{fmt:<6} {size[0]:>5}x{size[1]:<4} "
+                f"{1000 * full:>7.1f}ms {1000 * reduced:>7.1f}ms "
+                f"{full / reduced:>7.1f}x",
+            )
+
+
+if __name__ == "__main__":
+    main()
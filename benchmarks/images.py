@@ -0,0 +1,56 @@
+"""Synthetic images for the benchmarks."""
+
+from __future__ import annotations
+
+import hashlib
+import io
+from typing import TYPE_CHECKING
+
+import numpy as np
+from PIL import Image
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+FORMATS = ("JPEG", "PNG", "WEBP")
+EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp"}
+
+
+def synthetic_image(size: tuple[int, int], fmt: str, seed: int = 0) -> bytes:
+    """Encode a smooth random test image of the given size and format."""
+
+    rng = np.random.default_rng(seed)
+    width, height = size
+    coarse = rng.integers(0, 256, (height // 64 + 2, width // 64 + 2, 3), np.uint8)
+    image = Image.fromarray(coarse).resize(size, Image.Resampling.BICUBIC)
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+def synthetic_store(
+    images_store: Path,
+    count: int,
+    size: tuple[int, int] = (800, 600),
+    fmt: str = "JPEG",
+) -> list[dict[str, str]]:
+    """Write `count` distinct images to `images_store/full` and return the
+    result dicts `ImagesPipeline` would have produced for them.
+    """
+
+    (images_store / "full").mkdir(parents=True, exist_ok=True)
+    image_objs = []
+    for seed in range(count):
+        data = synthetic_image(size, fmt, seed=seed)
+        checksum = hashlib.md5(data).hexdigest()  # noqa: S324
+        path = f"full/{checksum}.{EXTENSIONS[fmt]}"
+        (images_store / path).write_bytes(data)
+        image_objs.append(
+            {
+                "url": f"https://example.com/{seed}",
+                "path": path,
+                "checksum": checksum,
+                "status": "downloaded",
+            },
+        )
+    return image_objs
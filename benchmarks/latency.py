@@ -0,0 +1,98 @@
+"""How much single slow responses swing the delay of `NicerAutoThrottle`.
+
+Run with `python -m benchmarks.latency`.
+
+Feeds a slot responses with log-normally distributed latencies, a few of them
+ten times slower, and reports the resulting delays: with AutoThrottle's
+formula, which follows every sample, and with `AUTOTHROTTLE_TARGET_RATE`, which
+uses a quantile of the recent latencies.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+from typing import Any
+
+from scrapy.core.downloader import Slot
+
+from benchmarks.throttle import make_throttle, slot_response
+
+
+def simulate(
+    settings: dict[str, Any],
+    *,
+    responses: int,
+    median_latency: float,
+    seed: int,
+) -> dict[str, float]:
+    """Statistics of the delays of a slot after each response."""
+
+    throttle = make_throttle(
+        {"AUTOTHROTTLE_START_DELAY": 0, "AUTOTHROTTLE_TARGET_CONCURRENCY": 4}
+        | settings,
+    )
+    rng = random.Random(seed)  # noqa: S311
+    slot = Slot(concurrency=8, delay=0)
+    response = slot_response(200)
+    delays = []
+    for _ in range(responses):
+        latency = rng.lognormvariate(0, 0.3) * median_latency
+        if rng.random() < 0.02:  # noqa: PLR2004
+            latency *= 10
+        throttle._adjust_delay(slot, latency, response)  # noqa: SLF001
+        delays.append(slot.delay)
+
+    delays.sort()
+    return {
+        "mean": statistics.fmean(delays),
+        "stdev": statistics.stdev(delays),
+        "p99": delays[int(0.99 * len(delays))],
+        "max": delays[-1],
+    }
+
+
+def main() -> None:
+    """Print the delay statistics for each mode."""
+
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.latency")
+    parser.add_argument("--responses", type=int, default=5000)
+    parser.add_argument("--median-latency", type=float, default=0.4)
+    parser.add_argument("--target-rate", type=float, default=8)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(
+        f"{args.responses} responses, median latency {args.median_latency}s, "
+        f"2% ten times slower; target concurrency 4",
+    )
+    print(f"{'mode':<24} {'mean':>7} {'stdev':>7} {'p99':>7} {'max':>7}")
+    for name, settings in (
+        ("latency sample", {}),
+        (
+            f"{args.target_rate}/s, p50",
+            {"AUTOTHROTTLE_TARGET_RATE": args.target_rate},
+        ),
+        (
+            f"{args.target_rate}/s, p95",
+            {
+                "AUTOTHROTTLE_TARGET_RATE": args.target_rate,
+                "AUTOTHROTTLE_LATENCY_QUANTILE": 0.95,
+            },
+        ),
+    ):
+        result = simulate(
+            settings,
+            responses=args.responses,
+            median_latency=args.median_latency,
+            seed=args.seed,
+        )
+        print(
+            f"{name:<24} {result['mean']:>6.3f}s {result['stdev']:>6.3f}s "
+            f"{result['p99']:>6.3f}s {result['max']:>6.3f}s",
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""Memory and time of `DelayedRetryMiddleware` when a site answers with 429s.
+
+Run with `python -m benchmarks.retry_memory`.
+
+A local server answers the first request for every URL with a 429 and a large
+body, and every retry with a 200. The crawl runs once with the delayed request
+queue and once sleeping in `process_response` (`DELAYED_RETRY_QUEUE = False`),
+each in a fresh process, since the reactor can't be restarted. Memory is the
+peak resident set size of that process, including the server's threads.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING, Any, ClassVar
+
+import scrapy
+from scrapy.crawler import CrawlerProcess
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator
+
+    from scrapy.http import Response
+
+
+class _Handler(BaseHTTPRequestHandler):
+    body_size: ClassVar[int] = 0
+    seen: ClassVar[set[str]] = set()
+    lock: ClassVar[threading.Lock] = threading.Lock()
+
+    def do_GET(self) -> None:
+        with self.lock:
+            first = self.path not in self.seen
+            self.seen.add(self.path)
+        body = b"x" * self.body_size if first else b"ok"
+        self.send_response(429 if first else 200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+
+class _Spider(scrapy.Spider):
+    name = "retry_memory"
+    base_url: str
+    urls: int
+
+    async def start(self) -> AsyncIterator[scrapy.Request]:
+        for i in range(self.urls):
+            yield scrapy.Request(f"{self.base_url}/{i}")
+
+    def parse(self, response: Response) -> None:
+        pass
+
+
+def crawl(*, queue: bool, urls: int, body_size: int, delay: float) -> dict[str, Any]:
+    """Crawl `urls` pages that first answer with a 429, return time and memory."""
+
+    _Handler.body_size = body_size
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    process = CrawlerProcess(
+        settings={
+            "TWISTED_REACTOR": "twisted.internet.asyncioreactor.AsyncioSelectorReactor",
+            "LOG_LEVEL": "ERROR",
+            "CONCURRENT_REQUESTS": 256,
+            "CONCURRENT_REQUESTS_PER_DOMAIN": 256,
+            "DOWNLOADER_MIDDLEWARES": {
+                "scrapy.downloadermiddlewares.retry.RetryMiddleware": None,
+                "scrapy_extensions.DelayedRetryMiddleware": 555,
+            },
+            "DELAYED_RETRY_HTTP_CODES": [429],
+            "DELAYED_RETRY_DELAY": delay,
+            "DELAYED_RETRY_QUEUE": queue,
+            "TELNETCONSOLE_ENABLED": False,
+        },
+    )
+    crawler = process.create_crawler(_Spider)
+
+    start = time.monotonic()
+    process.crawl(
+        crawler,
+        base_url=f"http://127.0.0.1:{server.server_port}",
+        urls=urls,
+    )
+    process.start()
+    seconds = time.monotonic() - start
+    server.shutdown()
+
+    assert crawler.stats is not None
+    return {
+        "seconds": seconds,
+        # Maximum resident set size of the process, in KiB on Linux
+        "peak_bytes": 1024 * resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "responses": crawler.stats.get_value("response_received_count", 0),
+        "retries": crawler.stats.get_value("retry/count", 0),
+        "queued": crawler.stats.get_value("delayed_retry/queued", 0),
+        "released": crawler.stats.get_value("delayed_retry/released", 0),
+        "queue_max": crawler.stats.get_value("delayed_retry/queue_max", 0),
+    }
+
+
+def main() -> None:
+    """Run the crawl in a subprocess per mode and print the results."""
+
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.retry_memory")
+    parser.add_argument("--urls", type=int, default=2000)
+    parser.add_argument("--body-size", type=int, default=64 * 1024)
+    parser.add_argument("--delay", type=float, default=2)
+    parser.add_argument("--queue", choices=("on", "off"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.queue:
+        result = crawl(
+            queue=args.queue == "on",
+            urls=args.urls,
+            body_size=args.body_size,
+            delay=args.delay,
+        )
+        print(json.dumps(result))
+        return
+
+    print(
+        f"{args.urls} URLs answering 429 with {args.body_size // 1024} KiB "
+        f"first, retried after {args.delay}s",
+    )
+    print(
+        f"{'mode':<6} {'time':>8} {'peak memory':>12} {'responses':>10} {'queued':>7}",
+    )
+    for queue in ("on", "off"):
+        output = subprocess.run(  # noqa: S603
+            [
+                sys.executable,
+                "-m",
+                "benchmarks.retry_memory",
+                *sys.argv[1:],
+                "--queue",
+                queue,
+            ],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        result = json.loads(output.splitlines()[-1])
+        print(
+            f"{'queue' if queue == 'on' else 'sleep':<6} "
+            f"{result['seconds']:>7.1f}s {result['peak_bytes'] / 2**20:>10.1f}MiB "
+            f"{result['responses']:>10} {result['queue_max']:>7}",
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""Simulate several crawler processes throttling requests to the same server.
+
+Run with `python -m benchmarks.shared_throttle`.
+
+`--processes` `NicerAutoThrottle`s send requests to one slot of a server that
+admits `--capacity` requests per second in total and answers the rest with a
+429. Each process starts at `AUTOTHROTTLE_START_DELAY`, so together they
+overshoot at first. The throttles either learn on their own, or share their
+backoffs through an SQLite file (with a connection per throttle, as separate
+processes would have) or a stand-in for Redis.
+"""
+
+from __future__ import annotations
+
+import argparse
+import heapq
+import math
+import tempfile
+import time
+from http import HTTPStatus
+from pathlib import Path
+from typing import Any, ClassVar
+from unittest.mock import patch
+
+from scrapy.core.downloader import Slot
+
+from benchmarks.throttle import Clock, make_throttle, slot_response
+from scrapy_extensions import extensions
+from scrapy_extensions.throttlestate import RedisThrottleState
+
+
+class _RedisStandIn:
+    """The `get` and `set` commands of Redis, without expiry."""
+
+    def __init__(self) -> None:
+        self.values: dict[str, str] = {}
+
+    def get(self, name: str) -> str | None:
+        return self.values.get(name)
+
+    def set(self, name: str, value: str, ex: int | None = None) -> None:  # noqa: ARG002
+        self.values[name] = value
+
+
+class _StandInThrottleState(RedisThrottleState):
+    """`RedisThrottleState` with a stand-in per URI instead of a Redis server."""
+
+    clients: ClassVar[dict[str, _RedisStandIn]] = {}
+
+    @classmethod
+    def from_uri(cls, uri: str, ttl: float = 60) -> RedisThrottleState:
+        return cls(client=cls.clients.setdefault(uri, _RedisStandIn()), ttl=ttl)
+
+
+def simulate(
+    settings: dict[str, Any],
+    *,
+    processes: int,
+    capacity: float,
+    latency: float,
+    duration: float,
+) -> dict[str, float]:
+    """Successful and throttled responses of all processes in one simulation."""
+
+    # The throttles compare the time of backoffs with when requests were sent
+    clock = Clock(time.time())
+    start = clock.now
+    with patch.object(extensions, "time", clock):
+        throttles = [
+            make_throttle({"AUTOTHROTTLE_START_DELAY": 0.5, **settings})
+            for _ in range(processes)
+        ]
+        slots = [
+            Slot(concurrency=8, delay=throttle._start_delay())  # noqa: SLF001
+            for throttle in throttles
+        ]
+        last_sent = [-math.inf] * processes
+        # Token bucket of the server, holding one second's worth of requests
+        tokens, last = capacity, 0.0
+        # (time, process, status of a response or -1 for sending a request)
+        events = [(0.0, process, -1) for process in range(processes)]
+        heapq.heapify(events)
+        ok = throttled = 0
+
+        while events:
+            now, process, status = heapq.heappop(events)
+            clock.now = start + now
+            slot = slots[process]
+            if status >= 0:
+                throttles[process]._adjust_delay(  # noqa: SLF001
+                    slot,
+                    latency,
+                    slot_response(status),
+                )
+                throttled += status == HTTPStatus.TOO_MANY_REQUESTS
+                ok += status == HTTPStatus.OK
+                continue
+
+            # Like Scrapy's downloader, wait for the slot's current delay
+            ready = last_sent[process] + slot.delay
+            if now < ready:
+                heapq.heappush(events, (ready, process, -1))
+                continue
+            last_sent[process] = now
+
+            tokens = min(capacity, tokens + (now - last) * capacity)
+            last = now
+            status = HTTPStatus.OK if tokens >= 1 else HTTPStatus.TOO_MANY_REQUESTS
+            tokens -= status == HTTPStatus.OK
+            heapq.heappush(events, (now + latency, process, status))
+            if now + slot.delay < duration:
+                heapq.heappush(events, (now + slot.delay, process, -1))
+
+    for throttle in throttles:
+        if throttle.shared_state is not None:
+            throttle.shared_state.close()
+
+    return {"throttled": throttled, "throughput": ok / duration}
+
+
+def main() -> None:
+    """Print the results of the simulation with and without shared state."""
+
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.shared_throttle")
+    parser.add_argument("--processes", type=int, default=16)
+    parser.add_argument("--capacity", type=float, default=8)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--duration", type=float, default=300)
+    args = parser.parse_args()
+
+    print(
+        f"{args.processes} processes, server admits {args.capacity} "
+        f"requests/second in total; latency {args.latency}s",
+    )
+    print(f"{'state':<12} {'429s':>6} {'requests/second':>16}")
+    with tempfile.TemporaryDirectory() as directory:
+        for name, settings in (
+            ("independent", {}),
+            (
+                "sqlite",
+                {"AUTOTHROTTLE_SHARED_STATE": str(Path(directory, "throttle.db"))},
+            ),
+            (
+                "redis",
+                {
+                    "AUTOTHROTTLE_SHARED_STATE": "redis://localhost",
+                    "AUTOTHROTTLE_SHARED_STATE_BACKEND": _StandInThrottleState,
+                },
+            ),
+        ):
+            result = simulate(
+                settings,
+                processes=args.processes,
+                capacity=args.capacity,
+                latency=args.latency,
+                duration=args.duration,
+            )
+            print(
+                f"{name:<12} {result['throttled']:>6.0f} {result['throughput']:>16.2f}",
+            )
+
+
+if __name__ == "__main__":
+    main()
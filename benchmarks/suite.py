@@ -0,0 +1,244 @@
+"""Benchmark suite for `calculate_blurhash` and `BlurHashPipeline`.
+
+Run from the repository root::
+
+    python -m benchmarks.suite                       # print results
+    python -m benchmarks.suite --save baseline.json  # store a new baseline
+    python -m benchmarks.suite --compare benchmarks/baseline.json
+
+When comparing, benchmarks that are more than `--tolerance` slower than the
+baseline (or need that much more memory) are reported and the exit code is 1.
+Timings are the best of several runs, memory is the peak traced by
+`tracemalloc` during a single run.
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import platform
+import sys
+import tempfile
+import timeit
+import tracemalloc
+from functools import partial
+from itertools import count
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, cast
+
+import numpy as np
+import PIL
+
+from benchmarks.images import FORMATS, synthetic_image, synthetic_store
+from scrapy_extensions.pipelines import BlurHashPipeline, _calculate_blurhash
+from scrapy_extensions.utils import BlurHashCache, calculate_blurhash
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator
+
+    from scrapy.statscollectors import StatsCollector
+
+SIZES = ((320, 240), (1920, 1080), (4000, 3000))
+ITEM_SIZES = (1, 10, 100)
+REPEAT = 5
+
+
+class _Stats(dict[str, int]):
+    def inc_value(self, key: str, count: int = 1) -> None:
+        self[key] = self.get(key, 0) + count
+
+
+def _calculate_blurhash_bytes(*, data: bytes, float32: bool) -> str:
+    return calculate_blurhash(io.BytesIO(data), float32=float32)
+
+
+def _process_item(pipeline: BlurHashPipeline, image_objs: list[dict[str, str]]) -> None:
+    item = {"images": [image_obj.copy() for image_obj in image_objs]}
+    pipeline.process_item(item, None)  # type: ignore[arg-type]
+
+
+def _close(pipelines: list[BlurHashPipeline]) -> None:
+    while pipelines:
+        pipelines.pop()._close()  # noqa: SLF001
+
+
+def measure(
+    func: Callable[[], object],
+    setup: Callable[[], object] | None = None,
+    repeat: int = REPEAT,
+) -> dict[str, float]:
+    """Best time of `repeat` runs and peak memory of one run of `func`."""
+
+    def timed() -> float:
+        if setup is not None:
+            setup()
+        return timeit.timeit(func, number=1)
+
+    seconds = min(timed() for _ in range(repeat))
+
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {"seconds": seconds, "peak_bytes": peak_bytes}
+
+
+def bench_calculate_blurhash() -> Iterator[tuple[str, dict[str, float]]]:
+    """`calculate_blurhash` for each format and size, numba and float32."""
+
+    for fmt in FORMATS:
+        for size in SIZES:
+            data = synthetic_image(size, fmt)
+            for float32 in (False, True):
+                name = (
+                    f"calculate_blurhash[{fmt}-{size[0]}x{size[1]}-"
+                    f"{'float32' if float32 else 'numba'}]"
+                )
+                func = partial(
+                    _calculate_blurhash_bytes,
+                    data=data,
+                    float32=float32,
+                )
+                yield name, measure(func)
+
+
+def bench_pipeline(tmp_dir: Path) -> Iterator[tuple[str, dict[str, float]]]:
+    """`BlurHashPipeline.process_item` for items with 1 to 100 images."""
+
+    image_objs = synthetic_store(tmp_dir, max(ITEM_SIZES))
+    for batch_size, mode in ((0, "single"), (8, "batch")):
+        pipeline = BlurHashPipeline(
+            images_store=tmp_dir,
+            source_field="images",
+            target_field="images",
+            batch_size=batch_size,
+        )
+        for images_count in ITEM_SIZES:
+            func = partial(_process_item, pipeline, image_objs[:images_count])
+            yield (
+                f"process_item[{images_count}-images-{mode}]",
+                measure(func, setup=_calculate_blurhash.cache_clear),
+            )
+
+
+def bench_cache(tmp_dir: Path) -> Iterator[tuple[str, dict[str, float]]]:
+    """`BlurHashPipeline.process_item` with a persistent cache."""
+
+    image_objs = synthetic_store(tmp_dir, max(ITEM_SIZES))
+    pipelines: list[BlurHashPipeline] = []
+    cache_ids = count()
+
+    def new_pipeline() -> None:
+        # Start every run with an empty cache and a cold in-memory cache
+        _close(pipelines)
+        _calculate_blurhash.cache_clear()
+        cache_path = tmp_dir / f"cache-{next(cache_ids)}.db"
+        pipelines.append(
+            BlurHashPipeline(
+                images_store=tmp_dir,
+                source_field="images",
+                target_field="images",
+                cache=BlurHashCache(cache_path),
+                stats=cast("StatsCollector", _Stats()),
+            ),
+        )
+
+    def process_item() -> None:
+        _process_item(pipelines[0], image_objs)
+
+    yield (
+        f"process_item[{len(image_objs)}-images-cache-miss]",
+        measure(process_item, setup=new_pipeline),
+    )
+
+    new_pipeline()
+    process_item()
+    yield (
+        f"process_item[{len(image_objs)}-images-cache-hit]",
+        measure(process_item, setup=_calculate_blurhash.cache_clear),
+    )
+
+    _close(pipelines)
+
+
+def run() -> dict[str, Any]:
+    """Run all benchmarks and return the results."""
+
+    # Compile the numba encoder before timing anything
+    calculate_blurhash(io.BytesIO(synthetic_image((64, 64), "PNG")))
+
+    results: dict[str, dict[str, float]] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for benchmarks in (
+            bench_calculate_blurhash(),
+            bench_pipeline(Path(tmp, "pipeline")),
+            bench_cache(Path(tmp, "cache")),
+        ):
+            for name, result in benchmarks:
+                results[name] = result
+                print(
+                    f"{name:<50} {1000 * result['seconds']:>9.2f}ms "
+                    f"{result['peak_bytes'] / 2**20:>8.1f}MiB",
+                    file=sys.stderr,
+                )
+
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "numpy": np.__version__,
+            "pillow": PIL.__version__,
+        },
+        "results": results,
+    }
+
+
+def compare(
+    results: dict[str, Any],
+    baseline: dict[str, Any],
+    tolerance: float,
+) -> list[str]:
+    """Names and details of the benchmarks that regressed against the baseline."""
+
+    return [
+        f"{name}: {metric} {result[metric]:.4g} vs. "
+        f"{base[metric]:.4g} ({result[metric] / base[metric]:.2f}x)"
+        for name, result in results["results"].items()
+        if (base := baseline["results"].get(name)) is not None
+        for metric in ("seconds", "peak_bytes")
+        if base[metric] and result[metric] > (1 + tolerance) * base[metric]
+    ]
+
+
+def main() -> None:
+    """Command line entry point."""
+
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.suite")
+    parser.add_argument("--save", type=Path, help="write results to this file")
+    parser.add_argument("--compare", type=Path, help="baseline to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    results = run()
+
+    if args.save:
+        args.save.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Simulate `NicerAutoThrottle` against a rate-limited server.
+
+Run with `python -m benchmarks.throttle`.
+
+The server admits `--capacity` requests per second (a token bucket holding one
+second's worth) and answers the rest with a 429; during the outage its capacity
+drops to a fifth. Requests to a single slot are sent `slot.delay` seconds
+apart and answered after `--latency` seconds, which is when the throttle
+adjusts the delay. The simulation compares recovery by AutoThrottle's latency
+formula (`AUTOTHROTTLE_RECOVERY_RESPONSES = 0`) with the AIMD recovery.
+"""
+
+from __future__ import annotations
+
+import argparse
+import heapq
+from http import HTTPStatus
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, Any, cast
+
+from scrapy.core.downloader import Slot
+from scrapy.http import Request, Response
+from scrapy.utils.test import get_crawler
+
+from scrapy_extensions.extensions import NicerAutoThrottle
+
+if TYPE_CHECKING:
+    from scrapy.core.engine import ExecutionEngine
+
+OUTAGE = (60.0, 75.0)
+
+
+class _Server:
+    def __init__(self, capacity: float) -> None:
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last = 0.0
+
+    def admit(self, now: float) -> bool:
+        capacity = self.capacity / 5 if OUTAGE[0] <= now < OUTAGE[1] else self.capacity
+        self.tokens = min(
+            max(capacity, 1),
+            self.tokens + (now - self.last) * capacity,
+        )
+        self.last = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class Clock:
+    """The simulated time, for `time.time` and `time.monotonic`."""
+
+    def __init__(self, now: float) -> None:
+        self.now = now
+
+    def time(self) -> float:
+        """The simulated UNIX time."""
+        return self.now
+
+    def monotonic(self) -> float:
+        """The simulated time, also as the monotonic clock."""
+        return self.now
+
+
+def make_throttle(settings: dict[str, Any]) -> NicerAutoThrottle:
+    """`NicerAutoThrottle` as after `spider_opened`, with a single slot `slot`."""
+
+    crawler = get_crawler(
+        settings_dict={
+            "AUTOTHROTTLE_ENABLED": True,
+            "AUTOTHROTTLE_HTTP_CODES": [429],
+            "AUTOTHROTTLE_MAX_DELAY": 10,
+            **settings,
+        },
+    )
+    # Just enough of an engine for the throttle to find the slot
+    crawler.engine = cast(
+        "ExecutionEngine",
+        SimpleNamespace(
+            downloader=SimpleNamespace(slots={"slot": None}, per_slot_settings={}),
+        ),
+    )
+    throttle = NicerAutoThrottle.from_crawler(crawler)
+    throttle.mindelay = throttle._min_delay()  # noqa: SLF001
+    throttle.maxdelay = throttle._max_delay()  # noqa: SLF001
+    return throttle
+
+
+def slot_response(status: int, key: str = "slot") -> Response:
+    """A response to a request in the slot `key`."""
+
+    request = Request("https://example.com", meta={"download_slot": key})
+    return Response(request.url, status=status, request=request)
+
+
+def simulate(
+    settings: dict[str, Any],
+    *,
+    capacity: float,
+    latency: float,
+    duration: float,
+) -> dict[str, float]:
+    """Successful and throttled responses of one simulated crawl."""
+
+    throttle = make_throttle(settings)
+    server = _Server(capacity)
+    slot = Slot(concurrency=8, delay=throttle._start_delay())  # noqa: SLF001
+    responses: list[tuple[float, int]] = []
+    next_send = 0.0
+    ok_after_outage = throttled = 0
+
+    while next_send < duration or responses:
+        if responses and (responses[0][0] <= next_send or next_send >= duration):
+            now, status = heapq.heappop(responses)
+            throttle._adjust_delay(slot, latency, slot_response(status))  # noqa: SLF001
+            throttled += status == HTTPStatus.TOO_MANY_REQUESTS
+            ok_after_outage += status == HTTPStatus.OK and now >= OUTAGE[1]
+            continue
+
+        status = 200 if server.admit(next_send) else 429
+        heapq.heappush(responses, (next_send + latency, status))
+        next_send += max(slot.delay, 0.001)
+
+    return {
+        "throttled": throttled,
+        "throughput": ok_after_outage / (duration - OUTAGE[1]),
+    }
+
+
+def main() -> None:
+    """Print the results of the simulation for both recovery modes."""
+
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.throttle")
+    parser.add_argument("--capacity", type=float, default=4)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--duration", type=float, default=300)
+    args = parser.parse_args()
+
+    print(
+        f"Server admits {args.capacity} requests/second, a fifth during "
+        f"{OUTAGE[0]:.0f}s-{OUTAGE[1]:.0f}s; latency {args.latency}s",
+    )
+    print(f"{'recovery':<10} {'429s':>6} {'requests/second after outage':>29}")
+    for name, settings in (
+        ("latency", {"AUTOTHROTTLE_RECOVERY_RESPONSES": 0}),
+        ("aimd", {}),
+    ):
+        result = simulate(
+            settings,
+            capacity=args.capacity,
+            latency=args.latency,
+            duration=args.duration,
+        )
+        print(
+            f"{name:<10} {result['throttled']:>6.0f} {result['throughput']:>29.2f}",
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""Simulate a crawl that starts from the throttle snapshot of an earlier one.
+
+Run with `python -m benchmarks.warm_start`.
+
+`--domains` servers each admit between 0.5 and 4 requests per second (a token
+bucket holding one second's worth) and answer the rest with a 429. A first crawl
+of `--duration` seconds starts every slot at `AUTOTHROTTLE_START_DELAY` and
+saves the learned delays to an `AUTOTHROTTLE_SNAPSHOT`. The next crawl starts
+from that snapshot, taken a while ago, and is compared with starting cold. The
+429s in the last minute are those AIMD causes anyway once it has settled.
+"""
+
+from __future__ import annotations
+
+import argparse
+import heapq
+import random
+import tempfile
+import time
+from functools import partial
+from http import HTTPStatus
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, cast
+from unittest.mock import patch
+
+from scrapy.core.downloader import Slot
+
+from benchmarks.throttle import Clock, make_throttle, slot_response
+from scrapy_extensions import extensions
+
+if TYPE_CHECKING:
+    from scrapy import Spider
+
+HOUR = 3600
+# Responses are counted in the first and the last minute of a crawl
+WINDOW = 60.0
+
+
+def crawl(
+    settings: dict[str, Any],
+    *,
+    clock: Clock,
+    capacities: list[float],
+    latency: float,
+    duration: float,
+) -> dict[str, float]:
+    """Crawl each domain for `duration` seconds, count responses in the windows."""
+
+    start = clock.now
+    throttle = make_throttle(settings)
+    downloader = throttle.crawler.engine.downloader
+    throttle._spider_opened(cast("Spider", None))  # noqa: SLF001
+
+    keys = [f"domain{i}" for i in range(len(capacities))]
+    downloader.slots = {
+        key: Slot(
+            concurrency=8,
+            delay=downloader.per_slot_settings.get(key, {}).get(
+                "delay",
+                downloader._delay,  # noqa: SLF001
+            ),
+        )
+        for key in keys
+    }
+    # Token bucket of each server, holding one second's worth of requests
+    tokens = list(capacities)
+    last = [0.0] * len(keys)
+    # (time, domain, status of a response or -1 for sending a request)
+    events = [(0.0, domain, -1) for domain in range(len(keys))]
+    heapq.heapify(events)
+    ok = throttled = throttled_last = 0
+
+    while events:
+        now, domain, status = heapq.heappop(events)
+        clock.now = start + now
+        key = keys[domain]
+        slot = downloader.slots[key]
+        if status >= 0:
+            throttle._adjust_delay(  # noqa: SLF001
+                slot,
+                latency,
+                slot_response(status, key),
+            )
+            if now < WINDOW:
+                throttled += status == HTTPStatus.TOO_MANY_REQUESTS
+                ok += status == HTTPStatus.OK
+            elif now >= duration - WINDOW:
+                throttled_last += status == HTTPStatus.TOO_MANY_REQUESTS
+            continue
+
+        capacity = capacities[domain]
+        tokens[domain] = min(capacity, tokens[domain] + (now - last[domain]) * capacity)
+        last[domain] = now
+        status = HTTPStatus.OK if tokens[domain] >= 1 else HTTPStatus.TOO_MANY_REQUESTS
+        tokens[domain] -= status == HTTPStatus.OK
+        heapq.heappush(events, (now + latency, domain, status))
+        if now + slot.delay < duration:
+            heapq.heappush(events, (now + max(slot.delay, 0.001), domain, -1))
+
+    clock.now = start + duration
+    throttle._save_snapshot()  # noqa: SLF001
+    return {"throttled": throttled, "ok": ok, "throttled_last": throttled_last}
+
+
+def main() -> None:
+    """Print the results of a cold start and warm starts of different age."""
+
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.warm_start")
+    parser.add_argument("--domains", type=int, default=200)
+    parser.add_argument("--start-delay", type=float, default=0.1)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--duration", type=float, default=300)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)  # noqa: S311
+    capacities = [rng.uniform(0.5, 4) for _ in range(args.domains)]
+
+    print(
+        f"{args.domains} domains admitting 0.5 to 4 requests/second, start "
+        f"delay {args.start_delay}s; responses in the first and last {WINDOW:.0f}s",
+    )
+    print(f"{'start':<14} {'429s first':>11} {'200s first':>11} {'429s last':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        snapshot = Path(directory, "throttle.json")
+        settings = {
+            "AUTOTHROTTLE_START_DELAY": args.start_delay,
+            "AUTOTHROTTLE_SNAPSHOT": str(snapshot),
+        }
+        for name, age in (
+            ("cold", None),
+            ("warm, 1 hour", HOUR),
+            ("warm, 1 day", 24 * HOUR),
+            ("warm, 1 week", 7 * 24 * HOUR),
+        ):
+            snapshot.unlink(missing_ok=True)
+            clock = Clock(time.time())
+            run = partial(
+                crawl,
+                settings,
+                clock=clock,
+                capacities=capacities,
+                latency=args.latency,
+                duration=args.duration,
+            )
+            with patch.object(extensions, "time", clock):
+                if age is not None:
+                    # The crawl before, whose snapshot is `age` seconds old
+                    run()
+                    clock.now += age
+                result = run()
+            print(
+                f"{name:<14} {result['throttled']:>11.0f} {result['ok']:>11.0f} "
+                f"{result['throttled_last']:>10.0f}",
+            )
+
+
+if __name__ == "__main__":
+    main()
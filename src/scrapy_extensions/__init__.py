@@ -3,15 +3,56 @@
 # - https://docs.scrapy.org/en/latest/topics/extensions.html?highlight=periodiclog#periodic-log-extension
 # - https://docs.scrapy.org/en/latest/topics/feed-exports.html?highlight=feedexporter#feeds
 
-from scrapy_extensions.downloadermiddlewares import DelayedRetryMiddleware
-from scrapy_extensions.extensions import LoopingExtension, NicerAutoThrottle
-from scrapy_extensions.loggers import QuietLogFormatter
-from scrapy_extensions.pipelines import BlurHashPipeline
+from __future__ import annotations
+
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from scrapy_extensions.downloadermiddlewares import DelayedRetryMiddleware
+    from scrapy_extensions.extensions import LoopingExtension, NicerAutoThrottle
+    from scrapy_extensions.loggers import QuietLogFormatter
+    from scrapy_extensions.pipelines import (
+        BlurHashImagesPipeline,
+        BlurHashPipeline,
+        PerceptualHashPipeline,
+        PlaceholderPipeline,
+    )
 
 __all__ = [
+    "BlurHashImagesPipeline",
     "BlurHashPipeline",
     "DelayedRetryMiddleware",
     "LoopingExtension",
     "NicerAutoThrottle",
+    "PerceptualHashPipeline",
+    "PlaceholderPipeline",
     "QuietLogFormatter",
 ]
+
+# Submodules are only imported once one of their classes is accessed (PEP 562)
+_MODULES = {
+    "BlurHashImagesPipeline": "scrapy_extensions.pipelines",
+    "BlurHashPipeline": "scrapy_extensions.pipelines",
+    "DelayedRetryMiddleware": "scrapy_extensions.downloadermiddlewares",
+    "LoopingExtension": "scrapy_extensions.extensions",
+    "NicerAutoThrottle": "scrapy_extensions.extensions",
+    "PerceptualHashPipeline": "scrapy_extensions.pipelines",
+    "PlaceholderPipeline": "scrapy_extensions.pipelines",
+    "QuietLogFormatter": "scrapy_extensions.loggers",
+}
+
+
+def __getattr__(name: str) -> Any:
+    module = _MODULES.get(name)
+    if module is None:
+        msg = f"module {__name__!r} has no attribute {name!r}"
+        raise AttributeError(msg)
+
+    value = getattr(import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted({*globals(), *__all__})
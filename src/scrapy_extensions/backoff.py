@@ -0,0 +1,120 @@
+"""Backoff strategies for `DelayedRetryMiddleware`.
+
+A strategy returns the delay before the next retry of a request, given the
+number of delayed retries so far (`attempt`, starting at 0), the previous delay,
+the base delay, the maximum delay and a random number generator. The jittered
+strategies spread requests that failed at the same moment over time, so they
+don't all retry in lockstep and trigger the next wave of errors, see
+https://aws.amazon.com/blogs/architecture/exponential-backoff-and-jitter/.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from random import Random
+
+    BackoffStrategy = Callable[[int, float, float, float, Random], float]
+
+# Doubling more often than this exceeds any sensible maximum delay anyway
+_MAX_DOUBLINGS = 64
+
+
+def _exponential(attempt: int, base: float, cap: float) -> float:
+    return min(cap, base * 2.0 ** min(attempt, _MAX_DOUBLINGS))
+
+
+def constant(
+    attempt: int,  # noqa: ARG001
+    previous: float,  # noqa: ARG001
+    base: float,
+    cap: float,  # noqa: ARG001
+    rng: Random,  # noqa: ARG001
+) -> float:
+    """Always wait the base delay, regardless of the maximum delay."""
+    return base
+
+
+def exponential(
+    attempt: int,
+    previous: float,  # noqa: ARG001
+    base: float,
+    cap: float,
+    rng: Random,  # noqa: ARG001
+) -> float:
+    """Double the delay with every attempt, up to the maximum delay."""
+    return _exponential(attempt, base, cap)
+
+
+def full_jitter(
+    attempt: int,
+    previous: float,  # noqa: ARG001
+    base: float,
+    cap: float,
+    rng: Random,
+) -> float:
+    """Random delay between 0 and the exponential delay."""
+    return rng.uniform(0, _exponential(attempt, base, cap))
+
+
+def equal_jitter(
+    attempt: int,
+    previous: float,  # noqa: ARG001
+    base: float,
+    cap: float,
+    rng: Random,
+) -> float:
+    """Random delay between half of and the full exponential delay."""
+    delay = _exponential(attempt, base, cap)
+    return delay / 2 + rng.uniform(0, delay / 2)
+
+
+def decorrelated_jitter(
+    attempt: int,  # noqa: ARG001
+    previous: float,
+    base: float,
+    cap: float,
+    rng: Random,
+) -> float:
+    """Random delay between the base delay and three times the previous delay."""
+    return min(cap, rng.uniform(base, 3 * max(previous, base)))
+
+
+def linear(
+    attempt: int,
+    previous: float,  # noqa: ARG001
+    base: float,
+    cap: float,
+    rng: Random,  # noqa: ARG001
+) -> float:
+    """Increase the delay by the base delay with every attempt."""
+    return min(cap, base * (attempt + 1))
+
+
+def fibonacci(
+    attempt: int,
+    previous: float,  # noqa: ARG001
+    base: float,
+    cap: float,
+    rng: Random,  # noqa: ARG001
+) -> float:
+    """Multiply the base delay by the Fibonacci numbers 1, 1, 2, 3, 5, …"""
+    current, following = 1, 1
+    for _ in range(attempt):
+        if base * current >= cap:
+            break
+        current, following = following, current + following
+    return min(cap, base * current)
+
+
+BACKOFF_STRATEGIES: dict[str, BackoffStrategy] = {
+    "constant": constant,
+    "exponential": exponential,
+    "full_jitter": full_jitter,
+    "equal_jitter": equal_jitter,
+    "decorrelated_jitter": decorrelated_jitter,
+    "linear": linear,
+    "fibonacci": fibonacci,
+}
@@ -0,0 +1,341 @@
+"""Backfill BlurHashes for images that have already been downloaded.
+
+Either enrich an existing feed (JSON Lines or CSV) whose items contain the
+results of Scrapy's `ImagesPipeline`, or walk the `full` directory of an
+`IMAGES_STORE` and output one JSON line per image::
+
+    python -m scrapy_extensions.blurhash --images-store images items.jl -o out.jl
+    python -m scrapy_extensions.blurhash --images-store images -o blurhashes.jl
+
+Records are processed in a pool of worker processes and written in input order,
+with only a bounded number of records in memory at any time. With
+`--checkpoint`, progress is saved periodically together with the size of the
+output file, and an interrupted run resumes where it left off: records written
+after the last checkpoint are cut off the output file and processed again, so
+none of them is duplicated.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import ExitStack
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, TextIO
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+LOGGER = logging.getLogger(__name__)
+
+
+def _calculate_blurhashes(
+    paths: list[str | None],
+    x_components: int,
+    y_components: int,
+    float32: bool,  # noqa: FBT001
+) -> list[str | None]:
+    from scrapy_extensions.utils import calculate_blurhash
+
+    blurhashes: list[str | None] = []
+    for path in paths:
+        blurhash = None
+        if path:
+            try:
+                blurhash = calculate_blurhash(
+                    image=path,
+                    x_components=x_components,
+                    y_components=y_components,
+                    float32=float32,
+                )
+            except Exception:
+                LOGGER.exception("Unable to calculate BlurHash for image <%s>", path)
+        blurhashes.append(blurhash)
+    return blurhashes
+
+
+class BlurHashBackfill:
+    """Calculate BlurHashes for a stream of records in a process pool."""
+
+    def __init__(  # noqa: PLR0913
+        self,
+        *,
+        images_store: str | Path,
+        source_field: str = "images",
+        target_field: str | None = None,
+        x_components: int = 4,
+        y_components: int = 4,
+        float32: bool = False,
+        workers: int | None = None,
+        progress_interval: float = 10,
+    ) -> None:
+        self.images_store = Path(images_store).resolve()
+        self.source_field = source_field
+        self.target_field = target_field or source_field
+        self.x_components = x_components
+        self.y_components = y_components
+        self.float32 = float32
+        self.workers = workers
+        self.progress_interval = progress_interval
+        self.records_count = 0
+        self.images_count = 0
+
+    def _full_path(self, image_obj: Any) -> str | None:
+        path = image_obj.get("path") if isinstance(image_obj, dict) else image_obj
+        if not path:
+            return None
+        full_path = self.images_store / path
+        return str(full_path) if full_path.is_file() else None
+
+    def _image_objs(self, record: dict[str, Any]) -> list[Any]:
+        image_objs = record.get(self.source_field) or []
+        return image_objs if isinstance(image_objs, list) else [image_objs]
+
+    def _enrich(
+        self,
+        record: dict[str, Any],
+        blurhashes: list[str | None],
+    ) -> dict[str, Any]:
+        image_objs = self._image_objs(record)
+        record = record.copy()
+        record[self.target_field] = [
+            {**image_obj, "blurhash": blurhash}
+            if isinstance(image_obj, dict)
+            else {"path": image_obj, "blurhash": blurhash}
+            for image_obj, blurhash in zip(image_objs, blurhashes, strict=True)
+        ]
+        return record
+
+    def process(
+        self,
+        records: Iterable[dict[str, Any]],
+    ) -> Iterator[dict[str, Any]]:
+        """Yield the records enriched with BlurHashes, in input order."""
+
+        window = 4 * (self.workers or 8)
+        pending: deque[tuple[dict[str, Any], Future[list[str | None]]]] = deque()
+        start = last_report = time.monotonic()
+
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            for record in records:
+                paths = [self._full_path(obj) for obj in self._image_objs(record)]
+                future = executor.submit(
+                    _calculate_blurhashes,
+                    paths,
+                    self.x_components,
+                    self.y_components,
+                    self.float32,
+                )
+                pending.append((record, future))
+
+                while len(pending) >= window or (pending and pending[0][1].done()):
+                    yield self._done(*pending.popleft())
+
+                now = time.monotonic()
+                if now - last_report >= self.progress_interval:
+                    self._report(now - start)
+                    last_report = now
+
+            while pending:
+                yield self._done(*pending.popleft())
+
+        self._report(time.monotonic() - start)
+
+    def _done(
+        self,
+        record: dict[str, Any],
+        future: Future[list[str | None]],
+    ) -> dict[str, Any]:
+        blurhashes = future.result()
+        self.records_count += 1
+        self.images_count += len(blurhashes)
+        return self._enrich(record, blurhashes)
+
+    def _report(self, elapsed: float) -> None:
+        LOGGER.info(
+            "Processed %d records with %d images in %.1fs (%.1f images/sec)",
+            self.records_count,
+            self.images_count,
+            elapsed,
+            self.images_count / elapsed if elapsed > 0 else 0,
+        )
+
+
+def _read_jsonl(file: TextIO) -> Iterator[dict[str, Any]]:
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def _read_csv(file: TextIO, field: str) -> Iterator[dict[str, Any]]:
+    for row in csv.DictReader(file):
+        record: dict[str, Any] = dict(row)
+        value = row.get(field)
+        if value:
+            try:
+                record[field] = json.loads(value)
+            except json.JSONDecodeError:
+                record[field] = [path.strip() for path in value.split(",")]
+        yield record
+
+
+def _walk_store(images_store: Path) -> Iterator[dict[str, Any]]:
+    # Sorted for a stable order when resuming, but without listing everything
+    for dir_path, dir_names, file_names in os.walk(images_store / "full"):
+        dir_names.sort()
+        for file_name in sorted(file_names):
+            path = Path(dir_path, file_name).relative_to(images_store)
+            yield {"path": path.as_posix()}
+
+
+class _Checkpoint:
+    def __init__(self, path: Path | None, interval: int) -> None:
+        self.path = path
+        self.interval = interval
+        self.processed = 0
+        self.offset: int | None = None
+        if path is not None and path.exists():
+            state = json.loads(path.read_text())
+            self.processed = state["processed"]
+            self.offset = state.get("offset")
+
+    def restore(self, output_path: Path) -> None:
+        """Cut off the records written after the checkpoint was saved."""
+        if self.offset is not None and output_path.exists():
+            os.truncate(output_path, self.offset)
+
+    def skip(self, records: Iterable[dict[str, Any]]) -> Iterator[dict[str, Any]]:
+        for i, record in enumerate(records):
+            if i >= self.processed:
+                yield record
+
+    def update(self, output: TextIO) -> None:
+        self.processed += 1
+        if self.path is not None and self.processed % self.interval == 0:
+            self.save(output)
+
+    def save(self, output: TextIO) -> None:
+        if self.path is None:
+            return
+        output.flush()
+        # Saved along with the count, so the output can be restored to match it
+        self.offset = output.tell()
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(
+            json.dumps({"processed": self.processed, "offset": self.offset}),
+        )
+        tmp_path.replace(self.path)
+
+
+def _parse_args(args: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m scrapy_extensions.blurhash",
+        description="Backfill BlurHashes for already downloaded images.",
+    )
+    parser.add_argument(
+        "feed",
+        nargs="?",
+        type=Path,
+        help="JSON Lines or CSV feed to enrich; "
+        "if omitted, walk the 'full' directory of the images store",
+    )
+    parser.add_argument("--images-store", "-s", type=Path, required=True)
+    parser.add_argument("--output", "-o", type=Path, help="default: stdout")
+    parser.add_argument("--field", "-f", default="images")
+    parser.add_argument("--target-field", "-t")
+    parser.add_argument("--x-components", "-x", type=int, default=4)
+    parser.add_argument("--y-components", "-y", type=int, default=4)
+    parser.add_argument(
+        "--float32",
+        action="store_true",
+        help="use the vectorised single precision encoder",
+    )
+    parser.add_argument("--workers", "-w", type=int)
+    parser.add_argument("--checkpoint", "-c", type=Path)
+    parser.add_argument("--checkpoint-interval", type=int, default=1000)
+    parser.add_argument("--progress-interval", type=float, default=10)
+    parser.add_argument("--verbose", "-v", action="store_true")
+    return parser.parse_args(args)
+
+
+def main(args: list[str] | None = None) -> None:
+    """Command line entry point."""
+
+    parsed = _parse_args(args)
+
+    logging.basicConfig(
+        stream=sys.stderr,
+        level=logging.DEBUG if parsed.verbose else logging.INFO,
+        format="%(asctime)s %(levelname)-8.8s [%(name)s:%(lineno)s] %(message)s",
+    )
+
+    if parsed.checkpoint and not parsed.output:
+        LOGGER.error("Resuming from a checkpoint requires an --output file")
+        sys.exit(1)
+
+    checkpoint = _Checkpoint(parsed.checkpoint, parsed.checkpoint_interval)
+    is_csv = parsed.feed is not None and parsed.feed.suffix.lower() == ".csv"
+    backfill = BlurHashBackfill(
+        images_store=parsed.images_store,
+        source_field=parsed.field if parsed.feed else "path",
+        target_field=parsed.target_field,
+        x_components=parsed.x_components,
+        y_components=parsed.y_components,
+        float32=parsed.float32,
+        workers=parsed.workers,
+        progress_interval=parsed.progress_interval,
+    )
+
+    if checkpoint.processed:
+        LOGGER.info("Resuming after %d records", checkpoint.processed)
+        checkpoint.restore(parsed.output)
+
+    with ExitStack() as stack:
+        output: TextIO = (
+            stack.enter_context(
+                parsed.output.open("a" if checkpoint.processed else "w", newline=""),
+            )
+            if parsed.output
+            else sys.stdout
+        )
+
+        if parsed.feed is None:
+            records: Iterable[dict[str, Any]] = _walk_store(backfill.images_store)
+        elif is_csv:
+            feed = stack.enter_context(parsed.feed.open(newline=""))
+            records = _read_csv(feed, parsed.field)
+        else:
+            feed = stack.enter_context(parsed.feed.open())
+            records = _read_jsonl(feed)
+
+        writer: csv.DictWriter[str] | None = None
+        for record in backfill.process(checkpoint.skip(records)):
+            if parsed.feed is None:
+                # Flatten the single image result for the directory listing
+                record = record[backfill.target_field][0]  # noqa: PLW2901
+            if is_csv:
+                row = {
+                    key: json.dumps(value) if isinstance(value, list) else value
+                    for key, value in record.items()
+                }
+                if writer is None:
+                    writer = csv.DictWriter(output, fieldnames=list(row))
+                    if not checkpoint.processed:
+                        writer.writeheader()
+                writer.writerow(row)
+            else:
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            checkpoint.update(output)
+
+        checkpoint.save(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,43 +1,348 @@
 """Scrapy downloader middleware (async/await rewrite)
 
 This middleware preserves the same behaviour as the original Deferred-based
-implementation but uses Python coroutines (`async`/`await`) and
-`asyncio.sleep` for the delay. The public behaviour (delayed retries,
-backoff, priority adjust, config keys) is unchanged.
+implementation but uses Python coroutines (`async`/`await`). Retry requests
+wait for their delay in a `DelayedRequestQueue` (or, with
+`DELAYED_RETRY_QUEUE = False`, in `asyncio.sleep`). The public behaviour
+(delayed retries, backoff, priority adjust, config keys) is unchanged.
 """
 
 from __future__ import annotations
 
 import asyncio
+import heapq
 import logging
+import math
+import random
 import sys
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from itertools import count
 from typing import TYPE_CHECKING
 
+import scrapy
 from scrapy.downloadermiddlewares.retry import RetryMiddleware, get_retry_request
-from scrapy.exceptions import NotConfigured
+from scrapy.exceptions import DontCloseSpider, IgnoreRequest, NotConfigured
+from scrapy.signals import request_scheduled, spider_closed, spider_idle
+from scrapy.utils.misc import load_object
 from scrapy.utils.response import response_status_message
 
+from scrapy_extensions.backoff import BACKOFF_STRATEGIES
+from scrapy_extensions.signals import (
+    circuit_closed,
+    circuit_half_opened,
+    circuit_opened,
+)
+
 if TYPE_CHECKING:
+    from collections.abc import Callable
+
     from scrapy import Request, Spider
+    from scrapy.crawler import Crawler
     from scrapy.http import Response
     from scrapy.settings import Settings
+    from scrapy.statscollectors import StatsCollector
+
+    from scrapy_extensions.backoff import BackoffStrategy
 
 LOGGER = logging.getLogger(__name__)
 
+# `X-RateLimit-Reset` values above this are Unix timestamps, else seconds
+_TIMESTAMP_THRESHOLD = 1_000_000_000
+
+# Raising `IgnoreRequest` in a `request_scheduled` handler keeps the engine from
+# enqueueing the request only since Scrapy 2.11.2
+_CAN_HOLD_SCHEDULED_REQUESTS = scrapy.version_info >= (2, 11, 2)
+# Scrapy 2.14 deprecated passing the spider to the middleware methods
+_PASS_SPIDER = scrapy.version_info < (2, 14)
+
+
+def _header(response: Response, name: str) -> str | None:
+    value = response.headers.get(name)
+    return value.decode("latin-1").strip() if value else None
+
+
+def _http_date(value: str | None) -> float | None:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def _float(value: str | None) -> float | None:
+    try:
+        number = float(value) if value else None
+    except ValueError:
+        return None
+    return number if number is not None and math.isfinite(number) else None
+
+
+def header_delay(response: Response) -> float | None:
+    """Seconds to wait before retrying according to the response headers.
+
+    Understands `Retry-After` (seconds or an HTTP date) and `X-RateLimit-Reset`
+    or `RateLimit-Reset` (seconds or a Unix timestamp). Dates are compared to
+    the response's `Date` header if present to avoid clock skew. Returns `None`
+    if there's no such header or it can't be parsed.
+    """
+
+    now = _http_date(_header(response, "Date")) or time.time()
+
+    retry_after = _header(response, "Retry-After")
+    delay = _float(retry_after)
+    if delay is None and (retry_date := _http_date(retry_after)) is not None:
+        delay = retry_date - now
+
+    for name in ("X-RateLimit-Reset", "RateLimit-Reset"):
+        if delay is not None:
+            break
+        delay = _float(_header(response, name))
+        if delay is not None and delay > _TIMESTAMP_THRESHOLD:
+            delay -= now
+
+    return max(delay, 0) if delay is not None else None
+
+
+class DelayedRequestQueue:
+    """Hold requests until they're due, then hand them back to the engine.
+
+    A heap keyed by the time each request is due, drained by a single timer on
+    the event loop. Waiting requests occupy neither a download slot nor the
+    memory of the response that caused the retry.
+    """
+
+    def __init__(
+        self,
+        crawl: Callable[[Request], object],
+        stats: StatsCollector | None = None,
+    ) -> None:
+        self.crawl = crawl
+        self.stats = stats
+        self._heap: list[tuple[float, int, Request]] = []
+        self._counter = count()
+        self._timer: asyncio.TimerHandle | None = None
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def push(self, request: Request, ready_at: float) -> None:
+        """Crawl `request` once the event loop's clock reaches `ready_at`."""
+
+        heapq.heappush(self._heap, (ready_at, next(self._counter), request))
+        if self.stats is not None:
+            self.stats.inc_value("delayed_retry/queued")
+            self.stats.max_value("delayed_retry/queue_max", len(self._heap))
+        if self._heap[0][2] is request:
+            self._schedule()
+
+    def _schedule(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._heap:
+            loop = asyncio.get_running_loop()
+            self._timer = loop.call_at(self._heap[0][0], self._release)
+
+    def _release(self) -> None:
+        self._timer = None
+        now = asyncio.get_running_loop().time()
+        while self._heap and self._heap[0][0] <= now:
+            _, _, request = heapq.heappop(self._heap)
+            if self.stats is not None:
+                self.stats.inc_value("delayed_retry/released")
+            self.crawl(request)
+        self._schedule()
+
+    def next_ready_at(self) -> float | None:
+        """The event loop time the next request is due at, if any."""
+        return self._heap[0][0] if self._heap else None
+
+    def clear(self) -> int:
+        """Drop all waiting requests and return how many there were."""
+
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        dropped = len(self._heap)
+        self._heap.clear()
+        return dropped
+
+
+class CircuitBreaker:
+    """State of the circuit breaker of a single download slot.
+
+    While `closed`, requests pass and delayed-retry responses are counted; once
+    there are `threshold` of them within `window` seconds, the breaker is
+    `open` and requests to the slot are parked. After a cooldown it's
+    `half_open`: a single probe request is downloaded, whose success closes the
+    breaker and releases the parked requests, while a failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, threshold: int, window: float) -> None:
+        self.threshold = threshold
+        self.window = window
+        self.state = self.CLOSED
+        self.failures: deque[float] = deque()
+        self.parked: list[Request] = []
+        self.probe: Request | None = None
+        self.timer: asyncio.TimerHandle | None = None
+
+    def record_failure(self, now: float) -> bool:
+        """Count a failure at time `now`; whether the breaker should open."""
+
+        self.failures.append(now)
+        while self.failures[0] <= now - self.window:
+            self.failures.popleft()
+        return len(self.failures) >= self.threshold
+
+    def cancel_timer(self) -> None:
+        """Cancel the pending cooldown or probe timer, if any."""
+
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+
+class RetryBudget:
+    """Sliding window retry budget of a single download slot.
+
+    Every request deposits `ratio` tokens and every retry withdraws one, with
+    deposits and withdrawals expiring after `window` seconds. So retries are at
+    most `ratio` of the requests within the window, plus `min_retries` for
+    slots with too little traffic to earn a token.
+    """
+
+    def __init__(self, ratio: float, window: float, min_retries: int) -> None:
+        self.ratio = ratio
+        self.window = window
+        self.min_retries = min_retries
+        self.requests = 0
+        self.retries = 0
+        # [second, requests, retries] per second within the window
+        self._buckets: deque[list[int]] = deque()
+
+    def _bucket(self, now: float) -> list[int]:
+        second = math.floor(now)
+        while self._buckets and self._buckets[0][0] <= second - self.window:
+            _, requests, retries = self._buckets.popleft()
+            self.requests -= requests
+            self.retries -= retries
+        if not self._buckets or self._buckets[-1][0] != second:
+            self._buckets.append([second, 0, 0])
+        return self._buckets[-1]
+
+    def record_request(self, now: float) -> None:
+        """Deposit the tokens of a request sent at time `now`."""
+
+        self._bucket(now)[1] += 1
+        self.requests += 1
+
+    def try_retry(self, now: float) -> bool:
+        """Withdraw a token for a retry at time `now` if the budget allows it."""
+
+        bucket = self._bucket(now)
+        if self.retries + 1 > self.ratio * self.requests + self.min_retries:
+            return False
+        bucket[2] += 1
+        self.retries += 1
+        return True
+
 
 class DelayedRetryMiddleware(RetryMiddleware):
     """retry requests with a delay (async/await version)
 
     Notes
     -----
-    - Uses `asyncio.sleep` to implement the delay.
+    - Retry requests are returned right away, marked with the time they're
+      due (`delayed_retry_ready_at` in meta). When the engine schedules them,
+      they're parked in a `DelayedRequestQueue`, which re-injects them via
+      `engine.crawl` once due; the spider isn't closed while requests wait,
+      and says so in the log. The stats `delayed_retry/queued` and
+      `delayed_retry/released` count the requests entering and leaving the
+      queue. `DELAYED_RETRY_QUEUE = False` sleeps in `process_response`
+      instead, as do Scrapy versions before 2.11.2 and a middleware not created
+      through `from_crawler`.
     - `process_response` is an async coroutine; Scrapy accepts coroutines from
       middleware methods and will await them appropriately when using an
       asyncio-compatible reactor.
     - Behaviour and configuration keys are kept compatible with the original
       implementation.
+    - `DELAYED_RETRY_BACKOFF_STRATEGY` selects how the delay grows between
+      retries: one of `scrapy_extensions.backoff.BACKOFF_STRATEGIES` or the
+      import path of a function with the same signature. It defaults to
+      `exponential` if `DELAYED_RETRY_BACKOFF` is set, else `constant`.
+      `DELAYED_RETRY_SEED` seeds the random number generator of the jittered
+      strategies.
+    - Unless `DELAYED_RETRY_RESPECT_HEADERS` is disabled, a delay given by the
+      `Retry-After` or rate limit headers of the response (see `header_delay`)
+      replaces the computed one, capped at `DELAYED_RETRY_BACKOFF_MAX_DELAY`.
+    - With `DELAYED_RETRY_CIRCUIT_BREAKER_THRESHOLD` set, a `CircuitBreaker`
+      per download slot opens after that many delayed-retry responses within
+      `DELAYED_RETRY_CIRCUIT_BREAKER_WINDOW` seconds (default: 60) and probes
+      the slot again after `DELAYED_RETRY_CIRCUIT_BREAKER_COOLDOWN` seconds
+      (default: `DELAYED_RETRY_BACKOFF_MAX_DELAY`). Requires the queue. State
+      changes are sent as the signals in `scrapy_extensions.signals` and
+      counted in the stats `delayed_retry/circuit/*`.
+    - With `DELAYED_RETRY_BUDGET_RATIO` set, a `RetryBudget` per download slot
+      limits delayed retries to that fraction of the slot's requests within
+      `DELAYED_RETRY_BUDGET_WINDOW` seconds (default: 60), plus
+      `DELAYED_RETRY_BUDGET_MIN_RETRIES` (default: 10). Retries beyond the
+      budget are dropped, or with `DELAYED_RETRY_BUDGET_DEFER` kept until the
+      spider is idle otherwise, and counted in `delayed_retry/budget/*`.
     """
 
+    crawler: Crawler
+    delayed_queue: DelayedRequestQueue | None = None
+    circuit_threshold = 0
+    budget_ratio = 0.0
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler) -> DelayedRetryMiddleware:
+        middleware = super().from_crawler(crawler)
+        # Older versions of `RetryMiddleware.from_crawler` don't keep the crawler
+        middleware.crawler = crawler
+        settings = crawler.settings
+        use_queue = settings.getbool("DELAYED_RETRY_QUEUE", default=True)
+        if use_queue and not _CAN_HOLD_SCHEDULED_REQUESTS:
+            LOGGER.warning(
+                "DELAYED_RETRY_QUEUE requires Scrapy 2.11.2 or later, "
+                "waiting for delayed retries in process_response instead",
+            )
+            use_queue = False
+        circuit_threshold = settings.getint("DELAYED_RETRY_CIRCUIT_BREAKER_THRESHOLD")
+        if use_queue:
+            middleware.delayed_queue = DelayedRequestQueue(
+                crawl=middleware._crawl,  # noqa: SLF001
+                stats=crawler.stats,
+            )
+            middleware.circuit_threshold = circuit_threshold
+        elif circuit_threshold:
+            LOGGER.warning(
+                "The circuit breaker requires the delayed request queue, "
+                "ignoring DELAYED_RETRY_CIRCUIT_BREAKER_THRESHOLD",
+            )
+        middleware.budget_ratio = settings.getfloat("DELAYED_RETRY_BUDGET_RATIO")
+        crawler.signals.connect(
+            middleware._request_scheduled,  # noqa: SLF001
+            signal=request_scheduled,
+        )
+        crawler.signals.connect(
+            middleware._spider_idle,  # noqa: SLF001
+            signal=spider_idle,
+        )
+        crawler.signals.connect(
+            middleware._spider_closed,  # noqa: SLF001
+            signal=spider_closed,
+        )
+        return middleware
+
     def __init__(
         self,
         settings: Settings,
@@ -46,7 +351,7 @@ class DelayedRetryMiddleware(RetryMiddleware):
 
         delayed_retry_http_codes_settings = settings.getlist("DELAYED_RETRY_HTTP_CODES")
         try:
-            delayed_retry_http_codes = (
+            delayed_retry_http_codes = tuple(
                 int(http_code) for http_code in delayed_retry_http_codes_settings
             )
         except ValueError as exc:
@@ -70,42 +375,169 @@ class DelayedRetryMiddleware(RetryMiddleware):
             "DELAYED_RETRY_BACKOFF_MAX_DELAY",
             10 * self.delayed_retry_delay,
         )
+        self.delayed_retry_backoff_strategy = self._backoff_strategy(settings)
+        self.delayed_retry_rng = random.Random(  # noqa: S311
+            settings.get("DELAYED_RETRY_SEED"),
+        )
+        self.delayed_retry_respect_headers = settings.getbool(
+            "DELAYED_RETRY_RESPECT_HEADERS",
+            default=True,
+        )
+        self.circuit_window = settings.getfloat(
+            "DELAYED_RETRY_CIRCUIT_BREAKER_WINDOW",
+            60,
+        )
+        self.circuit_cooldown = settings.getfloat(
+            "DELAYED_RETRY_CIRCUIT_BREAKER_COOLDOWN",
+            self.delayed_retry_backoff_max_delay,
+        )
+        self.circuit_breakers: dict[str, CircuitBreaker] = {}
+        self.budget_window = settings.getfloat("DELAYED_RETRY_BUDGET_WINDOW", 60)
+        self.budget_min_retries = settings.getint(
+            "DELAYED_RETRY_BUDGET_MIN_RETRIES",
+            10,
+        )
+        self.budget_defer = settings.getbool("DELAYED_RETRY_BUDGET_DEFER")
+        if self.budget_defer and not _CAN_HOLD_SCHEDULED_REQUESTS:
+            LOGGER.warning(
+                "DELAYED_RETRY_BUDGET_DEFER requires Scrapy 2.11.2 or later, "
+                "dropping retries over budget instead",
+            )
+            self.budget_defer = False
+        self.retry_budgets: dict[str, RetryBudget] = {}
+        self.deferred_retries: list[Request] = []
+        self.waiting_log_interval = settings.getfloat("LOGSTATS_INTERVAL", 60)
+        self._waiting_logged_at: float | None = None
+
+    @staticmethod
+    def _backoff_strategy(settings: Settings) -> BackoffStrategy:
+        strategy = settings.get("DELAYED_RETRY_BACKOFF_STRATEGY") or (
+            "exponential" if settings.getbool("DELAYED_RETRY_BACKOFF") else "constant"
+        )
+        if callable(strategy):
+            return strategy  # type: ignore[no-any-return]
+        if strategy in BACKOFF_STRATEGIES:
+            return BACKOFF_STRATEGIES[strategy]
+        try:
+            return load_object(strategy)  # type: ignore[no-any-return]
+        except (ImportError, NameError, ValueError) as exc:
+            LOGGER.exception(
+                "Invalid DELAYED_RETRY_BACKOFF_STRATEGY %r, use one of %s "
+                "or the import path of a function",
+                strategy,
+                ", ".join(BACKOFF_STRATEGIES),
+            )
+            raise NotConfigured from exc
+
+    def process_request(
+        self,
+        request: Request,
+        spider: Spider | None = None,  # noqa: ARG002
+    ) -> Request | None:
+        """Park requests to a download slot whose circuit breaker is open."""
+
+        if not self.circuit_threshold:
+            return None
+
+        key = self._slot_key(request)
+        breaker = self.circuit_breakers.get(key)
+        if breaker is None or breaker.state == CircuitBreaker.CLOSED:
+            return None
+
+        if breaker.state == CircuitBreaker.HALF_OPEN and breaker.probe is None:
+            breaker.probe = request
+            request.meta["delayed_retry_probe"] = True
+            return None
+
+        # Returned to the engine, which hands it to `_request_scheduled`
+        parked = request.replace(dont_filter=True)
+        parked.meta["delayed_retry_parked"] = key
+        return parked
+
+    def process_exception(
+        self,
+        request: Request,
+        exception: Exception,
+        spider: Spider | None = None,
+    ) -> Request | Response | None:
+        """Count network errors for the circuit breaker, else like `RetryMiddleware`."""
+
+        if self.circuit_threshold and isinstance(exception, self.exceptions_to_retry):
+            self._update_circuit(request, failed=True)
+        if self.budget_ratio:
+            self._retry_budget(request).record_request(time.monotonic())
+        return super().process_exception(
+            request,
+            exception,
+            *self._spider_args(spider),
+        )
 
     async def process_response(  # type: ignore[override]
         self,
         request: Request,
         response: Response,
-        spider: Spider,
+        spider: Spider | None = None,
     ) -> Request | Response:
         """retry certain requests with delay
 
         This method is now a coroutine. If the response status matches a
-        delayed-retry code, we await the computed delay and then return the
-        retry Request (or None, in which case the original response is
-        returned). Otherwise we delegate to the parent implementation.
+        delayed-retry code, we return the retry Request, which waits for the
+        computed delay in the queue (or await the delay here without a queue),
+        or the original response if there are no retries left. Otherwise we
+        delegate to the parent implementation.
         """
 
+        if self.circuit_threshold:
+            self._update_circuit(
+                request,
+                failed=response.status in self.delayed_retry_http_codes,
+            )
+        if self.budget_ratio:
+            self._retry_budget(request).record_request(time.monotonic())
+
         if request.meta.get("dont_retry"):
             return response
 
         if response.status in self.delayed_retry_http_codes:
             reason = response_status_message(response.status)
-            req = await self._delayed_retry(request, reason, spider)
+            delay = (
+                header_delay(response) if self.delayed_retry_respect_headers else None
+            )
+            req = await self._delayed_retry(request, reason, spider, delay)
             return req or response
 
         # Delegate to parent. The parent may return a value or a Deferred/coroutine.
-        parent_result = super().process_response(request, response, spider)
+        parent_result = super().process_response(
+            request,
+            response,
+            *self._spider_args(spider),
+        )
         if asyncio.iscoroutine(parent_result):
             return await parent_result  # type: ignore[no-any-return]
         return parent_result
 
+    def _spider_args(self, spider: Spider | None) -> tuple[Spider, ...]:
+        if not _PASS_SPIDER:
+            return ()
+        spider = spider if spider is not None else self.crawler.spider
+        assert spider is not None
+        return (spider,)
+
     async def _delayed_retry(
         self,
         request: Request,
         reason: str,
-        spider: Spider,
+        spider: Spider | None = None,
+        server_delay: float | None = None,
     ) -> Request | None:
-        """Compute retry Request and await the configured delay before returning it."""
+        """Compute retry Request and its delay, marking or awaiting the delay.
+
+        `server_delay` is the delay requested by the server, if any; it takes
+        precedence over the backoff strategy.
+        """
+
+        spider = spider if spider is not None else self.crawler.spider
+        assert spider is not None
 
         max_retry_times = request.meta.get(
             "max_retry_times",
@@ -118,6 +550,16 @@ class DelayedRetryMiddleware(RetryMiddleware):
             self.delayed_retry_priority_adjust,
         )
 
+        over_budget = (
+            self.budget_ratio > 0
+            and request.meta.get("retry_times", 0) < max_retry_times
+            and not self._retry_budget(request).try_retry(time.monotonic())
+        )
+        if over_budget:
+            self._count_over_budget(request)
+            if not self.budget_defer:
+                return None
+
         req = get_retry_request(
             request=request,
             spider=spider,
@@ -129,15 +571,229 @@ class DelayedRetryMiddleware(RetryMiddleware):
         if req is None:
             return None
 
-        delay = request.meta.get("retry_delay", self.delayed_retry_delay)
-        req.meta["retry_delay"] = (
-            min(2 * delay, self.delayed_retry_backoff_max_delay)
-            if self.delayed_retry_backoff
-            else delay
-        )
+        if over_budget:
+            # Returned to the engine, which hands it to `_request_scheduled`
+            req.meta["delayed_retry_deferred"] = True
+            return req
+
+        # `retry_delay` in meta overrides the base delay for a single request
+        base = request.meta.get("retry_delay", self.delayed_retry_delay)
+        attempt = request.meta.get("delayed_retry_times", 0)
+        if server_delay is None:
+            delay = self.delayed_retry_backoff_strategy(
+                attempt,
+                request.meta.get("delayed_retry_last_delay", base),
+                base,
+                self.delayed_retry_backoff_max_delay,
+                self.delayed_retry_rng,
+            )
+            self._inc_stats("delayed_retry/computed_delay")
+        else:
+            delay = min(server_delay, self.delayed_retry_backoff_max_delay)
+            self._inc_stats("delayed_retry/header_delay")
+        req.meta["delayed_retry_times"] = attempt + 1
+        req.meta["delayed_retry_last_delay"] = delay
 
         LOGGER.debug("Retry request %r in %.1f second(s)", req, delay)
 
+        if self.delayed_queue is not None:
+            loop = asyncio.get_running_loop()
+            req.meta["delayed_retry_ready_at"] = loop.time() + delay
+            return req
+
         # Non-blocking sleep — preserves reactor responsiveness in asyncio mode.
         await asyncio.sleep(delay)
         return req
+
+    def _crawl(self, request: Request) -> None:
+        request.meta.pop("delayed_retry_ready_at", None)
+        assert self.crawler.engine is not None
+        self.crawler.engine.crawl(request)
+
+    def _retry_budget(self, request: Request) -> RetryBudget:
+        key = self._slot_key(request)
+        budget = self.retry_budgets.get(key)
+        if budget is None:
+            budget = RetryBudget(
+                self.budget_ratio,
+                self.budget_window,
+                self.budget_min_retries,
+            )
+            self.retry_budgets[key] = budget
+        return budget
+
+    def _count_over_budget(self, request: Request) -> None:
+        action = "deferred" if self.budget_defer else "dropped"
+        key = self._slot_key(request)
+        LOGGER.debug("Retry budget of slot <%s> exhausted, %s %r", key, action, request)
+        self._inc_stats(f"delayed_retry/budget/{action}")
+        self._inc_stats(f"delayed_retry/budget/{action}/{key}")
+
+    def _request_scheduled(self, request: Request) -> None:
+        if request.meta.pop("delayed_retry_deferred", False):
+            self.deferred_retries.append(request)
+            raise IgnoreRequest
+
+        key = request.meta.pop("delayed_retry_parked", None)
+        if key is not None:
+            self.circuit_breakers[key].parked.append(request)
+            self._inc_stats("delayed_retry/circuit/parked")
+            raise IgnoreRequest
+
+        ready_at = request.meta.get("delayed_retry_ready_at")
+        if ready_at is None or self.delayed_queue is None:
+            return
+        if ready_at <= asyncio.get_running_loop().time():
+            del request.meta["delayed_retry_ready_at"]
+            return
+        self.delayed_queue.push(request, ready_at)
+        # Tells the engine not to enqueue the request (yet), without logging
+        raise IgnoreRequest
+
+    def _slot_key(self, request: Request) -> str:
+        assert self.crawler.engine is not None
+        return self.crawler.engine.downloader.get_slot_key(request)
+
+    def _update_circuit(self, request: Request, *, failed: bool) -> None:
+        # Retries of the probe are ordinary requests again
+        is_probe = request.meta.pop("delayed_retry_probe", False)
+        key = self._slot_key(request)
+        breaker = self.circuit_breakers.get(key)
+
+        if breaker is None:
+            if not failed:
+                return
+            breaker = CircuitBreaker(self.circuit_threshold, self.circuit_window)
+            self.circuit_breakers[key] = breaker
+
+        if breaker.state == CircuitBreaker.HALF_OPEN and is_probe:
+            if failed:
+                self._open_circuit(key, breaker)
+            else:
+                self._close_circuit(key, breaker)
+        elif (
+            failed
+            and breaker.state == CircuitBreaker.CLOSED
+            and breaker.record_failure(asyncio.get_running_loop().time())
+        ):
+            self._open_circuit(key, breaker)
+
+    def _circuit_changed(
+        self,
+        key: str,
+        breaker: CircuitBreaker,
+        signal: object,
+    ) -> None:
+        self._inc_stats(f"delayed_retry/circuit/{breaker.state}")
+        self.crawler.signals.send_catch_log(
+            signal=signal,
+            slot=key,
+            spider=self.crawler.spider,
+        )
+
+    def _open_circuit(self, key: str, breaker: CircuitBreaker) -> None:
+        LOGGER.warning(
+            "Circuit breaker of slot <%s> opened, pausing it for %.1f second(s)",
+            key,
+            self.circuit_cooldown,
+        )
+        breaker.state = CircuitBreaker.OPEN
+        breaker.probe = None
+        breaker.failures.clear()
+        breaker.cancel_timer()
+        breaker.timer = asyncio.get_running_loop().call_later(
+            self.circuit_cooldown,
+            self._half_open_circuit,
+            key,
+            breaker,
+        )
+        self._circuit_changed(key, breaker, circuit_opened)
+
+    def _half_open_circuit(self, key: str, breaker: CircuitBreaker) -> None:
+        LOGGER.info("Circuit breaker of slot <%s> half-open, sending a probe", key)
+        breaker.state = CircuitBreaker.HALF_OPEN
+        # Send another probe after the cooldown if this one gets lost
+        breaker.probe = None
+        breaker.timer = asyncio.get_running_loop().call_later(
+            self.circuit_cooldown,
+            self._half_open_circuit,
+            key,
+            breaker,
+        )
+        if breaker.parked:
+            self._crawl(breaker.parked.pop(0))
+        self._circuit_changed(key, breaker, circuit_half_opened)
+
+    def _close_circuit(self, key: str, breaker: CircuitBreaker) -> None:
+        LOGGER.info(
+            "Circuit breaker of slot <%s> closed, releasing %d request(s)",
+            key,
+            len(breaker.parked),
+        )
+        breaker.state = CircuitBreaker.CLOSED
+        breaker.probe = None
+        breaker.cancel_timer()
+        parked, breaker.parked = breaker.parked, []
+        for request in parked:
+            self._crawl(request)
+        self._circuit_changed(key, breaker, circuit_closed)
+
+    def _spider_idle(self) -> None:
+        parked = sum(len(breaker.parked) for breaker in self.circuit_breakers.values())
+        if self.delayed_queue or parked:
+            self._log_waiting(parked)
+            raise DontCloseSpider
+
+        if self.deferred_retries:
+            LOGGER.info(
+                "Sending %d retry request(s) deferred for the retry budget",
+                len(self.deferred_retries),
+            )
+            deferred, self.deferred_retries = self.deferred_retries, []
+            for request in deferred:
+                self._crawl(request)
+            raise DontCloseSpider
+
+    def _spider_closed(self) -> None:
+        dropped = self.delayed_queue.clear() if self.delayed_queue is not None else 0
+        for breaker in self.circuit_breakers.values():
+            breaker.cancel_timer()
+            dropped += len(breaker.parked)
+            breaker.parked.clear()
+        dropped += len(self.deferred_retries)
+        self.deferred_retries.clear()
+        if dropped:
+            LOGGER.info("Dropped %d delayed retry request(s) on close", dropped)
+
+    def _log_waiting(self, parked: int) -> None:
+        # Nothing is downloaded while all requests wait, so tell why, but only
+        # every so often, as the engine checks for idleness every few seconds
+        now = asyncio.get_running_loop().time()
+        if (
+            self._waiting_logged_at is not None
+            and now - self._waiting_logged_at < self.waiting_log_interval
+        ):
+            return
+        self._waiting_logged_at = now
+
+        ready_at = (
+            self.delayed_queue.next_ready_at()
+            if self.delayed_queue is not None
+            else None
+        )
+        if ready_at is not None:
+            LOGGER.info(
+                "Waiting for %d delayed retry request(s), the next one is due "
+                "in %.1f second(s)",
+                len(self.delayed_queue or ()),
+                ready_at - now,
+            )
+        if parked:
+            LOGGER.info(
+                "Waiting for %d request(s) parked by open circuit breakers",
+                parked,
+            )
+
+    def _inc_stats(self, key: str) -> None:
+        if self.crawler.stats is not None:
+            self.crawler.stats.inc_value(key)
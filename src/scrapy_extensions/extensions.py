@@ -3,8 +3,13 @@
 from __future__ import annotations
 
 import logging
+import math
+import time
+from bisect import bisect_left, insort
+from collections import deque
 from typing import TYPE_CHECKING
 
+from scrapy.exceptions import NotConfigured
 from scrapy.extensions.throttle import AutoThrottle
 from scrapy.signals import spider_closed, spider_opened
 from scrapy.utils.misc import arg_to_iter
@@ -16,20 +21,156 @@ if TYPE_CHECKING:
     from scrapy import Spider
     from scrapy.core.downloader import Slot
     from scrapy.crawler import Crawler
-    from scrapy.http import Response
+    from scrapy.http import Request, Response
+
+    from scrapy_extensions.throttlestate import SlotSnapshot, ThrottleState
 
 LOGGER = logging.getLogger(__name__)
 
+# Snapshots older than this many half-lives aren't kept
+_SNAPSHOT_HALF_LIVES = 10
+
+
+class _ConcurrencyLimit:
+    """Gradient based concurrency limit of a slot, in the spirit of TCP Vegas.
+
+    Compares the latency without load (the minimum, slowly drifting upwards
+    once the latency doubled) with a moving average of the latency: while they
+    agree, the limit grows by about the square root of itself; once requests
+    queue up at the server and the latency rises, the gradient between them
+    shrinks the limit.
+    """
+
+    def __init__(self, limit: float, max_limit: int) -> None:
+        self.limit = limit
+        self.max_limit = max_limit
+        self.long_latency: float | None = None
+        self.short_latency: float | None = None
+        self.drifting = False
+
+    def update(self, latency: float) -> int:
+        """Update the limit with the latency of a healthy response."""
+
+        if self.long_latency is None or self.short_latency is None:
+            self.long_latency = self.short_latency = latency
+        self.short_latency += 0.2 * (latency - self.short_latency)
+        self.long_latency = min(self.long_latency, latency)
+
+        gradient = (
+            min(max(self.long_latency / self.short_latency, 0.5), 1.0)
+            if self.short_latency > 0
+            else 1.0
+        )
+        # At twice the latency the limit shrinks fast, so if the latency still
+        # doesn't come down, the server got slower for good: drift upwards
+        # until the latencies agree again. Drifting under any load would let
+        # the queue at the server grow without bounds.
+        if gradient <= 0.5:  # noqa: PLR2004
+            self.drifting = True
+        elif gradient >= 0.9:  # noqa: PLR2004
+            self.drifting = False
+        if self.drifting:
+            self.long_latency += 0.01 * (self.short_latency - self.long_latency)
+        new_limit = gradient * self.limit + math.sqrt(self.limit)
+        self.limit += 0.2 * (new_limit - self.limit)
+        return self._concurrency()
+
+    def backoff(self, factor: float) -> int:
+        """Divide the limit by `factor` after a throttled response."""
+
+        self.limit /= factor
+        return self._concurrency()
+
+    def _concurrency(self) -> int:
+        self.limit = min(max(self.limit, 1.0), self.max_limit)
+        return math.floor(self.limit)
+
+
+class _LatencyWindow:
+    """Latencies of the last `size` responses of a slot, kept sorted.
+
+    A ring buffer of the samples in arrival order plus a sorted copy, so any
+    quantile is a lookup and memory is bounded however long the crawl runs.
+    """
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self._samples: deque[float] = deque()
+        self._sorted: list[float] = []
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def add(self, latency: float) -> None:
+        """Add a sample, dropping the oldest one if the window is full."""
+
+        if len(self._samples) >= self.size:
+            oldest = self._samples.popleft()
+            del self._sorted[bisect_left(self._sorted, oldest)]
+        self._samples.append(latency)
+        insort(self._sorted, latency)
+
+    def quantile(self, q: float) -> float:
+        """The `q` quantile (nearest rank) of the samples in the window."""
+
+        return self._sorted[min(int(q * len(self._sorted)), len(self._sorted) - 1)]
+
 
 class NicerAutoThrottle(AutoThrottle):
-    """Autothrottling with exponential backoff depending on status codes."""
+    """Autothrottling with exponential backoff depending on status codes.
+
+    The delay of a slot is controlled by additive increase/multiplicative
+    decrease (AIMD) of its request rate: a response with one of the
+    `AUTOTHROTTLE_HTTP_CODES` multiplies the delay by
+    `AUTOTHROTTLE_BACKOFF_FACTOR` (default: 2). Afterwards, every
+    `AUTOTHROTTLE_RECOVERY_RESPONSES` (default: 10) consecutive healthy
+    responses add `AUTOTHROTTLE_RECOVERY_STEP` (default: 0.5) requests per
+    second to the slot's rate, until the delay is back at what AutoThrottle's
+    latency based formula asks for, which then takes over again. Set
+    `AUTOTHROTTLE_RECOVERY_RESPONSES` to 0 to leave recovery to that formula.
+
+    For servers that limit concurrent connections rather than the request rate,
+    `AUTOTHROTTLE_CONCURRENCY` makes each slot's concurrency the lever instead:
+    throttled responses divide it by `AUTOTHROTTLE_CONCURRENCY_BACKOFF_FACTOR`
+    (default: 2), and a gradient between the no-load and the current latency
+    lets it grow while the latency is stable, up to
+    `AUTOTHROTTLE_MAX_CONCURRENCY` (default: the slot's concurrency). The delay
+    is left to AutoThrottle's latency based formula in that mode.
+
+    With `AUTOTHROTTLE_TARGET_RATE` (requests per second per slot) set, that
+    formula aims for the target rate instead, slowed down only as far as the
+    `AUTOTHROTTLE_LATENCY_QUANTILE` (default: 0.5) of the slot's last
+    `AUTOTHROTTLE_LATENCY_WINDOW` (default: 100) latencies requires to keep
+    `AUTOTHROTTLE_TARGET_CONCURRENCY` requests in flight. A single slow response
+    hardly moves a quantile, so the delay doesn't swing with every sample.
+
+    Several processes crawling the same domains can share their backoffs
+    through `AUTOTHROTTLE_SHARED_STATE`: the path of an SQLite file (WAL mode)
+    for processes on one host, or a `redis://` URL. Each backoff is recorded
+    there. When a process gets a throttled response, or else at most every
+    `AUTOTHROTTLE_SHARED_STATE_INTERVAL` (default: 1) seconds per slot, it
+    looks for backoffs of the others it hasn't seen yet, backs off as well (but
+    not beyond the other process's delay) and recovers like from its own
+    backoff. Throttled responses to requests sent before the last backoff don't
+    back off again, so a wave of errors slows down all processes once. Backoffs
+    older than `AUTOTHROTTLE_SHARED_STATE_TTL` (default: 60) seconds are
+    ignored.
+
+    With `AUTOTHROTTLE_SNAPSHOT` (the path of a JSON file) set, the delay of
+    every slot and whether it was still recovering from a backoff are saved
+    when the spider closes, and the next crawl starts each slot from there
+    instead of `AUTOTHROTTLE_START_DELAY`. The older a snapshot, the closer its
+    delay moves back to the start delay: half of the difference is gone after
+    `AUTOTHROTTLE_SNAPSHOT_HALF_LIFE` (default: 86400) seconds. Slots configured
+    in `DOWNLOAD_SLOTS` keep their settings.
+    """
 
     @classmethod
     def from_crawler(cls, crawler: Crawler) -> NicerAutoThrottle:
         http_codes_settings = crawler.settings.getlist("AUTOTHROTTLE_HTTP_CODES")
 
         try:
-            http_codes = (
+            http_codes = tuple(
                 int(http_code) for http_code in arg_to_iter(http_codes_settings)
             )
 
@@ -50,20 +191,130 @@ class NicerAutoThrottle(AutoThrottle):
         )
         LOGGER.info("Throttle requests on status codes: %s", sorted(self.http_codes))
 
+        settings = crawler.settings
+        self.backoff_factor = settings.getfloat("AUTOTHROTTLE_BACKOFF_FACTOR", 2)
+        self.recovery_responses = settings.getint("AUTOTHROTTLE_RECOVERY_RESPONSES", 10)
+        self.recovery_step = settings.getfloat("AUTOTHROTTLE_RECOVERY_STEP", 0.5)
+        # Consecutive healthy responses of the slots recovering from a backoff
+        self._healthy_responses: dict[str, int] = {}
+        # Key of the slot whose response is being adjusted to
+        self._download_slot: str | None = None
+
+        self.adapt_concurrency = settings.getbool("AUTOTHROTTLE_CONCURRENCY")
+        self.max_concurrency = settings.getint("AUTOTHROTTLE_MAX_CONCURRENCY")
+        self.concurrency_backoff_factor = settings.getfloat(
+            "AUTOTHROTTLE_CONCURRENCY_BACKOFF_FACTOR",
+            2,
+        )
+        self._concurrency_limits: dict[str, _ConcurrencyLimit] = {}
+
+        self.target_rate = settings.getfloat("AUTOTHROTTLE_TARGET_RATE")
+        self.latency_quantile = settings.getfloat("AUTOTHROTTLE_LATENCY_QUANTILE", 0.5)
+        self.latency_window = settings.getint("AUTOTHROTTLE_LATENCY_WINDOW", 100)
+        self._latencies: dict[str, _LatencyWindow] = {}
+        self._responses_count = 0
+
+        try:
+            from scrapy_extensions.throttlestate import (
+                throttle_state_from_settings,
+            )
+
+            self.shared_state: ThrottleState | None = throttle_state_from_settings(
+                settings,
+            )
+        except Exception as exc:
+            LOGGER.exception(
+                "Invalid AUTOTHROTTLE_SHARED_STATE: %r",
+                settings.get("AUTOTHROTTLE_SHARED_STATE"),
+            )
+            raise NotConfigured from exc
+        self.shared_state_interval = settings.getfloat(
+            "AUTOTHROTTLE_SHARED_STATE_INTERVAL",
+            1,
+        )
+        # When each slot's shared backoff was last read (monotonic clock), the
+        # time of the last one seen, and since when the slot is backed off
+        self._shared_reads: dict[str, float] = {}
+        self._shared_seen: dict[str, float] = {}
+        self._shared_backoffs: dict[str, float] = {}
+        if self.shared_state is not None:
+            crawler.signals.connect(self._close_shared_state, signal=spider_closed)
+
+        self.snapshot_path = settings.get("AUTOTHROTTLE_SNAPSHOT")
+        self.snapshot_half_life = settings.getfloat(
+            "AUTOTHROTTLE_SNAPSHOT_HALF_LIFE",
+            86400,
+        )
+        # Snapshots of the last crawl, and the slots seen in this one with the
+        # time of their last response
+        self._snapshots: dict[str, SlotSnapshot] = {}
+        self._snapshot_slots: dict[str, tuple[Slot, float]] = {}
+        # Slots that were still recovering from a backoff in the last crawl
+        self._warm_recovering: set[str] = set()
+        if self.snapshot_path:
+            crawler.signals.connect(self._save_snapshot, signal=spider_closed)
+
+    def _spider_opened(self, spider: Spider) -> None:
+        super()._spider_opened(spider)
+        if self.snapshot_path:
+            self._warm_start()
+
+    def _response_downloaded(
+        self,
+        response: Response,
+        request: Request,
+        spider: Spider,
+    ) -> None:
+        # The response isn't tied to its request yet, and `_adjust_delay`
+        # only gets the response, so remember the request's slot
+        self._download_slot = request.meta.get("download_slot")
+        try:
+            super()._response_downloaded(response, request, spider)
+        finally:
+            self._download_slot = None
+
     def _adjust_delay(
         self,
         slot: Slot,
         latency: float,
         response: Response,
     ) -> None:
-        super()._adjust_delay(slot, latency, response)
+        key = (
+            response.request.meta.get("download_slot")
+            if response.request is not None
+            else self._download_slot
+        )
+
+        self._track_response(key, slot)
+
+        if self.target_rate and key is not None and response.status == 200:  # noqa: PLR2004
+            # Like AutoThrottle, ignore error pages, which tend to be faster
+            self._record_latency(key, latency)
 
-        if response.status not in self.http_codes:
+        if self.adapt_concurrency and key is not None:
+            self._adjust_concurrency(key, slot, latency, response)
+            self._latency_delay(key, slot, latency, response)
             return
 
-        new_delay = (
-            min(2 * slot.delay, self.maxdelay) if self.maxdelay else 2 * slot.delay
-        )
+        throttled = response.status in self.http_codes
+        if key is not None:
+            self._adopt_shared_backoff(key, slot, force=throttled)
+
+        if not throttled:
+            if key in self._healthy_responses:
+                self._recover(key, slot, latency)
+            else:
+                self._latency_delay(key, slot, latency, response)
+            return
+
+        self._latency_delay(key, slot, latency, response)
+        if key is not None and self._backed_off_since(key, latency):
+            return
+
+        new_delay = self.backoff_factor * slot.delay
+        new_delay = min(new_delay, self.maxdelay) if self.maxdelay else new_delay
+        if self.recovery_responses and key is not None:
+            self._healthy_responses[key] = 0
 
         LOGGER.debug(
             "Status <%d> throttled from %.1fs to %.1fs: %r",
@@ -74,6 +325,277 @@ class NicerAutoThrottle(AutoThrottle):
         )
 
         slot.delay = new_delay
+        if key is not None:
+            self._share_backoff(key, new_delay)
+
+    def _record_latency(self, key: str, latency: float) -> None:
+        window = self._latencies.get(key)
+        if window is None:
+            window = _LatencyWindow(self.latency_window)
+            self._latencies[key] = window
+        window.add(latency)
+
+    def _target_delay(self, key: str | None, latency: float) -> float:
+        window = self._latencies.get(key) if key is not None else None
+        if not self.target_rate or not window:
+            return max(latency / self.target_concurrency, self.mindelay)
+
+        quantile = window.quantile(self.latency_quantile)
+        return max(
+            1 / self.target_rate,
+            quantile / self.target_concurrency,
+            self.mindelay,
+        )
+
+    def _latency_delay(
+        self,
+        key: str | None,
+        slot: Slot,
+        latency: float,
+        response: Response,
+    ) -> None:
+        if not self.target_rate:
+            super()._adjust_delay(slot, latency, response)
+            return
+
+        new_delay = self._target_delay(key, latency)
+        new_delay = min(new_delay, self.maxdelay) if self.maxdelay else new_delay
+        # Same reasoning as AutoThrottle: error pages mustn't lower the delay
+        if response.status != 200 and new_delay <= slot.delay:  # noqa: PLR2004
+            return
+        slot.delay = new_delay
+
+    def _forget_idle_slots(self) -> None:
+        # Slots the downloader dropped start over, so their state can go too
+        assert self.crawler.engine is not None
+        slots = self.crawler.engine.downloader.slots
+        for states in (
+            self._healthy_responses,
+            self._concurrency_limits,
+            self._latencies,
+            self._shared_reads,
+            self._shared_seen,
+            self._shared_backoffs,
+        ):
+            for key in states.keys() - slots.keys():
+                del states[key]
+
+    def _adopt_shared_backoff(self, key: str, slot: Slot, *, force: bool) -> None:
+        if self.shared_state is None:
+            return
+
+        now = time.monotonic()
+        last_read = self._shared_reads.get(key, -math.inf)
+        if not force and now - last_read < self.shared_state_interval:
+            return
+        self._shared_reads[key] = now
+
+        try:
+            shared = self.shared_state.last_backoff(key)
+        except Exception:
+            LOGGER.exception("Unable to read the shared backoff of slot <%s>", key)
+            return
+
+        if shared is None or shared.time <= self._shared_seen.get(key, -math.inf):
+            return
+        self._shared_seen[key] = shared.time
+
+        # Back off like from our own throttled response, but not beyond the
+        # other process, whose delay might have grown over several waves
+        new_delay = min(self.backoff_factor * slot.delay, shared.delay)
+        new_delay = min(new_delay, self.maxdelay) if self.maxdelay else new_delay
+        if new_delay <= slot.delay:
+            return
+
+        LOGGER.debug(
+            "Slot <%s> adopted shared backoff from %.2fs to %.2fs",
+            key,
+            slot.delay,
+            new_delay,
+        )
+
+        # Requests sent until now still went out at the previous delay
+        self._shared_backoffs[key] = time.time()
+        slot.delay = new_delay
+        if self.recovery_responses:
+            self._healthy_responses.setdefault(key, 0)
+
+    def _backed_off_since(self, key: str, latency: float) -> bool:
+        """Whether the slot backed off since the response's request was sent.
+
+        That backoff already reacted to the same wave of throttled responses,
+        which would otherwise multiply the delay once per process and request.
+        """
+
+        if self.shared_state is None:
+            return False
+        return time.time() - latency < self._shared_backoffs.get(key, -math.inf)
+
+    def _share_backoff(self, key: str, delay: float) -> None:
+        if self.shared_state is None:
+            return
+
+        from scrapy_extensions.throttlestate import Backoff
+
+        shared = Backoff(delay, time.time())
+        self._shared_seen[key] = self._shared_backoffs[key] = shared.time
+        try:
+            self.shared_state.record_backoff(key, shared)
+        except Exception:
+            LOGGER.exception("Unable to share the backoff of slot <%s>", key)
+
+    def _close_shared_state(self) -> None:
+        if self.shared_state is not None:
+            self.shared_state.close()
+
+    def _warm_start(self) -> None:
+        from scrapy_extensions.throttlestate import read_snapshot
+
+        try:
+            self._snapshots = read_snapshot(self.snapshot_path)
+        except FileNotFoundError:
+            LOGGER.info("No throttle snapshot at <%s> yet", self.snapshot_path)
+            return
+        except Exception:
+            LOGGER.exception(
+                "Unable to read throttle snapshot <%s>",
+                self.snapshot_path,
+            )
+            return
+
+        # Settings of new slots, which Scrapy fills from DOWNLOAD_SLOTS
+        assert self.crawler.engine is not None
+        per_slot_settings = getattr(
+            self.crawler.engine.downloader,
+            "per_slot_settings",
+            None,
+        )
+        if per_slot_settings is None:
+            LOGGER.warning("This version of Scrapy can't warm start download slots")
+            return
+
+        now = time.time()
+        # Like `_start_delay`, whose arguments differ between Scrapy versions
+        start_delay = max(
+            self.mindelay,
+            self.crawler.settings.getfloat("AUTOTHROTTLE_START_DELAY"),
+        )
+        for key, snapshot in self._snapshots.items():
+            if key in per_slot_settings:
+                continue
+
+            weight = 0.5 ** (max(now - snapshot.time, 0) / self.snapshot_half_life)
+            delay = max(start_delay + weight * (snapshot.delay - start_delay), 0)
+            delay = max(delay, self.mindelay)
+            delay = min(delay, self.maxdelay) if self.maxdelay else delay
+            per_slot_settings[key] = {"delay": delay}
+            if snapshot.recovering and self.recovery_responses:
+                self._warm_recovering.add(key)
+
+        LOGGER.info(
+            "Warm started %d slots from throttle snapshot <%s>",
+            len(self._snapshots),
+            self.snapshot_path,
+        )
+
+    def _track_response(self, key: str | None, slot: Slot) -> None:
+        self._responses_count += 1
+        if self._responses_count % 1000 == 0:
+            self._forget_idle_slots()
+
+        if not self.snapshot_path or key is None:
+            return
+        # Also keeps the delay of slots the downloader drops for the snapshot;
+        # `slot.lastseen` isn't UNIX time in every version of Scrapy
+        self._snapshot_slots[key] = (slot, time.time())
+        if key in self._warm_recovering:
+            self._warm_recovering.discard(key)
+            self._healthy_responses.setdefault(key, 0)
+
+    def _save_snapshot(self) -> None:
+        from scrapy_extensions.throttlestate import SlotSnapshot, write_snapshot
+
+        now = time.time()
+        # Snapshots this old have decayed to the start delay anyway
+        max_age = _SNAPSHOT_HALF_LIVES * self.snapshot_half_life
+        snapshots = {
+            key: snapshot
+            for key, snapshot in self._snapshots.items()
+            if now - snapshot.time < max_age
+        }
+        for key, (slot, last_response) in self._snapshot_slots.items():
+            snapshots[key] = SlotSnapshot(
+                delay=slot.delay,
+                time=last_response,
+                recovering=key in self._healthy_responses,
+            )
+
+        try:
+            write_snapshot(self.snapshot_path, snapshots)
+        except Exception:
+            LOGGER.exception(
+                "Unable to save throttle snapshot <%s>",
+                self.snapshot_path,
+            )
+            return
+
+        LOGGER.info(
+            "Saved %d slots to throttle snapshot <%s>",
+            len(snapshots),
+            self.snapshot_path,
+        )
+
+    def _adjust_concurrency(
+        self,
+        key: str,
+        slot: Slot,
+        latency: float,
+        response: Response,
+    ) -> None:
+        limit = self._concurrency_limits.get(key)
+        if limit is None:
+            limit = _ConcurrencyLimit(
+                limit=slot.concurrency,
+                max_limit=self.max_concurrency or slot.concurrency,
+            )
+            self._concurrency_limits[key] = limit
+
+        concurrency = (
+            limit.backoff(self.concurrency_backoff_factor)
+            if response.status in self.http_codes
+            else limit.update(latency)
+        )
+        if concurrency != slot.concurrency:
+            LOGGER.debug(
+                "Slot <%s> concurrency changed from %d to %d",
+                key,
+                slot.concurrency,
+                concurrency,
+            )
+        # Also reapplied to slots the downloader recreated with the default
+        slot.concurrency = concurrency
+
+    def _recover(self, key: str, slot: Slot, latency: float) -> None:
+        self._healthy_responses[key] += 1
+        if self._healthy_responses[key] < self.recovery_responses:
+            return
+        self._healthy_responses[key] = 0
+
+        # What AutoThrottle's formula aims for, at least the minimum delay
+        target_delay = self._target_delay(key, latency)
+        rate = 1 / slot.delay if slot.delay > 0 else math.inf
+        new_delay = max(1 / (rate + self.recovery_step), target_delay)
+
+        LOGGER.debug(
+            "Slot <%s> recovered from %.2fs to %.2fs delay",
+            key,
+            slot.delay,
+            new_delay,
+        )
+
+        slot.delay = new_delay
+        if new_delay <= target_delay:
+            del self._healthy_responses[key]
 
 
 # see https://github.com/scrapy/scrapy/issues/2173
@@ -2,55 +2,370 @@
 
 from __future__ import annotations
 
+import asyncio
+import inspect
+import json
 import logging
-from functools import lru_cache
-from importlib.util import find_spec
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache, partial
+from io import BytesIO
 from pathlib import Path
-from typing import TYPE_CHECKING, Any
+from typing import TYPE_CHECKING, Any, TypeGuard, TypeVar
+from urllib.parse import urlparse
 
 from itemadapter.adapter import ItemAdapter
 from scrapy.exceptions import NotConfigured
+from scrapy.pipelines.files import FSFilesStore
+from scrapy.pipelines.images import ImagesPipeline
+from scrapy.signals import spider_closed, spider_opened
+from scrapy.utils.defer import deferred_from_coro, maybe_deferred_to_future
 from scrapy.utils.misc import arg_to_iter
+from twisted.internet.defer import Deferred
 
 if TYPE_CHECKING:
-    from scrapy import Spider
+    from collections.abc import Callable, Coroutine, Mapping
+
+    import PIL.Image
+    from scrapy import Request, Spider
     from scrapy.crawler import Crawler
+    from scrapy.http import Response
+    from scrapy.pipelines.media import MediaPipeline
+    from scrapy.settings import Settings
+    from scrapy.statscollectors import StatsCollector
+
+    from scrapy_extensions.stores import StoreReader
+    from scrapy_extensions.utils import BlurHashCache, HammingIndex
 
 LOGGER = logging.getLogger(__name__)
 
+_T = TypeVar("_T")
 
-@lru_cache(maxsize=1024)
-def _calculate_blurhash(
-    path: Path,
+BLURHASH_EXECUTORS: dict[
+    str,
+    type[ThreadPoolExecutor | ProcessPoolExecutor] | None,
+] = {
+    "inline": None,
+    "thread": ThreadPoolExecutor,
+    "process": ProcessPoolExecutor,
+}
+
+_EXIF_ORIENTATION = 0x0112
+
+
+def _as_stored(
+    image: PIL.Image.Image,
+    exif_transpose: bool,  # noqa: FBT001
+) -> PIL.Image.Image:
+    """Convert an image like `ImagesPipeline.get_images` does before storing it.
+
+    That is, rotate it according to its EXIF orientation if `exif_transpose` is
+    set and composite transparent images onto white in `convert_image`. Other
+    images are left alone, so they can still be drafted.
+    """
+
+    from PIL import Image, ImageOps
+
+    orientation = image.getexif().get(_EXIF_ORIENTATION, 1) if exif_transpose else 1
+    if orientation == 1 and image.mode not in {"RGBA", "P"}:
+        return image
+
+    if exif_transpose:
+        # Like in `get_images`, `convert_image` only sees the transposed copy
+        image = ImageOps.exif_transpose(image)
+    if image.mode == "P" or (image.format in {"PNG", "WEBP"} and image.mode == "RGBA"):
+        image = image.convert("RGBA")
+        background = Image.new("RGBA", image.size, (255, 255, 255))
+        background.paste(image, mask=image)
+        image = background.convert("RGB")
+    elif image.mode != "RGB":
+        # Drops the alpha channel before it's averaged in the thumbnail
+        image = image.convert("RGB")
+    return image
+
+
+def _blurhash_or_none(  # noqa: PLR0913
+    image: Path | bytes,
     x_components: int,
     y_components: int,
+    adaptive: bool = False,  # noqa: FBT001, FBT002
+    float32: bool = False,  # noqa: FBT001, FBT002
+    *,
+    as_stored: bool = False,
+    exif_transpose: bool = False,
 ) -> str | None:
+    name = f"{len(image)} bytes" if isinstance(image, bytes) else image
     try:
+        from PIL import Image
+
         from scrapy_extensions.utils import calculate_blurhash
 
+        source = BytesIO(image) if isinstance(image, bytes) else image
         blurhash = calculate_blurhash(
-            image=path,
+            image=(
+                _as_stored(Image.open(source), exif_transpose) if as_stored else source
+            ),
             x_components=x_components,
             y_components=y_components,
+            adaptive=adaptive,
+            float32=float32,
         )
 
-        LOGGER.debug("BlurHash of <%s> is <%s>", path, blurhash)
+        LOGGER.debug("BlurHash of <%s> is <%s>", name, blurhash)
 
     except Exception:
-        LOGGER.exception("Unable to calculate BlurHash for image <%s>", path)
+        LOGGER.exception("Unable to calculate BlurHash for image <%s>", name)
         blurhash = None
 
     return blurhash
 
 
+@lru_cache(maxsize=1024)
+def _calculate_blurhash(
+    path: Path,
+    x_components: int,
+    y_components: int,
+    adaptive: bool = False,  # noqa: FBT001, FBT002
+    float32: bool = False,  # noqa: FBT001, FBT002
+) -> str | None:
+    return _blurhash_or_none(path, x_components, y_components, adaptive, float32)
+
+
+def _calculate_blurhash_any(
+    image: Path | bytes,
+    x_components: int,
+    y_components: int,
+    adaptive: bool = False,  # noqa: FBT001, FBT002
+    float32: bool = False,  # noqa: FBT001, FBT002
+) -> str | None:
+    # Only cache by path, image content would fill up the memory
+    if isinstance(image, bytes):
+        return _blurhash_or_none(image, x_components, y_components, adaptive, float32)
+    return _calculate_blurhash(image, x_components, y_components, adaptive, float32)
+
+
+def _calculate_blurhash_batch(
+    images: tuple[Path | bytes, ...],
+    x_components: int,
+    y_components: int,
+    adaptive: bool = False,  # noqa: FBT001, FBT002
+    float32: bool = False,  # noqa: FBT001, FBT002
+) -> list[str | None]:
+    try:
+        from scrapy_extensions.utils import calculate_blurhash_batch
+
+        blurhashes: list[str | None] = list(
+            calculate_blurhash_batch(
+                images=(
+                    BytesIO(image) if isinstance(image, bytes) else image
+                    for image in images
+                ),
+                x_components=x_components,
+                y_components=y_components,
+                adaptive=adaptive,
+                float32=float32,
+            ),
+        )
+
+        LOGGER.debug("Calculated BlurHashes of %d images in a batch", len(images))
+
+    except Exception:
+        LOGGER.exception(
+            "Unable to calculate BlurHashes in a batch, falling back to single images",
+        )
+        blurhashes = [
+            _calculate_blurhash_any(
+                image,
+                x_components,
+                y_components,
+                adaptive,
+                float32,
+            )
+            for image in images
+        ]
+
+    return blurhashes
+
+
+def _fits_decode_budget(
+    image: Path | bytes,
+    size: tuple[int, int],
+    max_pixels: int | None,
+    max_bytes: int | None,
+) -> bool:
+    if not max_pixels and not max_bytes:
+        return True
+
+    from scrapy_extensions.utils import fits_decode_budget
+
+    name = f"{len(image)} bytes" if isinstance(image, bytes) else image
+    try:
+        fits = fits_decode_budget(
+            image=BytesIO(image) if isinstance(image, bytes) else image,
+            size=size,
+            max_pixels=max_pixels,
+            max_bytes=max_bytes,
+        )
+    except Exception:
+        # Let the decoder report broken images as usual
+        LOGGER.debug("Unable to read header of image <%s>", name, exc_info=True)
+        return True
+
+    if not fits:
+        LOGGER.warning("Skipping image <%s> exceeding the decode budget", name)
+    return fits
+
+
+def _calculate_if_fits(
+    calculation: Callable[[], _T],
+    image: Path | bytes,
+    size: tuple[int, int],
+    max_pixels: int | None,
+    max_bytes: int | None,
+) -> tuple[bool, _T | None]:
+    # Reading the header may block as well, so it's done in the same job
+    if not _fits_decode_budget(image, size, max_pixels, max_bytes):
+        return False, None
+    return True, calculation()
+
+
+def _calculate_blurhash_batch_if_fits(  # noqa: PLR0913, PLR0917
+    images: dict[int, Path | bytes],
+    size: tuple[int, int],
+    max_pixels: int | None,
+    max_bytes: int | None,
+    x_components: int,
+    y_components: int,
+    adaptive: bool,  # noqa: FBT001
+    float32: bool,  # noqa: FBT001
+) -> dict[int, str | None]:
+    fitting = {
+        i: image
+        for i, image in images.items()
+        if _fits_decode_budget(image, size, max_pixels, max_bytes)
+    }
+    if not fitting:
+        return {}
+    blurhashes = _calculate_blurhash_batch(
+        tuple(fitting.values()),
+        x_components,
+        y_components,
+        adaptive,
+        float32,
+    )
+    return dict(zip(fitting, blurhashes, strict=True))
+
+
+def _calculate_placeholders(  # noqa: PLR0913, PLR0917
+    image: Path | bytes,
+    encoders: tuple[str, ...],
+    x_components: int,
+    y_components: int,
+    adaptive: bool,  # noqa: FBT001
+    float32: bool,  # noqa: FBT001
+    lqip_size: int,
+) -> str | None:
+    name = f"{len(image)} bytes" if isinstance(image, bytes) else image
+    try:
+        from scrapy_extensions.placeholders import calculate_placeholders
+
+        placeholders = calculate_placeholders(
+            image=BytesIO(image) if isinstance(image, bytes) else image,
+            encoders=encoders,
+            x_components=x_components,
+            y_components=y_components,
+            adaptive=adaptive,
+            float32=float32,
+            lqip_size=lqip_size,
+        )
+
+        LOGGER.debug("Placeholders of <%s> are %s", name, placeholders)
+
+    except Exception:
+        LOGGER.exception("Unable to calculate placeholders for image <%s>", name)
+        return None
+
+    # Serialised, so they can be cached and shared like a single BlurHash
+    return json.dumps(placeholders)
+
+
+def _is_local_store(uri: str | Path) -> bool:
+    # Same logic as FilesPipeline, to support Windows paths like C:\\some\\dir
+    return Path(uri).is_absolute() or urlparse(str(uri)).scheme in {"", "file"}
+
+
+def _require_asyncio(feature: str) -> None:
+    from scrapy_extensions.utils import asyncio_available
+
+    if not asyncio_available():
+        LOGGER.error(
+            "%s requires asyncio, set TWISTED_REACTOR to "
+            "'twisted.internet.asyncioreactor.AsyncioSelectorReactor'",
+            feature,
+        )
+        raise NotConfigured
+
+
+def _blurhash_executor(settings: Settings) -> Executor | None:
+    executor_name = settings.get("BLURHASH_EXECUTOR") or "inline"
+    if executor_name not in BLURHASH_EXECUTORS:
+        LOGGER.error(
+            "Invalid BLURHASH_EXECUTOR <%s>, must be one of %s",
+            executor_name,
+            sorted(BLURHASH_EXECUTORS),
+        )
+        raise NotConfigured
+
+    executor_cls = BLURHASH_EXECUTORS[executor_name]
+    if executor_cls is None:
+        return None
+
+    _require_asyncio(f"BLURHASH_EXECUTOR <{executor_name}>")
+    workers = settings.getint("BLURHASH_WORKERS") or None
+    return executor_cls(max_workers=workers)
+
+
+def _limit_decodes(settings: Settings) -> None:
+    max_decodes = settings.getint("BLURHASH_MAX_DECODES")
+    if max_decodes:
+        from scrapy_extensions.utils import limit_decodes
+
+        limit_decodes(max_decodes)
+
+
+async def _resolved(result: Any) -> Any:
+    # Scrapy's media pipeline hooks return values, Deferreds or coroutines,
+    # depending on the version
+    if isinstance(result, Deferred):
+        return await maybe_deferred_to_future(result)
+    if inspect.isawaitable(result):
+        return await result
+    return result
+
+
 class BlurHashPipeline:
     """Calculate the BlurHashes of the downloaded images."""
 
+    FIELD_SETTING = "BLURHASH_FIELD"
+    STATS_PREFIX = "blurhash"
+
     images_store: Path
     source_field: str
     target_field: str
     x_components: int
     y_components: int
+    adaptive_components: bool
+    float32: bool
+    batch_size: int
+    executor: Executor | None
+    cache: BlurHashCache | None
+    stats: StatsCollector | None
+    store_reader: StoreReader | None
+    dedup_max_entries: int
+    max_pixels: int | None
+    max_bytes: int | None
+    warm_up: bool
 
     @classmethod
     def from_crawler(cls, crawler: Crawler) -> BlurHashPipeline:
@@ -58,30 +373,85 @@ class BlurHashPipeline:
 
         images_store = crawler.settings.get("IMAGES_STORE")
         source_field = crawler.settings.get("IMAGES_RESULT_FIELD")
-        target_field = crawler.settings.get("BLURHASH_FIELD")
+        target_field = crawler.settings.get(cls.FIELD_SETTING)
 
         if not images_store or not source_field or not target_field:
             raise NotConfigured
 
-        if not find_spec("scrapy_extensions.utils", "calculate_blurhash"):
+        missing = cls._missing_dependencies(crawler.settings)
+        if missing:
             LOGGER.error(
-                "Unable to import libraries required for BlurHash, "
+                "Unable to import %s required for BlurHash, "
                 "install with `blurhash` option",
+                ", ".join(missing),
             )
             raise NotConfigured
 
         x_components = crawler.settings.getint("BLURHASH_X_COMPONENTS", 4)
         y_components = crawler.settings.getint("BLURHASH_Y_COMPONENTS", 4)
+        adaptive_components = crawler.settings.getbool(
+            "BLURHASH_ADAPTIVE_COMPONENTS",
+        )
+        float32 = crawler.settings.getbool("BLURHASH_FLOAT32")
+        batch_size = crawler.settings.getint("BLURHASH_BATCH_SIZE", 8)
+
+        executor = _blurhash_executor(crawler.settings)
+
+        _limit_decodes(crawler.settings)
+
+        cache_uri = crawler.settings.get("BLURHASH_CACHE_URI")
+        if cache_uri:
+            from scrapy_extensions.utils import BlurHashCache
+
+            cache = BlurHashCache.from_uri(
+                uri=cache_uri,
+                max_entries=crawler.settings.getint("BLURHASH_CACHE_MAX_ENTRIES"),
+            )
+        else:
+            cache = None
 
-        return cls(
+        if _is_local_store(images_store):
+            store_reader = None
+        else:
+            from scrapy_extensions.stores import StoreReader
+
+            _require_asyncio("BlurHash for a remote IMAGES_STORE")
+            # Let Scrapy configure the store from the settings as usual
+            store = ImagesPipeline.from_crawler(crawler).store
+            store_reader = StoreReader(
+                store=store,
+                max_concurrency=crawler.settings.getint(
+                    "BLURHASH_STORE_CONCURRENCY",
+                    8,
+                ),
+            )
+
+        pipeline = cls(
             images_store=images_store,
             source_field=source_field,
             target_field=target_field,
             x_components=x_components,
             y_components=y_components,
+            adaptive_components=adaptive_components,
+            float32=float32,
+            batch_size=batch_size,
+            executor=executor,
+            cache=cache,
+            stats=crawler.stats,
+            store_reader=store_reader,
+            dedup_max_entries=crawler.settings.getint(
+                "BLURHASH_DEDUP_MAX_ENTRIES",
+                100_000,
+            ),
+            max_pixels=crawler.settings.getint("BLURHASH_MAX_PIXELS") or None,
+            max_bytes=crawler.settings.getint("BLURHASH_MAX_BYTES") or None,
+            warm_up=crawler.settings.getbool("BLURHASH_WARM_UP", default=True),
         )
+        crawler.signals.connect(pipeline.spider_opened, signal=spider_opened)
+        crawler.signals.connect(pipeline.spider_closed, signal=spider_closed)
+        return pipeline
 
-    def __init__(
+    def __init__(  # noqa: PLR0913
         self,
         *,
         images_store: str | Path,
@@ -89,43 +459,596 @@ class BlurHashPipeline:
         target_field: str,
         x_components: int = 4,
         y_components: int = 4,
+        adaptive_components: bool = False,
+        float32: bool = False,
+        batch_size: int = 8,
+        executor: Executor | None = None,
+        cache: BlurHashCache | None = None,
+        stats: StatsCollector | None = None,
+        store_reader: StoreReader | None = None,
+        dedup_max_entries: int = 100_000,
+        max_pixels: int | None = None,
+        max_bytes: int | None = None,
+        warm_up: bool = True,
     ) -> None:
-        self.images_store = Path(images_store).resolve()
+        self.images_store = (
+            Path(images_store).resolve() if _is_local_store(images_store) else Path()
+        )
         self.source_field = source_field
         self.target_field = target_field
         self.x_components = x_components
         self.y_components = y_components
+        self.adaptive_components = adaptive_components
+        self.float32 = float32
+        self.batch_size = batch_size
+        self.executor = executor
+        self.cache = cache
+        self.stats = stats
+        self.store_reader = store_reader
+        self.dedup_max_entries = dedup_max_entries
+        self.max_pixels = max_pixels
+        self.max_bytes = max_bytes
+        self.warm_up = warm_up
+        # BlurHashes by image checksum, and calculations currently running
+        self._blurhashes: OrderedDict[tuple[str, int, int], str] = OrderedDict()
+        self._in_flight: dict[tuple[str, int, int], asyncio.Future[str | None]] = {}
 
-    def process_image_obj(
+    @classmethod
+    def _missing_dependencies(cls, settings: Settings) -> list[str]:
+        from scrapy_extensions.utils import missing_dependencies
+
+        return missing_dependencies(numba=not settings.getbool("BLURHASH_FLOAT32"))
+
+    async def spider_opened(self, spider: Spider) -> None:  # noqa: ARG002
+        """Warm up the encoder before the first item arrives.
+
+        Importing `blurhash_numba` compiles the encoder, which takes several
+        seconds and would otherwise stall the first item (and, without an
+        executor, the whole crawl). Disable with `BLURHASH_WARM_UP = False`.
+        """
+
+        if not self.warm_up:
+            return
+
+        from scrapy_extensions.utils import asyncio_available, sample_image
+
+        start = time.monotonic()
+        if asyncio_available():
+            loop = asyncio.get_running_loop()
+            image = await loop.run_in_executor(None, sample_image)
+            await loop.run_in_executor(
+                self.executor,
+                self._calculation(image, self.x_components, self.y_components),
+            )
+        else:
+            # Without asyncio there's no executor either, so warm up right here
+            self._calculation(sample_image(), self.x_components, self.y_components)()
+        LOGGER.info(
+            "Warmed up %s in %.1fs",
+            type(self).__name__,
+            time.monotonic() - start,
+        )
+
+    async def spider_closed(self, spider: Spider) -> None:  # noqa: ARG002
+        """Shut down the executor and close the cache and store, if any.
+
+        Waiting for running calculations and store reads happens in a thread, so
+        the reactor isn't blocked meanwhile.
+        """
+
+        if self.executor is not None:
+            await asyncio.get_running_loop().run_in_executor(
+                None,
+                partial(self.executor.shutdown, wait=True, cancel_futures=True),
+            )
+        if self.store_reader is not None:
+            await asyncio.get_running_loop().run_in_executor(
+                None,
+                self.store_reader.close,
+            )
+        self._close()
+
+    def _close(self) -> None:
+        if self.executor is not None:
+            LOGGER.debug("Shutting down BlurHash executor %r", self.executor)
+            self.executor.shutdown(wait=True, cancel_futures=True)
+
+        if self.cache is not None:
+            LOGGER.debug("Closing BlurHash cache <%s>", self.cache.path)
+            self.cache.close()
+
+        if self.store_reader is not None:
+            LOGGER.debug("Closing images store reader %r", self.store_reader)
+            self.store_reader.close()
+
+    def _cache_key(
         self,
         image_obj: dict[str, Any],
-        x_components: int = 4,
-        y_components: int = 4,
+        x_components: int,
+        y_components: int,
+    ) -> str | None:
+        if self.cache is None or not image_obj.get("checksum"):
+            return None
+        return self.cache.key(
+            image_obj["checksum"],
+            x_components,
+            y_components,
+            adaptive=self.adaptive_components,
+            float32=self.float32,
+        )
+
+    def _inc_stats(self, key: str, count: int = 1) -> None:
+        if self.stats is not None and count:
+            self.stats.inc_value(f"{self.STATS_PREFIX}/{key}", count)
+
+    def _cached_blurhash(self, cache_key: str | None) -> str | None:
+        if self.cache is None or cache_key is None:
+            return None
+
+        blurhash = self.cache.get(cache_key)
+        self._inc_stats(
+            "cache_misses" if blurhash is None else "cache_hits",
+        )
+        return blurhash
+
+    @staticmethod
+    def _dedup_key(
+        image_obj: dict[str, Any],
+        x_components: int,
+        y_components: int,
+    ) -> tuple[str, int, int] | None:
+        checksum = image_obj.get("checksum")
+        return (checksum, x_components, y_components) if checksum else None
+
+    def _deduplicated(self, dedup_key: tuple[str, int, int] | None) -> str | None:
+        if dedup_key is None:
+            return None
+
+        blurhash = self._blurhashes.get(dedup_key)
+        if blurhash is not None:
+            self._blurhashes.move_to_end(dedup_key)
+            self._inc_stats("dedup_hits")
+        return blurhash
+
+    def _remember(
+        self,
+        dedup_key: tuple[str, int, int] | None,
+        blurhash: str | None,
+    ) -> None:
+        if dedup_key is None or blurhash is None or self.dedup_max_entries <= 0:
+            return
+
+        self._blurhashes[dedup_key] = blurhash
+        self._blurhashes.move_to_end(dedup_key)
+        while len(self._blurhashes) > self.dedup_max_entries:
+            self._blurhashes.popitem(last=False)
+
+    def _start_in_flight(
+        self,
+        dedup_key: tuple[str, int, int] | None,
+    ) -> asyncio.Future[str | None] | None:
+        if dedup_key is None or dedup_key in self._in_flight:
+            return None
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[dedup_key] = future
+        return future
+
+    def _finish_in_flight(
+        self,
+        dedup_key: tuple[str, int, int] | None,
+        future: asyncio.Future[str | None] | None,
+        blurhash: str | None,
+    ) -> None:
+        if dedup_key is None or future is None:
+            return
+        # Waiting calls get None if the calculation failed or was cancelled
+        if not future.done():
+            future.set_result(blurhash)
+        self._in_flight.pop(dedup_key, None)
+
+    def _lookup(
+        self,
+        dedup_key: tuple[str, int, int] | None,
+        cache_key: str | None,
+    ) -> str | None:
+        blurhash = self._deduplicated(dedup_key)
+        if blurhash is None:
+            blurhash = self._cached_blurhash(cache_key)
+            self._remember(dedup_key, blurhash)
+        return blurhash
+
+    def _cache_blurhash(self, cache_key: str | None, blurhash: str | None) -> None:
+        if self.cache is not None and cache_key is not None and blurhash is not None:
+            self.cache.set(cache_key, blurhash)
+
+    def _calculation(
+        self,
+        image: Path | bytes,
+        x_components: int,
+        y_components: int,
+    ) -> Callable[[], str | None]:
+        # A picklable callable, so it can be sent to a process pool
+        return partial(
+            _calculate_blurhash_any,
+            image,
+            x_components,
+            y_components,
+            self.adaptive_components,
+            self.float32,
+        )
+
+    def _with_blurhash(
+        self,
+        image_obj: dict[str, Any],
+        blurhash: str | None,
     ) -> dict[str, Any]:
-        """Calculate the BlurHash of a given image."""
+        # Don't modify the original object
+        return {**image_obj, "blurhash": blurhash}
 
+    def _image_full_path(self, image_obj: dict[str, Any]) -> Path | None:
         image_path = image_obj.get("path")
         if not image_path:
-            return image_obj
+            return None
 
-        image_full_path = (self.images_store / image_path).resolve()
+        image_full_path: Path = (self.images_store / image_path).resolve()
         if not image_full_path or not image_full_path.is_file():
             LOGGER.warning("Unable to locate image file <%s>", image_full_path)
-            return image_obj
+            return None
 
-        # Don't modify the original object
-        image_obj = image_obj.copy()
+        return image_full_path
 
-        image_obj["blurhash"] = _calculate_blurhash(
-            path=image_full_path,
-            x_components=x_components,
-            y_components=y_components,
+    def _decode_size(self) -> tuple[int, int]:
+        # The size of the BlurHash thumbnail, see `blurhash_thumbnail`
+        return 32 * self.x_components, 32 * self.y_components
+
+    def _fits_budget(self, image: Path | bytes | None) -> TypeGuard[Path | bytes]:
+        if image is None:
+            return False
+        fits = _fits_decode_budget(
+            image=image,
+            size=self._decode_size(),
+            max_pixels=self.max_pixels,
+            max_bytes=self.max_bytes,
         )
+        if not fits:
+            self._inc_stats("skipped_too_large")
+        return fits
 
-        return image_obj
+    def _load_images(
+        self,
+        image_objs: dict[int, dict[str, Any]],
+    ) -> dict[int, Path | bytes]:
+        if self.store_reader is None:
+            full_paths = {
+                i: self._image_full_path(image_obj)
+                for i, image_obj in image_objs.items()
+            }
+            return {
+                i: path for i, path in full_paths.items() if self._fits_budget(path)
+            }
+
+        paths = {
+            i: image_obj["path"]
+            for i, image_obj in image_objs.items()
+            if image_obj.get("path")
+        }
+        # Only for direct calls, `process_item` reads remote images asynchronously.
+        # Fetch all images concurrently to overlap the network latency.
+        contents = self.store_reader.read_many(paths.values())
+        return {
+            i: content
+            for i, content in zip(paths, contents, strict=True)
+            if self._fits_budget(content)
+        }
+
+    async def _load_image_async(
+        self,
+        image_obj: dict[str, Any],
+    ) -> Path | bytes | None:
+        image: Path | bytes | None
+        if self.store_reader is None:
+            image = self._image_full_path(image_obj)
+        elif image_obj.get("path"):
+            image = await self.store_reader.read_async(image_obj["path"])
+        else:
+            image = None
+        # The decode budget is checked in the executor, see `_run_if_fits`
+        return image
 
-    def process_item(self, item: Any, spider: Spider) -> Any:  # noqa: ARG002
-        """Calculate the BlurHashes of the downloaded images."""
+    async def _load_images_async(
+        self,
+        image_objs: dict[int, dict[str, Any]],
+    ) -> dict[int, Path | bytes]:
+        images = await asyncio.gather(
+            *(self._load_image_async(image_obj) for image_obj in image_objs.values()),
+        )
+        return {
+            i: image
+            for i, image in zip(image_objs, images, strict=True)
+            if image is not None
+        }
+
+    def process_image_obj(
+        self,
+        image_obj: dict[str, Any],
+        x_components: int | None = None,
+        y_components: int | None = None,
+    ) -> dict[str, Any]:
+        """Calculate the BlurHash of a given image.
+
+        The number of components defaults to the pipeline's configuration.
+        """
+
+        x_components = x_components or self.x_components
+        y_components = y_components or self.y_components
+        dedup_key = self._dedup_key(image_obj, x_components, y_components)
+        cache_key = self._cache_key(image_obj, x_components, y_components)
+        blurhash = self._lookup(dedup_key, cache_key)
+
+        if blurhash is None:
+            image = self._load_images({0: image_obj}).get(0)
+            if image is None:
+                return image_obj
+
+            blurhash = self._calculation(image, x_components, y_components)()
+            self._inc_stats("computed")
+            self._cache_blurhash(cache_key, blurhash)
+            self._remember(dedup_key, blurhash)
+
+        return self._with_blurhash(image_obj, blurhash)
+
+    async def process_image_obj_async(
+        self,
+        image_obj: dict[str, Any],
+        x_components: int | None = None,
+        y_components: int | None = None,
+    ) -> dict[str, Any]:
+        """Calculate the BlurHash of a given image in the executor.
+
+        Concurrent calls for images with the same checksum share a single
+        calculation.
+        """
+
+        x_components = x_components or self.x_components
+        y_components = y_components or self.y_components
+        dedup_key = self._dedup_key(image_obj, x_components, y_components)
+        cache_key = self._cache_key(image_obj, x_components, y_components)
+        blurhash = self._lookup(dedup_key, cache_key)
+
+        if blurhash is None and dedup_key is not None and dedup_key in self._in_flight:
+            # If the other calculation failed, try again with this image
+            # Shielded, so cancelling this call doesn't cancel the shared future
+            blurhash = await asyncio.shield(self._in_flight[dedup_key])
+            if blurhash is not None:
+                self._inc_stats("dedup_hits")
+
+        if blurhash is None:
+            future = self._start_in_flight(dedup_key)
+            try:
+                image = await self._load_image_async(image_obj)
+                if image is None:
+                    return image_obj
+
+                fits, blurhash = await self._run_if_fits(
+                    self._calculation(image, x_components, y_components),
+                    image,
+                )
+                if not fits:
+                    return image_obj
+
+                self._inc_stats("computed")
+                self._cache_blurhash(cache_key, blurhash)
+                self._remember(dedup_key, blurhash)
+            finally:
+                self._finish_in_flight(dedup_key, future, blurhash)
+
+        return self._with_blurhash(image_obj, blurhash)
+
+    async def _run(self, calculation: Callable[[], _T]) -> _T:
+        # Without an executor, calculate right here like the synchronous methods
+        if self.executor is None:
+            return calculation()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, calculation)
+
+    async def _run_if_fits(
+        self,
+        calculation: Callable[[], _T],
+        image: Path | bytes,
+    ) -> tuple[bool, _T | None]:
+        fits, result = await self._run(
+            partial(
+                _calculate_if_fits,
+                calculation,
+                image,
+                self._decode_size(),
+                self.max_pixels,
+                self.max_bytes,
+            ),
+        )
+        if not fits:
+            self._inc_stats("skipped_too_large")
+        return fits, result
+
+    def _use_batch(self, image_objs: tuple[dict[str, Any], ...]) -> bool:
+        return self.batch_size > 0 and len(image_objs) >= self.batch_size
+
+    def _prepare_batch(
+        self,
+        image_objs: tuple[dict[str, Any], ...],
+    ) -> tuple[
+        list[tuple[str, int, int] | None],
+        list[str | None],
+        list[str | None],
+        dict[int, dict[str, Any]],
+    ]:
+        dedup_keys = [
+            self._dedup_key(image_obj, self.x_components, self.y_components)
+            for image_obj in image_objs
+        ]
+        cache_keys = [
+            self._cache_key(image_obj, self.x_components, self.y_components)
+            for image_obj in image_objs
+        ]
+        blurhashes = [
+            self._lookup(dedup_key, cache_key)
+            for dedup_key, cache_key in zip(dedup_keys, cache_keys, strict=True)
+        ]
+
+        # Only calculate the first of several images with the same checksum
+        missing: dict[int, dict[str, Any]] = {}
+        seen: set[tuple[str, int, int] | None] = set()
+        for i, image_obj in enumerate(image_objs):
+            if blurhashes[i] is None and (
+                dedup_keys[i] is None or dedup_keys[i] not in seen
+            ):
+                missing[i] = image_obj
+                seen.add(dedup_keys[i])
+
+        return dedup_keys, cache_keys, blurhashes, missing
+
+    def _finish_batch(
+        self,
+        image_objs: tuple[dict[str, Any], ...],
+        dedup_keys: list[tuple[str, int, int] | None],
+        cache_keys: list[str | None],
+        blurhashes: list[str | None],
+        computed: dict[int, str | None],
+    ) -> list[dict[str, Any]]:
+        self._inc_stats("computed", len(computed))
+        for i, blurhash in computed.items():
+            blurhashes[i] = blurhash
+            self._cache_blurhash(cache_keys[i], blurhash)
+            self._remember(dedup_keys[i], blurhash)
+
+        # BlurHashes for the duplicates within this batch
+        shared: dict[tuple[str, int, int] | None, str] = {
+            dedup_key: blurhash
+            for dedup_key, blurhash in zip(dedup_keys, blurhashes, strict=True)
+            if dedup_key is not None and blurhash is not None
+        }
+
+        results = []
+        for i, image_obj in enumerate(image_objs):
+            if blurhashes[i] is None and i not in computed:
+                if dedup_keys[i] not in shared:
+                    results.append(image_obj)
+                    continue
+                blurhashes[i] = shared[dedup_keys[i]]
+                self._inc_stats("dedup_hits")
+            results.append(self._with_blurhash(image_obj, blurhashes[i]))
+        return results
+
+    def process_image_objs(
+        self,
+        image_objs: tuple[dict[str, Any], ...],
+    ) -> list[dict[str, Any]]:
+        """Calculate the BlurHashes of several images.
+
+        If there are at least `batch_size` images, they are encoded in a single
+        batch (see `calculate_blurhash_batch`).
+        """
+
+        if not self._use_batch(image_objs):
+            return [self.process_image_obj(image_obj) for image_obj in image_objs]
+
+        dedup_keys, cache_keys, blurhashes, missing = self._prepare_batch(image_objs)
+        images = self._load_images(missing)
+        computed = (
+            _calculate_blurhash_batch(
+                tuple(images.values()),
+                self.x_components,
+                self.y_components,
+                self.adaptive_components,
+                self.float32,
+            )
+            if images
+            else []
+        )
+        return self._finish_batch(
+            image_objs,
+            dedup_keys,
+            cache_keys,
+            blurhashes,
+            dict(zip(images, computed, strict=True)),
+        )
+
+    async def process_image_objs_async(
+        self,
+        image_objs: tuple[dict[str, Any], ...],
+    ) -> list[dict[str, Any]]:
+        """Calculate the BlurHashes of several images in the executor."""
+
+        if not self._use_batch(image_objs):
+            return list(
+                await asyncio.gather(
+                    *(
+                        self.process_image_obj_async(image_obj)
+                        for image_obj in image_objs
+                    ),
+                ),
+            )
+
+        dedup_keys, cache_keys, blurhashes, missing = self._prepare_batch(image_objs)
+
+        # Images which are being calculated for other items right now
+        waiting = {
+            i: self._in_flight[dedup_key]
+            for i in missing
+            if (dedup_key := dedup_keys[i]) is not None and dedup_key in self._in_flight
+        }
+        for i in waiting:
+            del missing[i]
+
+        futures = {i: self._start_in_flight(dedup_keys[i]) for i in missing}
+        computed: dict[int, str | None] = {}
+        try:
+            images = await self._load_images_async(missing)
+            if images:
+                computed = await self._run(
+                    partial(
+                        _calculate_blurhash_batch_if_fits,
+                        images,
+                        self._decode_size(),
+                        self.max_pixels,
+                        self.max_bytes,
+                        self.x_components,
+                        self.y_components,
+                        self.adaptive_components,
+                        self.float32,
+                    ),
+                )
+                self._inc_stats("skipped_too_large", len(images) - len(computed))
+        finally:
+            for i, future in futures.items():
+                self._finish_in_flight(dedup_keys[i], future, computed.get(i))
+
+        for i, future in waiting.items():
+            blurhashes[i] = await asyncio.shield(future)
+            if blurhashes[i] is not None:
+                self._inc_stats("dedup_hits")
+
+        return self._finish_batch(
+            image_objs,
+            dedup_keys,
+            cache_keys,
+            blurhashes,
+            computed,
+        )
+
+    def process_item(
+        self,
+        item: Any,
+        spider: Spider,  # noqa: ARG002
+    ) -> Any | Coroutine[Any, Any, Any]:
+        """Calculate the BlurHashes of the downloaded images.
+
+        If an executor is configured (`BLURHASH_EXECUTOR` is `"thread"` or
+        `"process"`), the calculation is dispatched to it and a coroutine is
+        returned, so the reactor isn't blocked while images are processed. The
+        same goes for reading images from a remote `IMAGES_STORE`, which always
+        happens in the store reader's thread pool.
+        """
 
         adapter = ItemAdapter(item)
 
@@ -133,11 +1056,471 @@ class BlurHashPipeline:
         if not image_objs:
             return item
 
+        if self.executor is not None or self.store_reader is not None:
+            return self._process_item_async(item, adapter, image_objs)
+
         try:
-            adapter[self.target_field] = [
-                self.process_image_obj(image_obj) for image_obj in image_objs
-            ]
+            adapter[self.target_field] = self.process_image_objs(image_objs)
         except Exception:
             LOGGER.exception("Unable to add field <%s> to the item", self.target_field)
 
         return item
+
+    async def _process_item_async(
+        self,
+        item: Any,
+        adapter: ItemAdapter,
+        image_objs: tuple[dict[str, Any], ...],
+    ) -> Any:
+        try:
+            adapter[self.target_field] = await self.process_image_objs_async(
+                image_objs,
+            )
+        except Exception:
+            LOGGER.exception("Unable to add field <%s> to the item", self.target_field)
+
+        return item
+
+
+class PlaceholderPipeline(BlurHashPipeline):
+    """Calculate several compact placeholders of the downloaded images.
+
+    Each image is decoded only once, at reduced resolution, and then passed to
+    all encoders in `PLACEHOLDER_ENCODERS`: `blurhash`, `thumbhash`,
+    `average_color` and `lqip` (a tiny base64 encoded WebP). The setting is
+    either a list of encoder names or a dict mapping encoder names to the keys
+    under which their results are added to each image in `PLACEHOLDER_FIELD`.
+
+    Everything else (executor, cache, deduplication, remote stores) is
+    configured as for `BlurHashPipeline`, with the BlurHash specific settings
+    applying to the `blurhash` encoder. Images are never encoded in batches.
+    """
+
+    FIELD_SETTING = "PLACEHOLDER_FIELD"
+    ENCODERS_SETTING = "PLACEHOLDER_ENCODERS"
+    DEFAULT_ENCODERS: tuple[str, ...] = ("blurhash", "thumbhash")
+    STATS_PREFIX = "placeholder"
+
+    encoders: dict[str, str]
+    lqip_size: int
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler) -> PlaceholderPipeline:
+        """Init from crawler."""
+
+        from scrapy_extensions.placeholders import PLACEHOLDER_ENCODERS
+
+        encoders = cls._encoders(crawler.settings)
+        unknown = set(encoders) - set(PLACEHOLDER_ENCODERS)
+        if unknown:
+            LOGGER.error(
+                "Invalid %s %s, must be some of %s",
+                cls.ENCODERS_SETTING,
+                sorted(unknown),
+                PLACEHOLDER_ENCODERS,
+            )
+            raise NotConfigured
+
+        pipeline = super().from_crawler(crawler)
+        assert isinstance(pipeline, PlaceholderPipeline)
+        pipeline.encoders = encoders
+        pipeline.lqip_size = crawler.settings.getint("PLACEHOLDER_LQIP_SIZE", 16)
+        return pipeline
+
+    @classmethod
+    def _encoders(cls, settings: Settings) -> dict[str, str]:
+        encoders = settings.get(cls.ENCODERS_SETTING) or cls.DEFAULT_ENCODERS
+        if isinstance(encoders, dict):
+            return dict(encoders)
+        return {name: name for name in arg_to_iter(encoders)}
+
+    @classmethod
+    def _missing_dependencies(cls, settings: Settings) -> list[str]:
+        from scrapy_extensions.utils import missing_dependencies
+
+        numba = "blurhash" in cls._encoders(settings) and not settings.getbool(
+            "BLURHASH_FLOAT32",
+        )
+        return missing_dependencies(numba=numba)
+
+    def __init__(
+        self,
+        *,
+        encoders: Mapping[str, str] | None = None,
+        lqip_size: int = 16,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(**kwargs)
+        self.encoders = (
+            dict(encoders)
+            if encoders is not None
+            else {name: name for name in self.DEFAULT_ENCODERS}
+        )
+        self.lqip_size = lqip_size
+
+    def _decode_size(self) -> tuple[int, int]:
+        # Same as in `calculate_placeholders`
+        size = max(100, self.lqip_size)
+        if "blurhash" in self.encoders:
+            size = max(size, *super()._decode_size())
+        return size, size
+
+    def _cache_key(
+        self,
+        image_obj: dict[str, Any],
+        x_components: int,
+        y_components: int,
+    ) -> str | None:
+        cache_key = super()._cache_key(image_obj, x_components, y_components)
+        if cache_key is None:
+            return None
+        return f"{cache_key}:{','.join(sorted(self.encoders))}:{self.lqip_size}"
+
+    def _calculation(
+        self,
+        image: Path | bytes,
+        x_components: int,
+        y_components: int,
+    ) -> Callable[[], str | None]:
+        return partial(
+            _calculate_placeholders,
+            image,
+            tuple(self.encoders),
+            x_components,
+            y_components,
+            self.adaptive_components,
+            self.float32,
+            self.lqip_size,
+        )
+
+    def _with_blurhash(
+        self,
+        image_obj: dict[str, Any],
+        blurhash: str | None,
+    ) -> dict[str, Any]:
+        placeholders = json.loads(blurhash) if blurhash else {}
+        # Don't modify the original object
+        return {
+            **image_obj,
+            **{key: placeholders.get(name) for name, key in self.encoders.items()},
+        }
+
+    def _use_batch(self, image_objs: tuple[dict[str, Any], ...]) -> bool:  # noqa: ARG002
+        return False
+
+
+class PerceptualHashPipeline(PlaceholderPipeline):
+    """Calculate perceptual hashes of the downloaded images and find near-duplicates.
+
+    The hashes in `PERCEPTUAL_HASH_ENCODERS` (by default `phash` and `dhash`,
+    but any placeholder may be added) are calculated like in
+    `PlaceholderPipeline` and added to each image in `PERCEPTUAL_HASH_FIELD`.
+
+    The pHash (or dHash, if pHash isn't calculated) of every image is then
+    looked up in a `HammingIndex` of the images seen before. If one is within
+    `PERCEPTUAL_HASH_MAX_DISTANCE` bits, the image is marked as a near-duplicate
+    with the checksum (or path) of that image in `duplicate_of`, or removed
+    from the field altogether if `PERCEPTUAL_HASH_DROP_DUPLICATES` is set. The
+    index is kept in memory, and persisted between runs if
+    `PERCEPTUAL_HASH_INDEX_URI` is set.
+    """
+
+    FIELD_SETTING = "PERCEPTUAL_HASH_FIELD"
+    ENCODERS_SETTING = "PERCEPTUAL_HASH_ENCODERS"
+    DEFAULT_ENCODERS = ("phash", "dhash")
+    STATS_PREFIX = "perceptual_hash"
+
+    index: HammingIndex
+    max_distance: int
+    drop_duplicates: bool
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler) -> PerceptualHashPipeline:
+        """Init from crawler."""
+
+        pipeline = super().from_crawler(crawler)
+        assert isinstance(pipeline, PerceptualHashPipeline)
+
+        if pipeline.index_encoder is None:
+            LOGGER.error("%s must contain `phash` or `dhash`", cls.ENCODERS_SETTING)
+            pipeline._close()  # noqa: SLF001
+            raise NotConfigured
+
+        index_uri = crawler.settings.get("PERCEPTUAL_HASH_INDEX_URI")
+        if index_uri:
+            from scrapy_extensions.utils import HammingIndex
+
+            pipeline.index = HammingIndex.from_uri(index_uri)
+        pipeline.max_distance = crawler.settings.getint(
+            "PERCEPTUAL_HASH_MAX_DISTANCE",
+            6,
+        )
+        pipeline.drop_duplicates = crawler.settings.getbool(
+            "PERCEPTUAL_HASH_DROP_DUPLICATES",
+        )
+        return pipeline
+
+    def __init__(
+        self,
+        *,
+        index: HammingIndex | None = None,
+        max_distance: int = 6,
+        drop_duplicates: bool = False,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(**kwargs)
+        if index is None:
+            from scrapy_extensions.utils import HammingIndex
+
+            index = HammingIndex()
+        self.index = index
+        self.max_distance = max_distance
+        self.drop_duplicates = drop_duplicates
+
+    @property
+    def index_encoder(self) -> str | None:
+        """The encoder whose hashes are used to find near-duplicates."""
+        return next(
+            (name for name in ("phash", "dhash") if name in self.encoders),
+            None,
+        )
+
+    def _close(self) -> None:
+        super()._close()
+        LOGGER.debug("Closing perceptual hash index <%s>", self.index.path)
+        self.index.close()
+
+    def _find_duplicates(
+        self,
+        results: list[dict[str, Any]],
+    ) -> list[dict[str, Any]]:
+        encoder = self.index_encoder
+        if encoder is None:
+            return results
+
+        for result in results:
+            value = result.get(self.encoders[encoder])
+            if not value:
+                continue
+
+            key = result.get("checksum") or result.get("path") or ""
+            matches = self.index.query(int(value, 16), self.max_distance)
+            duplicate_of = next((other for other, _ in matches if other != key), None)
+
+            if duplicate_of is not None:
+                LOGGER.debug(
+                    "Image <%s> is a near-duplicate of <%s>",
+                    key,
+                    duplicate_of,
+                )
+                result["duplicate_of"] = duplicate_of
+                self._inc_stats("near_duplicates")
+            elif not matches:
+                # Only index originals, the same image may be seen again
+                self.index.add(int(value, 16), key)
+
+        if self.drop_duplicates:
+            return [result for result in results if "duplicate_of" not in result]
+        return results
+
+    def process_image_objs(
+        self,
+        image_objs: tuple[dict[str, Any], ...],
+    ) -> list[dict[str, Any]]:
+        """Calculate the hashes of several images and mark near-duplicates."""
+        return self._find_duplicates(super().process_image_objs(image_objs))
+
+    async def process_image_objs_async(
+        self,
+        image_objs: tuple[dict[str, Any], ...],
+    ) -> list[dict[str, Any]]:
+        """Calculate the hashes of several images in the executor and mark
+        near-duplicates.
+        """
+        return self._find_duplicates(
+            await super().process_image_objs_async(image_objs),
+        )
+
+
+class BlurHashImagesPipeline(ImagesPipeline):
+    """Images pipeline which also calculates the BlurHashes of the images.
+
+    The BlurHash is calculated from the downloaded response body, decoded at
+    reduced resolution (see `reduced_image`), so the image doesn't need to be
+    read back from `IMAGES_STORE`. Images that are not downloaded because they
+    are still up to date in the store are read from there instead. The
+    calculation runs in the executor configured by `BLURHASH_EXECUTOR`, like in
+    `BlurHashPipeline`, within the same decode budget (`BLURHASH_MAX_PIXELS`,
+    `BLURHASH_MAX_BYTES` and `BLURHASH_MAX_DECODES`). The BlurHash is added as
+    `blurhash` to the image's entry in `IMAGES_RESULT_FIELD`.
+    """
+
+    x_components: int = 4
+    y_components: int = 4
+    adaptive_components: bool = False
+    float32: bool = False
+    executor: Executor | None = None
+    store_reader: StoreReader | None = None
+    max_pixels: int | None = None
+    max_bytes: int | None = None
+    exif_transpose: bool = False
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler) -> BlurHashImagesPipeline:
+        """Init from crawler."""
+
+        pipeline = super().from_crawler(crawler)
+        assert isinstance(pipeline, BlurHashImagesPipeline)
+        pipeline.x_components = crawler.settings.getint("BLURHASH_X_COMPONENTS", 4)
+        pipeline.y_components = crawler.settings.getint("BLURHASH_Y_COMPONENTS", 4)
+        pipeline.adaptive_components = crawler.settings.getbool(
+            "BLURHASH_ADAPTIVE_COMPONENTS",
+        )
+        pipeline.float32 = crawler.settings.getbool("BLURHASH_FLOAT32")
+        # Only newer Scrapy versions rotate images before storing them
+        pipeline.exif_transpose = hasattr(pipeline, "_ImageOps")
+        pipeline.max_pixels = crawler.settings.getint("BLURHASH_MAX_PIXELS") or None
+        pipeline.max_bytes = crawler.settings.getint("BLURHASH_MAX_BYTES") or None
+        _limit_decodes(crawler.settings)
+        pipeline.executor = _blurhash_executor(crawler.settings)
+
+        if not isinstance(pipeline.store, FSFilesStore):
+            from scrapy_extensions.stores import StoreReader
+
+            _require_asyncio("Reading images back from a remote IMAGES_STORE")
+            pipeline.store_reader = StoreReader(
+                store=pipeline.store,
+                max_concurrency=crawler.settings.getint(
+                    "BLURHASH_STORE_CONCURRENCY",
+                    8,
+                ),
+            )
+
+        crawler.signals.connect(pipeline.spider_closed, signal=spider_closed)
+        return pipeline
+
+    async def spider_closed(self, spider: Spider) -> None:  # noqa: ARG002
+        """Shut down the executor and close the store reader, if any."""
+
+        if self.executor is not None:
+            LOGGER.debug("Shutting down BlurHash executor %r", self.executor)
+            await asyncio.get_running_loop().run_in_executor(
+                None,
+                partial(self.executor.shutdown, wait=True, cancel_futures=True),
+            )
+
+        if self.store_reader is not None:
+            LOGGER.debug("Closing images store reader %r", self.store_reader)
+            await asyncio.get_running_loop().run_in_executor(
+                None,
+                self.store_reader.close,
+            )
+
+    async def calculate_blurhash(self, image: Path | bytes) -> str | None:
+        """Calculate the BlurHash of an image file or content in the executor.
+
+        Image content is converted like `get_images` does before storing it, so
+        it gets the same BlurHash as when it's read back from the store later.
+        Images exceeding the decode budget are skipped and get no BlurHash.
+        """
+
+        if isinstance(image, Path):
+            # Stored images were already converted to JPEG
+            calculation = partial(
+                _calculate_blurhash,
+                image,
+                self.x_components,
+                self.y_components,
+                self.adaptive_components,
+                self.float32,
+            )
+        else:
+            calculation = partial(
+                _blurhash_or_none,
+                image,
+                self.x_components,
+                self.y_components,
+                self.adaptive_components,
+                self.float32,
+                as_stored=True,
+                exif_transpose=self.exif_transpose,
+            )
+
+        fits, blurhash = await self._run(
+            partial(
+                _calculate_if_fits,
+                calculation,
+                image,
+                (32 * self.x_components, 32 * self.y_components),
+                self.max_pixels,
+                self.max_bytes,
+            ),
+        )
+        if not fits and self.crawler.stats is not None:
+            self.crawler.stats.inc_value("blurhash/skipped_too_large")
+        return blurhash
+
+    async def _run(self, calculation: Callable[[], _T]) -> _T:
+        # Without an executor, calculate right here like `BlurHashPipeline`
+        if self.executor is None:
+            return calculation()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, calculation)
+
+    async def _stored_image(self, path: str) -> Path | bytes | None:
+        if self.store_reader is not None:
+            return await self.store_reader.read_async(path)
+        assert isinstance(self.store, FSFilesStore)
+        return Path(self.store.basedir, *path.split("/"))
+
+    def media_to_download(  # type: ignore[override]
+        self,
+        request: Request,
+        info: MediaPipeline.SpiderInfo,
+        *,
+        item: Any = None,
+    ) -> Deferred[dict[str, Any] | None]:
+        """Add the BlurHash to images that are still up to date in the store."""
+        return deferred_from_coro(self._media_to_download(request, info, item=item))
+
+    async def _media_to_download(
+        self,
+        request: Request,
+        info: MediaPipeline.SpiderInfo,
+        *,
+        item: Any = None,
+    ) -> dict[str, Any] | None:
+        result = await _resolved(super().media_to_download(request, info, item=item))
+        if not result:
+            return None
+
+        image = await self._stored_image(result["path"])
+        blurhash = None if image is None else await self.calculate_blurhash(image)
+        return {**result, "blurhash": blurhash}
+
+    def media_downloaded(  # type: ignore[override]
+        self,
+        response: Response,
+        request: Request,
+        info: MediaPipeline.SpiderInfo,
+        *,
+        item: Any = None,
+    ) -> Deferred[dict[str, Any]]:
+        """Add the BlurHash to images that were just downloaded."""
+        return deferred_from_coro(
+            self._media_downloaded(response, request, info, item=item),
+        )
+
+    async def _media_downloaded(
+        self,
+        response: Response,
+        request: Request,
+        info: MediaPipeline.SpiderInfo,
+        *,
+        item: Any = None,
+    ) -> dict[str, Any]:
+        result = await _resolved(
+            super().media_downloaded(response, request, info, item=item),
+        )
+        # Each result carries its own BlurHash, even if it's shared by items
+        return {**result, "blurhash": await self.calculate_blurhash(response.body)}
@@ -0,0 +1,295 @@
+"""Compact image placeholders: BlurHash, ThumbHash, average colour and LQIP.
+
+All placeholders of an image are calculated from a single, reduced resolution
+decode of that image (see `placeholder_image`), so adding another placeholder
+costs little more than the encoding itself. The same applies to the perceptual
+hashes (pHash and dHash) used to find near-duplicate images.
+"""
+
+from __future__ import annotations
+
+import base64
+import math
+from functools import lru_cache
+from io import BytesIO
+from typing import IO, TYPE_CHECKING
+
+from scrapy_extensions.utils import calculate_blurhash, decoding, reduced_image
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable
+    from pathlib import Path
+
+    import numpy as np
+    import numpy.typing as npt
+    import PIL.Image
+
+PLACEHOLDER_ENCODERS = (
+    "blurhash",
+    "thumbhash",
+    "average_color",
+    "lqip",
+    "phash",
+    "dhash",
+)
+
+# ThumbHash is defined for images of at most 100x100 pixels
+THUMBHASH_MAX_SIZE = 100
+
+
+def _has_alpha(image: PIL.Image.Image) -> bool:
+    return image.mode in {"RGBA", "LA", "PA"} or "transparency" in image.info
+
+
+def placeholder_image(
+    image: str | Path | IO[bytes] | PIL.Image.Image,
+    size: tuple[int, int],
+) -> PIL.Image.Image:
+    """Decode an image once at a resolution that covers `size` for all encoders.
+
+    The result is an RGBA image if the original has transparency, else RGB.
+    """
+
+    from PIL import Image
+
+    image = image if isinstance(image, Image.Image) else Image.open(image)
+    with decoding():
+        return reduced_image(
+            image=image,
+            size=size,
+            mode="RGBA" if _has_alpha(image) else "RGB",
+        )
+
+
+def _rgba_array(image: PIL.Image.Image) -> npt.NDArray[np.float64]:
+    import numpy as np
+
+    image = image.copy()
+    image.thumbnail((THUMBHASH_MAX_SIZE, THUMBHASH_MAX_SIZE))
+    return np.asarray(image.convert("RGBA"), dtype=np.float64) / 255
+
+
+def _round(value: float) -> int:
+    # Same rounding as JavaScript's Math.round used by the reference encoder
+    return math.floor(value + 0.5)
+
+
+def _thumbhash_channel(
+    channel: npt.NDArray[np.float64],
+    nx: int,
+    ny: int,
+) -> tuple[float, list[float], float]:
+    import numpy as np
+
+    height, width = channel.shape
+    fx = np.cos(np.pi / width * np.outer(np.arange(nx), np.arange(width) + 0.5))
+    fy = np.cos(np.pi / height * np.outer(np.arange(ny), np.arange(height) + 0.5))
+    factors = fy @ channel @ fx.T / (width * height)
+
+    dc = float(factors[0, 0])
+    ac = [
+        float(factors[cy, cx])
+        for cy in range(ny)
+        for cx in range(nx)
+        if cx * ny < nx * (ny - cy) and (cx or cy)
+    ]
+    scale = max((abs(f) for f in ac), default=0.0)
+    if scale:
+        ac = [0.5 + 0.5 / scale * f for f in ac]
+    return dc, ac, scale
+
+
+def thumbhash(image: PIL.Image.Image) -> str:
+    """Base64 encoded ThumbHash of an image, see https://evanw.github.io/thumbhash/.
+
+    Unlike BlurHash, ThumbHash encodes the aspect ratio and transparency.
+    """
+
+    import numpy as np
+
+    rgba = _rgba_array(image)
+    height, width = rgba.shape[:2]
+    alpha = rgba[..., 3]
+
+    # Average colour, weighted by alpha
+    weights = alpha[..., np.newaxis]
+    avg_a = float(alpha.sum())
+    avg_rgb = (
+        (rgba[..., :3] * weights).sum(axis=(0, 1)) / avg_a if avg_a else np.zeros(3)
+    )
+
+    has_alpha = avg_a < width * height
+    l_limit = 5 if has_alpha else 7  # Fewer luminance bits if there's alpha
+    lx = max(1, _round(l_limit * width / max(width, height)))
+    ly = max(1, _round(l_limit * height / max(width, height)))
+
+    # Convert to LPQA, composited on top of the average colour
+    rgb = avg_rgb * (1 - weights) + rgba[..., :3] * weights
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    l_dc, l_ac, l_scale = _thumbhash_channel((r + g + b) / 3, max(3, lx), max(3, ly))
+    p_dc, p_ac, p_scale = _thumbhash_channel((r + g) / 2 - b, 3, 3)
+    q_dc, q_ac, q_scale = _thumbhash_channel(r - g, 3, 3)
+
+    is_landscape = width > height
+    header24 = (
+        _round(63 * l_dc)
+        | (_round(31.5 + 31.5 * p_dc) << 6)
+        | (_round(31.5 + 31.5 * q_dc) << 12)
+        | (_round(31 * l_scale) << 18)
+        | (has_alpha << 23)
+    )
+    header16 = (
+        (ly if is_landscape else lx)
+        | (_round(63 * p_scale) << 3)
+        | (_round(63 * q_scale) << 9)
+        | (is_landscape << 15)
+    )
+    thumb_hash = [
+        header24 & 255,
+        (header24 >> 8) & 255,
+        header24 >> 16,
+        header16 & 255,
+        header16 >> 8,
+    ]
+
+    acs = [l_ac, p_ac, q_ac]
+    if has_alpha:
+        a_dc, a_ac, a_scale = _thumbhash_channel(alpha, 5, 5)
+        thumb_hash.append(_round(15 * a_dc) | (_round(15 * a_scale) << 4))
+        acs.append(a_ac)
+
+    # Pack the AC terms as 4 bit values, two per byte
+    nibbles = [_round(15 * f) for ac in acs for f in ac]
+    nibbles += [0] * (len(nibbles) % 2)
+    thumb_hash.extend(
+        low | (high << 4) for low, high in zip(nibbles[::2], nibbles[1::2], strict=True)
+    )
+
+    return base64.b64encode(bytes(thumb_hash)).decode("ascii")
+
+
+def average_color(image: PIL.Image.Image) -> str:
+    """Average colour of an image as a hex string, ignoring transparent pixels."""
+
+    import numpy as np
+
+    rgba = np.asarray(image.convert("RGBA"), dtype=np.float64)
+    alpha = rgba[..., 3:] / 255
+    weight = float(alpha.sum())
+    rgb = (rgba[..., :3] * alpha).sum(axis=(0, 1)) / weight if weight else (0, 0, 0)
+    return "#{:02x}{:02x}{:02x}".format(*(_round(c) for c in rgb))
+
+
+def lqip(image: PIL.Image.Image, size: int = 16, quality: int = 50) -> str:
+    """Tiny WebP version of an image as a `data:` URI (low quality image placeholder).
+
+    The longer side of the image is scaled to `size` pixels.
+    """
+
+    image = image.copy()
+    image.thumbnail((size, size))
+    buffer = BytesIO()
+    image.save(buffer, format="WEBP", quality=quality)
+    data = base64.b64encode(buffer.getvalue()).decode("ascii")
+    return f"data:image/webp;base64,{data}"
+
+
+def _hash_from_bits(bits: npt.NDArray[np.bool_]) -> str:
+    import numpy as np
+
+    return np.packbits(bits.ravel()).tobytes().hex()
+
+
+@lru_cache(maxsize=1)
+def _dct_basis(size: int = 32, components: int = 8) -> npt.NDArray[np.float64]:
+    import numpy as np
+
+    # DCT-II up to a constant factor, which doesn't change the comparisons
+    basis: npt.NDArray[np.float64] = np.cos(
+        np.pi / (2 * size) * np.outer(np.arange(components), 2 * np.arange(size) + 1),
+    )
+    basis.flags.writeable = False
+    return basis
+
+
+def phash(image: PIL.Image.Image) -> str:
+    """64 bit perceptual hash of an image as 16 hex digits.
+
+    The lowest 8x8 frequencies of the DCT of a 32x32 greyscale version of the
+    image, each compared to their median. Visually similar images have hashes
+    with a small Hamming distance.
+    """
+
+    import numpy as np
+    from PIL import Image
+
+    pixels = np.asarray(
+        image.convert("L").resize((32, 32), Image.Resampling.LANCZOS),
+        dtype=np.float64,
+    )
+    basis = _dct_basis()
+    low_frequencies = basis @ pixels @ basis.T
+    return _hash_from_bits(low_frequencies > np.median(low_frequencies))
+
+
+def dhash(image: PIL.Image.Image) -> str:
+    """64 bit difference hash of an image as 16 hex digits.
+
+    Whether each pixel of a 9x8 greyscale version of the image is brighter than
+    its left neighbour. Cheaper, but less robust than `phash`.
+    """
+
+    import numpy as np
+    from PIL import Image
+
+    pixels = np.asarray(
+        image.convert("L").resize((9, 8), Image.Resampling.LANCZOS),
+        dtype=np.int16,
+    )
+    return _hash_from_bits(pixels[:, 1:] > pixels[:, :-1])
+
+
+def calculate_placeholders(  # noqa: PLR0913
+    image: str | Path | IO[bytes] | PIL.Image.Image,
+    encoders: Iterable[str] = PLACEHOLDER_ENCODERS,
+    x_components: int = 4,
+    y_components: int = 4,
+    *,
+    adaptive: bool = False,
+    float32: bool = False,
+    lqip_size: int = 16,
+) -> dict[str, str]:
+    """Calculate several placeholders of an image, decoding it only once.
+
+    `encoders` is a selection of `PLACEHOLDER_ENCODERS`; see
+    `calculate_blurhash` for the BlurHash specific arguments.
+    """
+
+    encoder_funcs: dict[str, Callable[[PIL.Image.Image], str]] = {
+        "blurhash": lambda img: calculate_blurhash(
+            image=img,
+            x_components=x_components,
+            y_components=y_components,
+            adaptive=adaptive,
+            float32=float32,
+        ),
+        "thumbhash": thumbhash,
+        "average_color": average_color,
+        "lqip": lambda img: lqip(img, size=lqip_size),
+        "phash": phash,
+        "dhash": dhash,
+    }
+
+    encoders = tuple(encoders)
+    unknown = set(encoders) - set(encoder_funcs)
+    if unknown:
+        msg = f"Unknown placeholder encoders: {sorted(unknown)}"
+        raise ValueError(msg)
+
+    size = max(THUMBHASH_MAX_SIZE, lqip_size)
+    if "blurhash" in encoders:
+        # Enough for the BlurHash thumbnail, see `blurhash_thumbnail`
+        size = max(size, 32 * x_components, 32 * y_components)
+    shared = placeholder_image(image=image, size=(size, size))
+
+    return {encoder: encoder_funcs[encoder](shared) for encoder in encoders}
@@ -0,0 +1,16 @@
+"""Signals sent by the components of this package.
+
+Connect to them like to Scrapy's own signals::
+
+    crawler.signals.connect(handler, signal=circuit_opened)
+
+The circuit breaker signals of `DelayedRetryMiddleware` are sent with the
+arguments `slot` (the download slot key) and `spider`.
+"""
+
+# A download slot had too many delayed-retry responses; its requests are parked
+circuit_opened = object()
+# The cooldown of an open slot is over; a single probe request is sent
+circuit_half_opened = object()
+# The probe request of a slot succeeded; its parked requests are released
+circuit_closed = object()
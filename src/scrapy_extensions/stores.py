@@ -0,0 +1,147 @@
+"""Read files back from the stores of Scrapy's files and images pipelines."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from ftplib import FTP
+from functools import partial
+from io import BytesIO
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Protocol, runtime_checkable
+
+from scrapy.pipelines.files import (
+    FSFilesStore,
+    FTPFilesStore,
+    GCSFilesStore,
+    S3FilesStore,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable
+
+LOGGER = logging.getLogger(__name__)
+
+
+@runtime_checkable
+class ReadableStore(Protocol):
+    """A store which can read its files itself, e.g., a stub for tests."""
+
+    def read_file(self, path: str) -> bytes:
+        """Return the content of the file at `path` in the store."""
+
+
+def _read_fs(store: FSFilesStore, path: str) -> bytes:
+    return Path(store.basedir, *path.split("/")).read_bytes()
+
+
+def _read_s3(store: S3FilesStore, path: str) -> bytes:
+    # botocore keeps a pool of connections per client
+    response = store.s3_client.get_object(Bucket=store.bucket, Key=store.prefix + path)
+    body: bytes = response["Body"].read()
+    return body
+
+
+def _read_gcs(store: GCSFilesStore, path: str) -> bytes:
+    data: bytes = store.bucket.blob(store.prefix + path).download_as_bytes()
+    return data
+
+
+class StoreReader:
+    """Fetch files from a files store in a bounded thread pool.
+
+    Supports the file system, S3, GCS and FTP stores of Scrapy's
+    `FilesPipeline` as well as any object implementing `ReadableStore`.
+    Connections are reused: S3 and GCS clients pool them, and each worker thread
+    keeps its own FTP connection open.
+    """
+
+    READERS: dict[type[Any], Callable[[Any, str], bytes]] = {  # noqa: RUF012
+        FSFilesStore: _read_fs,
+        S3FilesStore: _read_s3,
+        GCSFilesStore: _read_gcs,
+    }
+
+    def __init__(self, store: Any, max_concurrency: int = 8) -> None:
+        self.store = store
+        self.max_concurrency = max_concurrency
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_concurrency,
+            thread_name_prefix="store-reader",
+        )
+        self._local = threading.local()
+        self._ftp_connections: list[FTP] = []
+        self._reader = self._find_reader(store)
+
+    def _find_reader(self, store: Any) -> Callable[[str], bytes]:
+        if isinstance(store, ReadableStore):
+            return store.read_file
+        if isinstance(store, FTPFilesStore):
+            return self._read_ftp
+        for store_cls, reader in self.READERS.items():
+            if isinstance(store, store_cls):
+                return partial(reader, store)
+        msg = f"Unable to read files from store {store!r}"
+        raise TypeError(msg)
+
+    def _ftp_connection(self) -> FTP:
+        ftp: FTP | None = getattr(self._local, "ftp", None)
+        if ftp is None:
+            ftp = FTP()  # noqa: S321
+            ftp.connect(self.store.host, self.store.port)
+            ftp.login(self.store.username, self.store.password)
+            if self.store.USE_ACTIVE_MODE:
+                ftp.set_pasv(False)
+            self._local.ftp = ftp
+            self._ftp_connections.append(ftp)
+        return ftp
+
+    def _read_ftp(self, path: str) -> bytes:
+        buf = BytesIO()
+        command = f"RETR {self.store.basedir}/{path}"
+        try:
+            self._ftp_connection().retrbinary(command, buf.write)
+        except (EOFError, OSError):
+            # The server closed the connection, try once more with a new one
+            self._local.ftp = None
+            buf = BytesIO()
+            self._ftp_connection().retrbinary(command, buf.write)
+        return buf.getvalue()
+
+    def read(self, path: str) -> bytes:
+        """Read a file from the store, blocking the calling thread."""
+        return self._reader(path)
+
+    def read_many(self, paths: Iterable[str]) -> list[bytes | None]:
+        """Read several files concurrently; files that fail to load are `None`."""
+        return list(self.executor.map(self._read_or_none, paths))
+
+    async def read_async(self, path: str) -> bytes | None:
+        """Read a file from the store in the thread pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._read_or_none, path)
+
+    def _read_or_none(self, path: str) -> bytes | None:
+        try:
+            return self.read(path)
+        except Exception:
+            LOGGER.warning(
+                "Unable to read <%s> from store %r",
+                path,
+                self.store,
+                exc_info=True,
+            )
+            return None
+
+    def close(self) -> None:
+        """Shut down the thread pool and close open connections."""
+
+        self.executor.shutdown(wait=True)
+        for ftp in self._ftp_connections:
+            with suppress(Exception):
+                ftp.quit()
+            ftp.close()
+        self._ftp_connections.clear()
@@ -0,0 +1,268 @@
+"""Throttle state of `NicerAutoThrottle` that outlives a single crawler process.
+
+Processes that crawl the same domains should back off together: a store records
+the delay each download slot was last backed off to, and every process backs
+off as well once it sees a backoff it hasn't seen yet. Entries expire after
+`ttl` seconds, so a process starting later doesn't inherit ancient backoffs.
+
+Snapshots keep the delays a crawl has learned for the next one, so it doesn't
+have to learn them all over again.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, NamedTuple, Protocol
+from urllib.parse import urlparse
+
+from scrapy.utils.misc import load_object
+
+if TYPE_CHECKING:
+    from scrapy.settings import BaseSettings
+
+LOGGER = logging.getLogger(__name__)
+
+
+class SlotSnapshot(NamedTuple):
+    """A slot's delay, its last use (UNIX time), and whether it was recovering."""
+
+    delay: float
+    time: float
+    recovering: bool = False
+
+
+class Backoff(NamedTuple):
+    """The delay a slot was backed off to, and when (UNIX time)."""
+
+    delay: float
+    time: float
+
+
+class ThrottleState(Protocol):
+    """A store for the last backoff of each download slot."""
+
+    def last_backoff(self, key: str) -> Backoff | None:
+        """The last backoff of slot `key`, `None` if there was none or it expired."""
+
+    def record_backoff(self, key: str, backoff: Backoff) -> None:
+        """Replace the last backoff of slot `key`."""
+
+    def close(self) -> None:
+        """Release the resources of the store."""
+
+    @classmethod
+    def from_uri(cls, uri: str, ttl: float) -> ThrottleState:
+        """Open the store at `uri`, with entries expiring after `ttl` seconds."""
+
+
+class SQLiteThrottleState:
+    """Throttle state in an SQLite file in WAL mode, for processes on one host.
+
+    Every statement commits right away, so other processes see a backoff as soon
+    as it's recorded. WAL lets them read while another one writes. The store is
+    used on the reactor thread, so it waits at most `timeout` seconds for a lock
+    held by another process; if it's still locked, the read finds no backoff and
+    the write is skipped.
+    """
+
+    @classmethod
+    def from_uri(cls, uri: str, ttl: float = 60) -> SQLiteThrottleState:
+        """Open the file from a `sqlite:///path/to/file.db` URI or a plain path."""
+
+        parsed = urlparse(uri)
+        if parsed.scheme == "sqlite":
+            path = parsed.netloc + parsed.path
+        elif not parsed.scheme or len(parsed.scheme) == 1:  # Windows drive letter
+            path = uri
+        else:
+            msg = f"Unsupported throttle state URI <{uri}>"
+            raise ValueError(msg)
+
+        return cls(path=path, ttl=ttl)
+
+    def __init__(
+        self,
+        path: str | Path,
+        ttl: float = 60,
+        timeout: float = 0.05,
+    ) -> None:
+        self.path = Path(path)
+        self.ttl = ttl
+        self.timeout = timeout
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Opening may wait for others to set up the file, later statements not
+        self._connection = sqlite3.connect(
+            self.path,
+            timeout=10,
+            isolation_level=None,
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS backoff "
+            "(key TEXT PRIMARY KEY, delay REAL NOT NULL, time REAL NOT NULL)",
+        )
+        self._connection.execute(
+            "DELETE FROM backoff WHERE time < ?",
+            (time.time() - ttl,),
+        )
+        self._connection.execute(f"PRAGMA busy_timeout = {round(timeout * 1000)}")
+
+    def last_backoff(self, key: str) -> Backoff | None:
+        """The last backoff of slot `key`, `None` if there was none or it expired."""
+
+        try:
+            row = self._connection.execute(
+                "SELECT delay, time FROM backoff WHERE key = ? AND time >= ?",
+                (key, time.time() - self.ttl),
+            ).fetchone()
+        except sqlite3.OperationalError as exc:
+            if not _is_locked(exc):
+                raise
+            LOGGER.debug("Throttle state <%s> is locked, not reading", self.path)
+            return None
+        return Backoff(*row) if row is not None else None
+
+    def record_backoff(self, key: str, backoff: Backoff) -> None:
+        """Replace the last backoff of slot `key`."""
+
+        try:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO backoff (key, delay, time) VALUES (?, ?, ?)",
+                (key, backoff.delay, backoff.time),
+            )
+        except sqlite3.OperationalError as exc:
+            if not _is_locked(exc):
+                raise
+            LOGGER.debug(
+                "Throttle state <%s> is locked, not recording backoff of slot <%s>",
+                self.path,
+                key,
+            )
+
+    def close(self) -> None:
+        """Close the connection to the SQLite file."""
+
+        self._connection.close()
+
+
+def _is_locked(exc: sqlite3.OperationalError) -> bool:
+    # SQLITE_BUSY and SQLITE_LOCKED, which older Pythons don't expose as codes
+    return "locked" in str(exc)
+
+
+class RedisThrottleState:
+    """Throttle state in Redis, for processes on several hosts.
+
+    `client` needs Redis' `get(name)` and `set(name, value, ex=seconds)`
+    commands, like `redis.Redis` does; Redis expires the entries itself.
+    """
+
+    @classmethod
+    def from_uri(cls, uri: str, ttl: float = 60) -> RedisThrottleState:
+        """Connect to Redis at a `redis://` URL with the `redis` package."""
+
+        import redis
+
+        return cls(client=redis.Redis.from_url(uri), ttl=ttl)
+
+    def __init__(
+        self,
+        client: Any,
+        ttl: float = 60,
+        prefix: str = "scrapy_extensions:throttle:",
+    ) -> None:
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def last_backoff(self, key: str) -> Backoff | None:
+        """The last backoff of slot `key`, `None` if there was none or it expired."""
+
+        value = self.client.get(self.prefix + key)
+        if value is None:
+            return None
+        if isinstance(value, bytes):
+            value = value.decode()
+        delay, timestamp = value.split()
+        return Backoff(float(delay), float(timestamp))
+
+    def record_backoff(self, key: str, backoff: Backoff) -> None:
+        """Replace the last backoff of slot `key`."""
+
+        self.client.set(
+            self.prefix + key,
+            f"{backoff.delay!r} {backoff.time!r}",
+            ex=max(round(self.ttl), 1),
+        )
+
+    def close(self) -> None:
+        """Close the connection to Redis, if the client can."""
+
+        close = getattr(self.client, "close", None)
+        if close is not None:
+            close()
+
+
+def throttle_state_from_settings(settings: BaseSettings) -> ThrottleState | None:
+    """The store configured in `AUTOTHROTTLE_SHARED_STATE`, if any.
+
+    The setting is a `redis://` URL or the path of an SQLite file, optionally as a
+    `sqlite:///path/to/file.db` URI. Other stores are plugged in with
+    `AUTOTHROTTLE_SHARED_STATE_BACKEND`, a `ThrottleState` class or its import
+    path, which opens the URI with `from_uri`.
+    """
+
+    uri = settings.get("AUTOTHROTTLE_SHARED_STATE")
+    if not uri:
+        return None
+
+    backend = settings.get("AUTOTHROTTLE_SHARED_STATE_BACKEND")
+    if not backend:
+        backend = (
+            RedisThrottleState
+            if urlparse(uri).scheme in {"redis", "rediss", "unix"}
+            else SQLiteThrottleState
+        )
+    elif isinstance(backend, str):
+        backend = load_object(backend)
+
+    ttl = settings.getfloat("AUTOTHROTTLE_SHARED_STATE_TTL", 60)
+    state: ThrottleState = backend.from_uri(uri, ttl=ttl)
+    return state
+
+
+def read_snapshot(path: str | Path) -> dict[str, SlotSnapshot]:
+    """Read the slot snapshots saved by `write_snapshot`."""
+
+    with Path(path).open(encoding="utf-8") as file:
+        data = json.load(file)
+
+    return {
+        key: SlotSnapshot(
+            delay=float(value["delay"]),
+            time=float(value["time"]),
+            recovering=bool(value.get("recovering")),
+        )
+        for key, value in data.items()
+    }
+
+
+def write_snapshot(path: str | Path, snapshots: dict[str, SlotSnapshot]) -> None:
+    """Save slot snapshots to a JSON file, replacing it atomically."""
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Processes sharing the file mustn't write into each other's temporary file
+    temp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with temp_path.open("w", encoding="utf-8") as file:
+        json.dump(
+            {key: snapshot._asdict() for key, snapshot in snapshots.items()},
+            file,
+        )
+    temp_path.replace(path)
@@ -3,34 +3,290 @@
 from __future__ import annotations
 
 import logging
-from typing import TYPE_CHECKING
+import math
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache
+from importlib import import_module
+from importlib.util import find_spec
+from io import BytesIO
+from itertools import chain, combinations, groupby
+from pathlib import Path
+from typing import IO, TYPE_CHECKING
+from urllib.parse import urlparse
 
 if TYPE_CHECKING:
-    from pathlib import Path
+    from collections.abc import Iterable, Iterator
 
+    import numpy as np
+    import numpy.typing as npt
     import PIL.Image
 
 LOGGER = logging.getLogger(__name__)
 
+BASE83_ALPHABET = (
+    "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+    "#$%*+,-.:;=?@[]^_{|}~"
+)
+
+_SCRATCH = threading.local()
+
+# Modes whose pixel values can be averaged by `reduce()`
+_REDUCIBLE_MODES = frozenset(("L", "LA", "RGB", "RGBA", "CMYK", "YCbCr", "I", "F"))
+
+# Limits the number of images decoded at the same time, see `limit_decodes`
+_DECODE_SEMAPHORE: threading.BoundedSemaphore | None = None
+
+
+def _importable(module: str) -> bool:
+    try:
+        import_module(module)
+    except ImportError:
+        return False
+    return True
+
+
+def missing_dependencies(*, numba: bool = True) -> list[str]:
+    """Names of the optional dependencies for BlurHashes that aren't installed.
+
+    NumPy, Pillow and numba are actually imported, so broken installations are
+    detected too. `blurhash_numba` is only located, because importing it compiles
+    the encoder; it's not needed at all with `numba=False`, i.e., if only the
+    `float32` encoder is used.
+    """
+
+    modules = ("numpy", "PIL.Image", "numba") if numba else ("numpy", "PIL.Image")
+    missing = [module for module in modules if not _importable(module)]
+    if numba and find_spec("blurhash_numba") is None:
+        missing.append("blurhash_numba")
+    return missing
+
+
+def sample_image() -> bytes:
+    """A small PNG to warm up the encoders with."""
 
-def calculate_blurhash(
-    image: str | Path | PIL.Image.Image,
+    from PIL import Image
+
+    image = Image.linear_gradient("L").resize((64, 64)).convert("RGB")
+    buffer = BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def asyncio_available() -> bool:
+    """Whether Scrapy runs on an asyncio event loop.
+
+    Only then can the pipelines await their executors. That requires the
+    `AsyncioSelectorReactor` (or, in newer Scrapy versions, no reactor at all).
+    """
+
+    try:
+        from scrapy.utils.asyncio import is_asyncio_available
+    except ImportError:  # Scrapy < 2.14
+        from scrapy.utils.reactor import (
+            is_asyncio_reactor_installed as is_asyncio_available,
+        )
+
+    try:
+        return is_asyncio_available()
+    except RuntimeError:  # No reactor installed (yet)
+        return False
+
+
+def blurhash_components(
+    size: tuple[int, int],
     x_components: int = 4,
     y_components: int = 4,
-) -> str:
-    """Calculate the blurhash of a given image."""
+) -> tuple[int, int]:
+    """Derive the number of BlurHash components from an image's aspect ratio.
+
+    The longer side gets the most components, the shorter side proportionally
+    fewer; neither exceeds the given maximum of `x_components`/`y_components`.
+    """
+
+    width, height = size
+    if width <= 0 or height <= 0:
+        return x_components, y_components
+
+    base = max(x_components, y_components)
+    longest = max(width, height)
+    return (
+        max(1, min(x_components, round(base * width / longest))),
+        max(1, min(y_components, round(base * height / longest))),
+    )
+
+
+def limit_decodes(limit: int | None) -> None:
+    """Allow at most `limit` images to be decoded at the same time in this process.
+
+    Decoding a large image temporarily needs a lot of memory, so this bounds the
+    peak memory when images are processed in many threads. `None` or `0` removes
+    the limit.
+    """
+
+    global _DECODE_SEMAPHORE  # noqa: PLW0603
+    _DECODE_SEMAPHORE = threading.BoundedSemaphore(limit) if limit else None
+
+
+@contextmanager
+def decoding() -> Iterator[None]:
+    """Hold one of the slots set by `limit_decodes` while decoding an image."""
+
+    with _DECODE_SEMAPHORE or nullcontext():
+        yield
+
+
+def fits_decode_budget(
+    image: str | Path | IO[bytes],
+    size: tuple[int, int],
+    *,
+    max_pixels: int | None = None,
+    max_bytes: int | None = None,
+) -> bool:
+    """Check from the header whether decoding an image stays within a budget.
+
+    The image is checked at the resolution `reduced_image` would decode it at
+    to cover `size`, so large JPEGs that can be decoded at a fraction of their
+    size pass. `max_bytes` is compared against the estimated memory of the
+    decoded image. Images that Pillow considers decompression bombs never fit.
+    """
+
+    from PIL import Image
+
+    if not max_pixels and not max_bytes:
+        return True
+
+    try:
+        with Image.open(image) as img:
+            # Only reads the header; draft changes the size for reduced decoding
+            img.draft("RGB", size)
+            width, height = img.size
+            pixel_bytes = 1 if img.mode in {"1", "L", "P"} else 4
+    except Image.DecompressionBombError:
+        return False
+
+    pixels = width * height
+    return (not max_pixels or pixels <= max_pixels) and (
+        not max_bytes or pixels * pixel_bytes <= max_bytes
+    )
+
+
+def reduced_image(
+    image: PIL.Image.Image,
+    size: tuple[int, int],
+    mode: str = "RGB",
+) -> PIL.Image.Image:
+    """Decode an image at the lowest resolution that still covers `size`.
+
+    JPEGs are decoded at 1/2, 1/4 or 1/8 scale via `draft()` if the image hasn't
+    been loaded yet; anything else is shrunk by an integer factor with `reduce()`.
+    The image is only converted to `mode` once it's reduced, unless its pixels
+    can't be averaged in the original mode (e.g., palette images). The result
+    is at least as large as `size` in both dimensions.
+    """
+
+    image.draft(mode, size)
+    if image.mode not in _REDUCIBLE_MODES or "transparency" in image.info:
+        image = image.convert(mode)
+
+    factor = min(image.width // size[0], image.height // size[1])
+    if factor > 1:
+        image = image.reduce(factor)
+    return image if image.mode == mode else image.convert(mode)
+
+
+def blurhash_thumbnail(
+    image: str | Path | IO[bytes] | PIL.Image.Image,
+    x_components: int = 4,
+    y_components: int = 4,
+    *,
+    adaptive: bool = False,
+    draft: bool = True,
+) -> tuple[PIL.Image.Image, int, int]:
+    """Open an image and fit it to the thumbnail size the BlurHash is computed on.
+
+    Returns the RGB thumbnail and the number of components to use for it. If
+    `adaptive` is set, `x_components` and `y_components` are upper bounds and
+    the actual number of components is derived from the image's aspect ratio,
+    which is read from the header without decoding the image.
+
+    If `draft` is set, the image is decoded at reduced resolution (see
+    `reduced_image`), which is much faster and leaner for large images.
+    """
 
-    import numpy as np
-    from blurhash_numba import encode
     from PIL import Image, ImageOps
 
     image = image if isinstance(image, Image.Image) else Image.open(image)
-    image = ImageOps.fit(
+    if adaptive:
+        x_components, y_components = blurhash_components(
+            size=image.size,
+            x_components=x_components,
+            y_components=y_components,
+        )
+    size = (32 * x_components, 32 * y_components)
+    with decoding():
+        if draft:
+            image = reduced_image(image=image, size=size)
+        image = ImageOps.fit(
+            image=image,
+            size=size,
+            centering=(0.5, 0),
+        )
+    return image.convert("RGB"), x_components, y_components
+
+
+def calculate_blurhash(  # noqa: PLR0913
+    image: str | Path | IO[bytes] | PIL.Image.Image,
+    x_components: int = 4,
+    y_components: int = 4,
+    *,
+    adaptive: bool = False,
+    draft: bool = True,
+    float32: bool = False,
+) -> str:
+    """Calculate the blurhash of a given image.
+
+    See `blurhash_thumbnail` for the meaning of `adaptive` and `draft`. If
+    `float32` is set, the vectorised single precision encoder is used instead of
+    `blurhash_numba`, see `calculate_blurhash_batch`.
+    """
+
+    import numpy as np
+
+    thumbnail, x_components, y_components = blurhash_thumbnail(
         image=image,
-        size=(32 * x_components, 32 * y_components),
-        centering=(0.5, 0),
+        x_components=x_components,
+        y_components=y_components,
+        adaptive=adaptive,
+        draft=draft,
     )
-    image_array = np.array(image.convert("RGB"), dtype=float)
+
+    if float32:
+        (factors,) = _blurhash_factors(
+            np.asarray(thumbnail)[np.newaxis],
+            x_components,
+            y_components,
+        )
+        return blurhash_from_factors(factors)
+
+    return _blurhash_numba(thumbnail, x_components, y_components)
+
+
+def _blurhash_numba(
+    thumbnail: PIL.Image.Image,
+    x_components: int,
+    y_components: int,
+) -> str:
+    """Encode the thumbnail in double precision with `blurhash_numba`."""
+
+    import numpy as np
+
+    # Importing blurhash_numba compiles the encoder, so only do it when needed
+    from blurhash_numba import encode
+
+    image_array = np.array(thumbnail, dtype=float)
 
     blurhash = encode(
         image=image_array,
@@ -39,3 +295,483 @@ def calculate_blurhash(
     )
     assert isinstance(blurhash, str)
     return blurhash
+
+
+@lru_cache(maxsize=128)
+def _blurhash_basis(size: int, components: int) -> npt.NDArray[np.float32]:
+    """Cosine basis of shape `(components, size)`, shared between all images."""
+
+    import numpy as np
+
+    basis = np.cos(np.pi * np.outer(np.arange(components), np.arange(size)) / size)
+    basis = basis.astype(np.float32)
+    basis.flags.writeable = False
+    return basis
+
+
+@lru_cache(maxsize=1)
+def _srgb_to_linear_lut() -> npt.NDArray[np.float32]:
+    """Lookup table from 8 bit sRGB values to linear intensities."""
+
+    import numpy as np
+
+    values = np.arange(256, dtype=np.float64) / 255
+    lut = np.where(
+        values <= 0.04045,  # noqa: PLR2004
+        values / 12.92,
+        ((values + 0.055) / 1.055) ** 2.4,
+    ).astype(np.float32)
+    lut.flags.writeable = False
+    return lut
+
+
+def _scratch_buffer(shape: tuple[int, ...]) -> npt.NDArray[np.float32]:
+    """Per-thread float32 buffer of the given shape, reused between calls."""
+
+    import numpy as np
+
+    size = math.prod(shape)
+    buffer: npt.NDArray[np.float32] | None = getattr(_SCRATCH, "buffer", None)
+    if buffer is None or buffer.size < size:
+        buffer = np.empty(size, dtype=np.float32)
+        _SCRATCH.buffer = buffer
+    return buffer[:size].reshape(shape)
+
+
+def _linear_to_srgb(value: float) -> int:
+    value = max(0.0, min(1.0, value))
+    if value <= 0.0031308:  # noqa: PLR2004
+        return int(value * 12.92 * 255 + 0.5)
+    return int((1.055 * math.pow(value, 1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def _base83(value: int, length: int) -> str:
+    return "".join(
+        BASE83_ALPHABET[value // 83 ** (length - i) % 83] for i in range(1, length + 1)
+    )
+
+
+def _quantise_ac(value: float, norm: float) -> int:
+    scaled = math.copysign(math.sqrt(abs(value / norm)), value)
+    return int(max(0, min(18, math.floor(scaled * 9 + 9.5))))
+
+
+def blurhash_from_factors(factors: npt.NDArray[np.floating]) -> str:
+    """Encode DCT factors of shape `(y_components, x_components, 3)` as BlurHash."""
+
+    y_components, x_components, _ = factors.shape
+    flat = factors.reshape(-1, 3).tolist()
+    dc, ac = flat[0], flat[1:]
+
+    max_ac = max((abs(c) for colour in ac for c in colour), default=0.0)
+    quant_max_ac = int(max(0, min(82, math.floor(max_ac * 166 - 0.5))))
+    ac_norm = (quant_max_ac + 1) / 166
+
+    dc_value = (
+        (_linear_to_srgb(dc[0]) << 16)
+        + (_linear_to_srgb(dc[1]) << 8)
+        + _linear_to_srgb(dc[2])
+    )
+
+    return "".join(
+        (
+            _base83((x_components - 1) + (y_components - 1) * 9, 1),
+            _base83(quant_max_ac, 1),
+            _base83(dc_value, 4),
+            *(
+                _base83(
+                    _quantise_ac(r, ac_norm) * 19 * 19
+                    + _quantise_ac(g, ac_norm) * 19
+                    + _quantise_ac(b, ac_norm),
+                    2,
+                )
+                for r, g, b in ac
+            ),
+        ),
+    )
+
+
+def _blurhash_factors(
+    thumbnails: npt.NDArray[np.uint8],
+    x_components: int,
+    y_components: int,
+) -> npt.NDArray[np.float32]:
+    """DCT factors of shape `(N, y_components, x_components, 3)` of a stack of
+    thumbnails of shape `(N, H, W, 3)`.
+    """
+
+    import numpy as np
+
+    _, height, width, _ = thumbnails.shape
+    linear = np.take(
+        _srgb_to_linear_lut(),
+        thumbnails,
+        out=_scratch_buffer(thumbnails.shape),
+    )
+    factors: npt.NDArray[np.float32] = np.einsum(
+        "jy,nyxc,ix->njic",
+        _blurhash_basis(height, y_components),
+        linear,
+        _blurhash_basis(width, x_components),
+        optimize=True,
+    )
+    factors *= np.float32(2 / (width * height))
+    factors[:, 0, 0, :] /= 2
+    return factors
+
+
+def calculate_blurhash_batch(  # noqa: PLR0913
+    images: Iterable[str | Path | IO[bytes] | PIL.Image.Image],
+    x_components: int = 4,
+    y_components: int = 4,
+    *,
+    adaptive: bool = False,
+    draft: bool = True,
+    float32: bool = True,
+) -> list[str]:
+    """Calculate the BlurHashes of many images at once.
+
+    Thumbnails of the same size are stacked into a single float32 array, which is
+    converted to linear intensities with a lookup table into a reused per-thread
+    buffer, and all DCT factors are computed with precomputed cosine matrices
+    instead of per-pixel loops. The result may differ from `calculate_blurhash` in the
+    last digit of a component in rare cases of rounding. See
+    `blurhash_thumbnail` for the meaning of `adaptive` and `draft`.
+
+    If `float32` is unset, each thumbnail is encoded in double precision with
+    `blurhash_numba` instead, with the same results as `calculate_blurhash`.
+    """
+
+    import numpy as np
+
+    thumbnails = [
+        blurhash_thumbnail(
+            image=image,
+            x_components=x_components,
+            y_components=y_components,
+            adaptive=adaptive,
+            draft=draft,
+        )
+        for image in images
+    ]
+
+    if not float32:
+        return [_blurhash_numba(*thumbnail) for thumbnail in thumbnails]
+
+    def components(index: int) -> tuple[int, int]:
+        return thumbnails[index][1], thumbnails[index][2]
+
+    blurhashes: list[str] = [""] * len(thumbnails)
+    indexes = sorted(range(len(thumbnails)), key=components)
+    for (x, y), group in groupby(indexes, key=components):
+        group_indexes = tuple(group)
+        stacked = np.stack([np.asarray(thumbnails[i][0]) for i in group_indexes])
+        for i, factors in zip(
+            group_indexes,
+            _blurhash_factors(stacked, x, y),
+            strict=True,
+        ):
+            blurhashes[i] = blurhash_from_factors(factors)
+
+    return blurhashes
+
+
+class BlurHashCache:
+    """Persistent BlurHash cache backed by an SQLite file.
+
+    Entries are keyed by the image's content checksum, the number of
+    components and the encoder variant, see `key`. Once `max_entries` is
+    exceeded, the least recently used entries are evicted.
+    """
+
+    commit_interval: int = 1000
+
+    @classmethod
+    def from_uri(cls, uri: str, max_entries: int | None = None) -> BlurHashCache:
+        """Open the cache from a `sqlite:///path/to/file.db` URI or a plain path."""
+
+        parsed = urlparse(uri)
+        if parsed.scheme == "sqlite":
+            path = parsed.netloc + parsed.path
+        elif not parsed.scheme or len(parsed.scheme) == 1:  # Windows drive letter
+            path = uri
+        else:
+            msg = f"Unsupported BlurHash cache URI <{uri}>"
+            raise ValueError(msg)
+
+        return cls(path=path, max_entries=max_entries)
+
+    def __init__(self, path: str | Path, max_entries: int | None = None) -> None:
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(self.path)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS blurhash "
+            "(key TEXT PRIMARY KEY, blurhash TEXT NOT NULL, accessed REAL NOT NULL)",
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS blurhash_accessed ON blurhash (accessed)",
+        )
+        self._connection.commit()
+        self._pending_writes = 0
+
+    @staticmethod
+    def key(
+        checksum: str,
+        x_components: int,
+        y_components: int,
+        *,
+        adaptive: bool = False,
+        float32: bool = False,
+    ) -> str:
+        """Cache key for an image checksum, the number of components and the
+        encoder variant (`adaptive` components, `float32` precision), since
+        each of them may yield a different BlurHash."""
+        key = f"{checksum}:{x_components}x{y_components}"
+        if adaptive:
+            key += ":adaptive"
+        if float32:
+            key += ":float32"
+        return key
+
+    def get(self, key: str) -> str | None:
+        """Look up a BlurHash, marking it as recently used."""
+
+        row = self._connection.execute(
+            "SELECT blurhash FROM blurhash WHERE key = ?",
+            (key,),
+        ).fetchone()
+        if row is None:
+            return None
+
+        self._connection.execute(
+            "UPDATE blurhash SET accessed = ? WHERE key = ?",
+            (time.time(), key),
+        )
+        self._written()
+        blurhash: str = row[0]
+        return blurhash
+
+    def set(self, key: str, blurhash: str) -> None:
+        """Store a BlurHash, evicting old entries if necessary."""
+
+        self._connection.execute(
+            "INSERT OR REPLACE INTO blurhash (key, blurhash, accessed) "
+            "VALUES (?, ?, ?)",
+            (key, blurhash, time.time()),
+        )
+        self._written()
+
+    def _written(self) -> None:
+        self._pending_writes += 1
+        if self._pending_writes >= self.commit_interval:
+            self.commit()
+
+    def evict(self) -> int:
+        """Remove the least recently used entries beyond `max_entries`."""
+
+        if not self.max_entries or self.max_entries < 0:
+            return 0
+
+        (count,) = self._connection.execute(
+            "SELECT COUNT(*) FROM blurhash",
+        ).fetchone()
+        excess = count - self.max_entries
+        if excess <= 0:
+            return 0
+
+        self._connection.execute(
+            "DELETE FROM blurhash WHERE key IN "
+            "(SELECT key FROM blurhash ORDER BY accessed LIMIT ?)",
+            (excess,),
+        )
+        LOGGER.debug("Evicted %d entries from BlurHash cache <%s>", excess, self.path)
+        return int(excess)
+
+    def commit(self) -> None:
+        """Evict excess entries and write pending changes to disk."""
+
+        self.evict()
+        self._connection.commit()
+        self._pending_writes = 0
+
+    def close(self) -> None:
+        """Commit and close the underlying database."""
+
+        self.commit()
+        self._connection.close()
+
+
+@lru_cache(maxsize=16)
+def _bit_masks(bits: int, max_set: int) -> tuple[int, ...]:
+    """All `bits` wide integers with at most `max_set` bits set."""
+
+    return tuple(
+        sum(1 << bit for bit in set_bits)
+        for count in range(max_set + 1)
+        for set_bits in combinations(range(bits), count)
+    )
+
+
+def _popcount(values: npt.NDArray[np.uint64]) -> npt.NDArray[np.uint8]:
+    import numpy as np
+
+    counts: npt.NDArray[np.uint8]
+    if hasattr(np, "bitwise_count"):  # NumPy 2.0+
+        counts = np.bitwise_count(values)
+    else:
+        bits = np.unpackbits(values.view(np.uint8).reshape(-1, 8), axis=1)
+        counts = bits.sum(axis=1, dtype=np.uint8)
+    return counts
+
+
+class HammingIndex:
+    """Index of 64 bit hashes for fast lookups by Hamming distance.
+
+    A multi-index hash table: every hash is split into `chunks` substrings, each
+    with its own hash table. Two hashes within distance `d` agree up to
+    `d // chunks` bits in at least one substring, so a query only needs to probe
+    the buckets close to its own substrings and verify the few candidates found
+    there, instead of comparing against every hash in the index.
+
+    With the default of 4 chunks, lookups up to distance 7 probe only the buckets
+    one bit away and stay well below a millisecond for millions of hashes.
+
+    If a `path` is given, the hashes are persisted in an SQLite file and loaded
+    again when the index is reopened.
+    """
+
+    commit_interval: int = 1000
+
+    @classmethod
+    def from_uri(cls, uri: str) -> HammingIndex:
+        """Open the index from a `sqlite:///path/to/file.db` URI or a plain path."""
+
+        parsed = urlparse(uri)
+        if parsed.scheme == "sqlite":
+            path = parsed.netloc + parsed.path
+        elif not parsed.scheme or len(parsed.scheme) == 1:  # Windows drive letter
+            path = uri
+        else:
+            msg = f"Unsupported Hamming index URI <{uri}>"
+            raise ValueError(msg)
+
+        return cls(path=path)
+
+    def __init__(self, path: str | Path | None = None, chunks: int = 4) -> None:
+        if 64 % chunks:
+            msg = f"64 bit hashes can't be split into {chunks} chunks"
+            raise ValueError(msg)
+
+        import numpy as np
+
+        self.chunks = chunks
+        self.chunk_bits = 64 // chunks
+        self._keys: list[str] = []
+        # Grown by doubling, so candidates can be verified in one vectorised step
+        self._hashes = np.zeros(1024, dtype=np.uint64)
+        self._tables: list[dict[int, list[int]]] = [{} for _ in range(chunks)]
+        self._pending_writes = 0
+
+        self.path = Path(path) if path is not None else None
+        self._connection: sqlite3.Connection | None = None
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(self.path)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS hamming_index "
+                "(key TEXT NOT NULL, hash INTEGER NOT NULL)",
+            )
+            self._connection.commit()
+            for key, value in self._connection.execute(
+                "SELECT key, hash FROM hamming_index ORDER BY rowid",
+            ):
+                # SQLite integers are signed
+                self._insert(value & 0xFFFF_FFFF_FFFF_FFFF, key)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _substrings(self, value: int) -> list[int]:
+        mask = (1 << self.chunk_bits) - 1
+        return [(value >> (i * self.chunk_bits)) & mask for i in range(self.chunks)]
+
+    def _insert(self, value: int, key: str) -> None:
+        import numpy as np
+
+        index = len(self._keys)
+        if index == len(self._hashes):
+            self._hashes = np.concatenate([self._hashes, np.zeros_like(self._hashes)])
+        self._hashes[index] = value
+        self._keys.append(key)
+        for table, substring in zip(
+            self._tables,
+            self._substrings(value),
+            strict=True,
+        ):
+            table.setdefault(substring, []).append(index)
+
+    def add(self, value: int, key: str) -> None:
+        """Add a hash, e.g., `int(phash, 16)`, under the given key."""
+
+        self._insert(value, key)
+        if self._connection is not None:
+            self._connection.execute(
+                "INSERT INTO hamming_index (key, hash) VALUES (?, ?)",
+                (key, value - (1 << 64) if value >= 1 << 63 else value),
+            )
+            self._pending_writes += 1
+            if self._pending_writes >= self.commit_interval:
+                self.commit()
+
+    def query(self, value: int, max_distance: int) -> list[tuple[str, int]]:
+        """Keys and distances of the hashes within `max_distance` of `value`,
+        closest first.
+        """
+
+        import numpy as np
+
+        masks = _bit_masks(self.chunk_bits, max_distance // self.chunks)
+        candidates = np.fromiter(
+            chain.from_iterable(
+                table.get(substring ^ mask, ())
+                for table, substring in zip(
+                    self._tables,
+                    self._substrings(value),
+                    strict=True,
+                )
+                for mask in masks
+            ),
+            dtype=np.int64,
+        )
+
+        distances = _popcount(self._hashes[candidates] ^ np.uint64(value))
+        # A hash may be a candidate in several substrings
+        hits, first = np.unique(
+            candidates[distances <= max_distance],
+            return_index=True,
+        )
+        hit_distances = distances[distances <= max_distance][first]
+        order = np.argsort(hit_distances, kind="stable")
+        return [
+            (self._keys[index], int(distance))
+            for index, distance in zip(hits[order], hit_distances[order], strict=True)
+        ]
+
+    def commit(self) -> None:
+        """Write pending changes to disk."""
+
+        if self._connection is not None:
+            self._connection.commit()
+        self._pending_writes = 0
+
+    def close(self) -> None:
+        """Commit and close the underlying database, if any."""
+
+        if self._connection is not None:
+            self.commit()
+            self._connection.close()
+            self._connection = None
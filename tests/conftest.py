@@ -0,0 +1,102 @@
+"""Shared fixtures of the tests."""
+
+from __future__ import annotations
+
+from io import BytesIO
+from typing import TYPE_CHECKING
+
+import pytest
+from scrapy.utils.reactor import install_reactor
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from pathlib import Path
+
+    from PIL.Image import Image
+
+# Like Scrapy's own tests: crawlers are created with the reactor they run with
+install_reactor("twisted.internet.asyncioreactor.AsyncioSelectorReactor")
+
+
+def picture(
+    width: int = 64,
+    height: int = 48,
+    mode: str = "RGB",
+    seed: int = 0,
+) -> Image:
+    """A smooth, colourful test image, different for every `seed`."""
+
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    blocks = Image.fromarray(rng.integers(0, 256, (6, 8, 3), dtype=np.uint8))
+    image = blocks.resize((width, height), Image.Resampling.BICUBIC)
+    if mode == "RGBA":
+        image.putalpha(Image.linear_gradient("L").resize((width, height)))
+    return image if mode in {"RGB", "RGBA"} else image.convert(mode)
+
+
+def encode(image: Image, image_format: str = "PNG") -> bytes:
+    """The image saved in the given format."""
+
+    buffer = BytesIO()
+    image.save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+def components(blurhash: str) -> tuple[int, int]:
+    """The number of components a BlurHash was calculated with."""
+
+    from scrapy_extensions.utils import BASE83_ALPHABET
+
+    size_flag = BASE83_ALPHABET.index(blurhash[0])
+    return size_flag % 9 + 1, size_flag // 9 + 1
+
+
+def average_colour(blurhash: str) -> tuple[int, int, int]:
+    """The sRGB average colour encoded in a BlurHash."""
+
+    from scrapy_extensions.utils import BASE83_ALPHABET
+
+    value = 0
+    for char in blurhash[2:6]:
+        value = value * 83 + BASE83_ALPHABET.index(char)
+    return value >> 16, value >> 8 & 255, value & 255
+
+
+class MemoryStore:
+    """In-memory `ReadableStore`, standing in for a remote store."""
+
+    def __init__(self, files: dict[str, bytes] | None = None) -> None:
+        self.files = dict(files or {})
+
+    def read_file(self, path: str) -> bytes:
+        """The content of the file, `KeyError` if it doesn't exist."""
+        return self.files[path]
+
+
+@pytest.fixture
+def images_store(tmp_path: Path) -> Path:
+    """An empty `IMAGES_STORE`."""
+
+    path = tmp_path / "images"
+    (path / "full").mkdir(parents=True)
+    return path
+
+
+@pytest.fixture
+def store_image(images_store: Path) -> Callable[..., dict[str, str]]:
+    """Save an image to the store, returning its `ImagesPipeline` result."""
+
+    def save(
+        name: str = "image",
+        image: Image | None = None,
+        image_format: str = "PNG",
+    ) -> dict[str, str]:
+        data = encode(image or picture(), image_format)
+        path = f"full/{name}.{image_format.lower()}"
+        (images_store / path).write_bytes(data)
+        return {"url": f"https://example.com/{name}", "path": path, "checksum": name}
+
+    return save
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+from random import Random
+
+import pytest
+
+from scrapy_extensions.backoff import (
+    BACKOFF_STRATEGIES,
+    constant,
+    decorrelated_jitter,
+    equal_jitter,
+    exponential,
+    fibonacci,
+    full_jitter,
+    linear,
+)
+
+
+def _delays(strategy: str, attempts: int = 8, seed: int = 0) -> list[float]:
+    rng = Random(seed)
+    delays = []
+    previous = 1.0
+    for attempt in range(attempts):
+        previous = BACKOFF_STRATEGIES[strategy](attempt, previous, 1, 20, rng)
+        delays.append(previous)
+    return delays
+
+
+def test_deterministic_strategies() -> None:
+    rng = Random(0)
+    assert [constant(i, 1, 3, 1, rng) for i in range(3)] == [3, 3, 3]
+    assert _delays("exponential") == [1, 2, 4, 8, 16, 20, 20, 20]
+    assert _delays("linear") == [1, 2, 3, 4, 5, 6, 7, 8]
+    assert _delays("fibonacci") == [1, 1, 2, 3, 5, 8, 13, 20]
+    # No overflow, however many attempts
+    assert exponential(10_000, 1, 1, 20, rng) == 20
+    assert fibonacci(10_000, 1, 1, 20, rng) == 20
+    assert linear(10_000, 1, 1, 20, rng) == 20
+
+
+@pytest.mark.parametrize("strategy", ["full_jitter", "equal_jitter"])
+def test_jitter(strategy: str) -> None:
+    delays = _delays(strategy, attempts=100)
+    exponential_delays = _delays("exponential", attempts=100)
+    fraction = 0 if strategy == "full_jitter" else 0.5
+    for delay, upper in zip(delays, exponential_delays, strict=True):
+        assert fraction * upper <= delay <= upper
+    # Reproducible with the same seed, different with another
+    assert _delays(strategy, attempts=100) == delays
+    assert _delays(strategy, attempts=100, seed=1) != delays
+
+
+def test_decorrelated_jitter() -> None:
+    rng = Random(0)
+    previous = 1.0
+    for _ in range(100):
+        delay = decorrelated_jitter(0, previous, 1, 20, rng)
+        assert 1 <= delay <= min(20, 3 * previous)
+        previous = delay
+
+
+def test_jitter_spreads_delays() -> None:
+    rng = Random(0)
+    # Requests failing at the same moment don't retry in lockstep
+    for strategy in (full_jitter, equal_jitter, decorrelated_jitter):
+        delays = {round(strategy(3, 4, 1, 20, rng), 3) for _ in range(100)}
+        assert len(delays) > 90
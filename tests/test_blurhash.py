@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import csv
+import json
+import logging
+import runpy
+import sys
+from typing import TYPE_CHECKING, Any
+
+import pytest
+
+from scrapy_extensions.blurhash import BlurHashBackfill, _calculate_blurhashes, main
+from scrapy_extensions.utils import calculate_blurhash
+from tests.conftest import picture
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from pathlib import Path
+
+    StoreImage = Callable[..., dict[str, str]]
+
+
+def _read_lines(path: Path) -> list[dict[str, Any]]:
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+@pytest.fixture
+def records(store_image: StoreImage) -> list[dict[str, Any]]:
+    return [
+        {"id": i, "images": [store_image(f"image{i}", picture(seed=i))]}
+        for i in range(5)
+    ]
+
+
+def test_backfill_jsonl(
+    images_store: Path,
+    store_image: StoreImage,
+    tmp_path: Path,
+) -> None:
+    image_obj = store_image()
+    (images_store / "full" / "broken.png").write_bytes(b"not an image")
+    feed = tmp_path / "items.jl"
+    items: list[dict[str, Any]] = [
+        {"id": 1, "images": [image_obj, {"path": "full/missing.png"}]},
+        {"id": 2, "images": "full/broken.png"},
+        {"id": 3},
+    ]
+    feed.write_text("\n".join(json.dumps(item) for item in items) + "\n\n")
+    output = tmp_path / "out.jl"
+
+    main(["-s", str(images_store), str(feed), "-o", str(output), "-t", "hashes"])
+
+    first, second, third = _read_lines(output)
+    expected = calculate_blurhash(images_store / image_obj["path"])
+    assert first["hashes"] == [
+        {**image_obj, "blurhash": expected},
+        {"path": "full/missing.png", "blurhash": None},
+    ]
+    assert first["images"] == items[0]["images"]
+    assert second["hashes"] == [{"path": "full/broken.png", "blurhash": None}]
+    assert third["hashes"] == []
+
+
+def test_backfill_csv(
+    images_store: Path,
+    store_image: StoreImage,
+    tmp_path: Path,
+) -> None:
+    one, two = store_image("one"), store_image("two", picture(seed=1))
+    feed = tmp_path / "items.csv"
+    with feed.open("w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=["id", "images"])
+        writer.writeheader()
+        writer.writerow({"id": 1, "images": json.dumps([one])})
+        writer.writerow({"id": 2, "images": f"{one['path']}, {two['path']}"})
+        writer.writerow({"id": 3, "images": ""})
+    output = tmp_path / "out.csv"
+
+    main(["-s", str(images_store), str(feed), "-o", str(output), "-x", "3", "-w", "2"])
+
+    with output.open(newline="") as file:
+        rows = list(csv.DictReader(file))
+    assert [row["id"] for row in rows] == ["1", "2", "3"]
+    blurhashes = [
+        calculate_blurhash(images_store / image_obj["path"], 3, 4)
+        for image_obj in (one, two)
+    ]
+    assert json.loads(rows[0]["images"]) == [{**one, "blurhash": blurhashes[0]}]
+    assert [
+        image_obj["blurhash"] for image_obj in json.loads(rows[1]["images"])
+    ] == blurhashes
+    assert json.loads(rows[2]["images"]) == []
+
+
+def test_backfill_store(
+    images_store: Path,
+    store_image: StoreImage,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    (images_store / "full" / "sub").mkdir()
+    store_image("sub/b", picture(seed=1))
+    store_image("a")
+
+    main(["-s", str(images_store), "--float32", "-v", "-w", "1"])
+
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert lines == [
+        {
+            "path": path,
+            "blurhash": calculate_blurhash(images_store / path, float32=True),
+        }
+        for path in ("full/a.png", "full/sub/b.png")
+    ]
+
+
+def test_backfill_resume(
+    images_store: Path,
+    records: list[dict[str, Any]],
+    tmp_path: Path,
+) -> None:
+    feed = tmp_path / "items.jl"
+    feed.write_text("".join(json.dumps(record) + "\n" for record in records))
+    output = tmp_path / "out.jl"
+    checkpoint = tmp_path / "checkpoint.json"
+    args = ["-s", str(images_store), str(feed), "-o", str(output)]
+    args += ["-c", str(checkpoint), "--checkpoint-interval", "2", "-w", "1"]
+
+    main(args)
+    expected = output.read_text()
+    assert [record["id"] for record in _read_lines(output)] == list(range(5))
+    assert json.loads(checkpoint.read_text()) == {
+        "processed": 5,
+        "offset": len(expected.encode()),
+    }
+
+    # Interrupted after writing three records, but checkpointed after two
+    lines = expected.splitlines(keepends=True)
+    output.write_text("".join(lines[:3]))
+    offset = len("".join(lines[:2]).encode())
+    checkpoint.write_text(json.dumps({"processed": 2, "offset": offset}))
+
+    main(args)
+    assert output.read_text() == expected
+
+
+def test_backfill_resume_legacy_checkpoint(
+    images_store: Path,
+    records: list[dict[str, Any]],
+    tmp_path: Path,
+) -> None:
+    feed = tmp_path / "items.jl"
+    feed.write_text("".join(json.dumps(record) + "\n" for record in records))
+    output = tmp_path / "out.jl"
+    checkpoint = tmp_path / "checkpoint.json"
+    # Without an offset, the output is appended to as is
+    checkpoint.write_text(json.dumps({"processed": 4}))
+
+    main(["-s", str(images_store), str(feed), "-o", str(output), "-c", str(checkpoint)])
+
+    assert [record["id"] for record in _read_lines(output)] == [4]
+
+
+def test_backfill_checkpoint_requires_output(
+    images_store: Path,
+    tmp_path: Path,
+) -> None:
+    with pytest.raises(SystemExit):
+        main(["-s", str(images_store), "-c", str(tmp_path / "checkpoint.json")])
+
+
+def test_backfill_progress(
+    images_store: Path,
+    records: list[dict[str, Any]],
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    backfill = BlurHashBackfill(
+        images_store=images_store,
+        workers=1,
+        progress_interval=0,
+    )
+
+    with caplog.at_level(logging.INFO):
+        results = list(backfill.process(records))
+    assert [result["id"] for result in results] == list(range(5))
+    assert backfill.records_count == backfill.images_count == 5
+    assert caplog.text.count("Processed") >= 5
+
+
+def test_main_module(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr("sys.argv", ["blurhash", "--help"])
+    # Run the module afresh, as `python -m` would
+    monkeypatch.delitem(sys.modules, "scrapy_extensions.blurhash")
+    with pytest.raises(SystemExit) as exc_info:
+        runpy.run_module("scrapy_extensions.blurhash", run_name="__main__")
+    assert exc_info.value.code == 0
+
+
+def test_calculate_blurhashes(
+    images_store: Path,
+    store_image: StoreImage,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    # Runs in the worker processes, which coverage doesn't see
+    image_obj = store_image()
+    broken = images_store / "full" / "broken.png"
+    broken.write_bytes(b"not an image")
+    path = str(images_store / image_obj["path"])
+
+    assert _calculate_blurhashes([path, None, str(broken)], 3, 4, float32=True) == [
+        calculate_blurhash(path, 3, 4, float32=True),
+        None,
+        None,
+    ]
+    assert "Unable to calculate BlurHash for image" in caplog.text
+
+
+def test_backfill_empty_paths(images_store: Path) -> None:
+    backfill = BlurHashBackfill(images_store=images_store, target_field="hashes")
+    assert backfill._full_path({"path": ""}) is None
+    assert backfill._full_path(None) is None
@@ -0,0 +1,690 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import subprocess
+import sys
+import time
+from email.utils import formatdate
+from pathlib import Path
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, Any
+
+import pytest
+from scrapy import Request, Spider
+from scrapy.downloadermiddlewares.retry import RetryMiddleware
+from scrapy.exceptions import DontCloseSpider, IgnoreRequest, NotConfigured
+from scrapy.http import Response
+from scrapy.utils.httpobj import urlparse_cached
+from scrapy.utils.test import get_crawler
+
+from scrapy_extensions import signals
+from scrapy_extensions.backoff import BACKOFF_STRATEGIES, linear
+from scrapy_extensions.downloadermiddlewares import (
+    CircuitBreaker,
+    DelayedRequestQueue,
+    DelayedRetryMiddleware,
+    RetryBudget,
+    header_delay,
+)
+
+if TYPE_CHECKING:
+    from scrapy.crawler import Crawler
+
+
+def _middleware(**settings: Any) -> tuple[DelayedRetryMiddleware, Spider]:
+    crawler = get_crawler(
+        settings_dict={
+            "DELAYED_RETRY_HTTP_CODES": [429, 503],
+            "DELAYED_RETRY_QUEUE": False,
+            "DELAYED_RETRY_DELAY": 0,
+            **settings,
+        },
+    )
+    spider = crawler._create_spider("test")
+    crawler.spider = spider
+    return DelayedRetryMiddleware.from_crawler(crawler), spider
+
+
+def _queue_middleware(**settings: Any) -> tuple[DelayedRetryMiddleware, list[Request]]:
+    """A middleware with the queue, whose engine collects the crawled requests."""
+
+    middleware, spider = _middleware(DELAYED_RETRY_QUEUE=True, **settings)
+    crawled: list[Request] = []
+    spider.crawler.engine = SimpleNamespace(  # type: ignore[assignment]
+        crawl=crawled.append,
+        downloader=SimpleNamespace(
+            get_slot_key=lambda request: urlparse_cached(request).netloc,
+        ),
+    )
+    return middleware, crawled
+
+
+def _stats(crawler: Crawler) -> dict[str, Any]:
+    assert crawler.stats is not None
+    return crawler.stats.get_stats()
+
+
+def _retry(
+    middleware: DelayedRetryMiddleware,
+    spider: Spider,
+    request: Request,
+    status: int = 429,
+    headers: dict[str, str] | None = None,
+) -> Request | Response:
+    response = Response(request.url, status=status, headers=headers)
+    return asyncio.run(middleware.process_response(request, response, spider))
+
+
+def _delays(middleware: DelayedRetryMiddleware, spider: Spider) -> list[float]:
+    request = Request("https://example.com")
+    delays = []
+    for _ in range(5):
+        result = _retry(middleware, spider, request)
+        assert isinstance(result, Request)
+        delays.append(result.meta["delayed_retry_last_delay"])
+        request = result
+    assert request.meta["delayed_retry_times"] == 5
+    return delays
+
+
+@pytest.mark.parametrize(
+    ("settings", "strategy"),
+    [
+        ({}, "constant"),
+        ({"DELAYED_RETRY_BACKOFF": True}, "exponential"),
+        ({"DELAYED_RETRY_BACKOFF_STRATEGY": "fibonacci"}, "fibonacci"),
+        (
+            {
+                "DELAYED_RETRY_BACKOFF": True,
+                "DELAYED_RETRY_BACKOFF_STRATEGY": "linear",
+            },
+            "linear",
+        ),
+    ],
+)
+def test_backoff_strategy_setting(settings: dict[str, Any], strategy: str) -> None:
+    middleware, _ = _middleware(**settings)
+    assert middleware.delayed_retry_backoff_strategy is BACKOFF_STRATEGIES[strategy]
+
+
+def test_delayed_retry_http_codes(caplog: pytest.LogCaptureFixture) -> None:
+    middleware, _ = _middleware(DELAYED_RETRY_HTTP_CODES=["429", 503, 0])
+    assert middleware.delayed_retry_http_codes == {429, 503}
+
+    with pytest.raises(NotConfigured):
+        _middleware(DELAYED_RETRY_HTTP_CODES=[429, "too many"])
+    assert "Invalid http code(s) in DELAYED_RETRY_HTTP_CODES" in caplog.text
+
+
+def test_delayed_retry_other_status(monkeypatch: pytest.MonkeyPatch) -> None:
+    middleware, spider = _middleware(RETRY_HTTP_CODES=[500])
+    request = Request("https://example.com")
+
+    # Handled by RetryMiddleware
+    assert isinstance(_retry(middleware, spider, request, status=500), Request)
+    ok = _retry(middleware, spider, request, status=200)
+    assert isinstance(ok, Response)
+    assert ok.status == 200
+
+    # Also if it's a coroutine
+    parent = Response(request.url, status=201)
+
+    async def process_response(*args: Any) -> Response:
+        return parent
+
+    monkeypatch.setattr(RetryMiddleware, "process_response", process_response)
+    assert _retry(middleware, spider, request, status=200) is parent
+
+
+def test_backoff_strategy_import_path() -> None:
+    for strategy in ("scrapy_extensions.backoff.linear", linear):
+        middleware, _ = _middleware(DELAYED_RETRY_BACKOFF_STRATEGY=strategy)
+        assert middleware.delayed_retry_backoff_strategy is linear
+
+    with pytest.raises(NotConfigured):
+        _middleware(DELAYED_RETRY_BACKOFF_STRATEGY="unknown")
+    with pytest.raises(NotConfigured):
+        _middleware(DELAYED_RETRY_BACKOFF_STRATEGY="scrapy_extensions.backoff.nope")
+
+
+def test_backoff_delays() -> None:
+    settings = {
+        "DELAYED_RETRY_DELAY": 0.001,
+        "DELAYED_RETRY_BACKOFF_MAX_DELAY": 0.01,
+    }
+    middleware, spider = _middleware(DELAYED_RETRY_BACKOFF=True, **settings)
+    assert _delays(middleware, spider) == [0.001, 0.002, 0.004, 0.008, 0.01]
+    assert _stats(spider.crawler)["delayed_retry/computed_delay"] == 5
+
+    # Jittered delays are reproducible with a seed
+    delays = []
+    for seed in (1, 1, 2):
+        middleware, spider = _middleware(
+            DELAYED_RETRY_BACKOFF_STRATEGY="full_jitter",
+            DELAYED_RETRY_SEED=seed,
+            **settings,
+        )
+        delays.append(_delays(middleware, spider))
+    assert delays[0] == delays[1] != delays[2]
+
+    # The base delay per request
+    middleware, spider = _middleware(
+        DELAYED_RETRY_BACKOFF_STRATEGY="linear",
+        DELAYED_RETRY_BACKOFF_MAX_DELAY=1,
+    )
+    request = Request("https://example.com", meta={"retry_delay": 0.002})
+    result = _retry(middleware, spider, request)
+    assert isinstance(result, Request)
+    assert result.meta["delayed_retry_last_delay"] == 0.002
+    assert result.meta["retry_delay"] == 0.002
+
+
+def _header_delay(**headers: str) -> float | None:
+    return header_delay(Response("https://example.com", headers=headers))
+
+
+def test_header_delay() -> None:
+    date = formatdate(1_700_000_000, usegmt=True)
+    assert _header_delay() is None
+    assert _header_delay(**{"Retry-After": "120"}) == 120
+    assert _header_delay(**{"Retry-After": "-5"}) == 0
+    assert _header_delay(
+        **{"Retry-After": formatdate(1_700_000_030, usegmt=True), "Date": date},
+    ) == pytest.approx(30)
+    assert _header_delay(**{"X-RateLimit-Reset": "15"}) == 15
+    assert _header_delay(
+        **{"RateLimit-Reset": "1700000045", "Date": date},
+    ) == pytest.approx(45)
+    # Without a Date header, compared to the local clock
+    delay = _header_delay(**{"X-RateLimit-Reset": str(int(time.time()) + 60)})
+    assert delay is not None
+    assert 55 <= delay <= 60
+    # Retry-After takes precedence
+    assert _header_delay(**{"Retry-After": "5", "X-RateLimit-Reset": "15"}) == 5
+
+    for value in ("soon", "nan", "inf"):
+        assert _header_delay(**{"Retry-After": value}) is None
+    assert _header_delay(**{"Retry-After": "soon", "RateLimit-Reset": "3"}) == 3
+    # A broken Date header is ignored
+    assert _header_delay(**{"Retry-After": "7", "Date": "yesterday"}) == 7
+
+
+def test_header_delay_retry() -> None:
+    middleware, spider = _middleware(
+        DELAYED_RETRY_DELAY=0.002,
+        DELAYED_RETRY_BACKOFF_MAX_DELAY=0.005,
+    )
+    request = Request("https://example.com")
+
+    result = _retry(middleware, spider, request, headers={"Retry-After": "0.001"})
+    assert isinstance(result, Request)
+    assert result.meta["delayed_retry_last_delay"] == 0.001
+    # Clamped to the maximum delay
+    result = _retry(middleware, spider, request, headers={"Retry-After": "3600"})
+    assert isinstance(result, Request)
+    assert result.meta["delayed_retry_last_delay"] == 0.005
+    result = _retry(middleware, spider, request, status=503)
+    assert isinstance(result, Request)
+    assert result.meta["delayed_retry_last_delay"] == 0.002
+
+    stats = _stats(spider.crawler)
+    assert stats["delayed_retry/header_delay"] == 2
+    assert stats["delayed_retry/computed_delay"] == 1
+
+    middleware, spider = _middleware(
+        DELAYED_RETRY_DELAY=0.002,
+        DELAYED_RETRY_RESPECT_HEADERS=False,
+    )
+    result = _retry(middleware, spider, request, headers={"Retry-After": "3600"})
+    assert isinstance(result, Request)
+    assert result.meta["delayed_retry_last_delay"] == 0.002
+
+
+def test_delayed_request_queue() -> None:
+    crawled: list[Request] = []
+    queue = DelayedRequestQueue(crawl=crawled.append)
+    requests = [Request(f"https://example.com/{i}") for i in range(3)]
+
+    async def run() -> None:
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        assert queue.next_ready_at() is None
+        queue.push(requests[0], now + 0.03)
+        queue.push(requests[1], now + 0.01)
+        queue.push(requests[2], now + 0.02)
+        assert len(queue) == 3
+        assert queue.next_ready_at() == now + 0.01
+        await asyncio.sleep(0.05)
+
+        queue.push(requests[0], now + 10)
+        assert queue.clear() == 1
+        assert queue.clear() == 0
+
+    asyncio.run(run())
+    assert crawled == [requests[1], requests[2], requests[0]]
+    assert not queue
+
+
+def test_delayed_retry_queue() -> None:
+    middleware, crawled = _queue_middleware(DELAYED_RETRY_DELAY=0.01)
+    crawler = middleware.crawler
+    assert middleware.delayed_queue is not None
+    request = Request("https://example.com")
+
+    async def run() -> None:
+        retry = await middleware.process_response(
+            request,
+            Response(request.url, status=429),
+        )
+        assert isinstance(retry, Request)
+        assert "delayed_retry_ready_at" in retry.meta
+
+        # Held back when the engine schedules it
+        with pytest.raises(IgnoreRequest):
+            middleware._request_scheduled(retry)
+        assert len(middleware.delayed_queue or ()) == 1
+        with pytest.raises(DontCloseSpider):
+            middleware._spider_idle()
+        await asyncio.sleep(0.03)
+        assert crawled == [retry]
+        assert "delayed_retry_ready_at" not in retry.meta
+        middleware._spider_idle()
+
+        # Scheduled again once released, or when already due
+        middleware._request_scheduled(retry)
+        retry.meta["delayed_retry_ready_at"] = asyncio.get_running_loop().time()
+        middleware._request_scheduled(retry)
+        assert "delayed_retry_ready_at" not in retry.meta
+
+    asyncio.run(run())
+    stats = _stats(crawler)
+    assert stats["delayed_retry/queued"] == stats["delayed_retry/released"] == 1
+    assert stats["delayed_retry/queue_max"] == 1
+
+
+def test_delayed_retry_queue_closed(caplog: pytest.LogCaptureFixture) -> None:
+    middleware, crawled = _queue_middleware(DELAYED_RETRY_DELAY=60)
+    request = Request("https://example.com")
+
+    async def run() -> None:
+        retry = await middleware.process_response(
+            request,
+            Response(request.url, status=503),
+        )
+        assert isinstance(retry, Request)
+        with pytest.raises(IgnoreRequest):
+            middleware._request_scheduled(retry)
+
+        # The crawl doesn't look stuck: waiting retries are logged, but not
+        # every time the engine checks for idleness
+        with caplog.at_level(logging.INFO):
+            for _ in range(3):
+                with pytest.raises(DontCloseSpider):
+                    middleware._spider_idle()
+        assert caplog.text.count("Waiting for 1 delayed retry request(s)") == 1
+        assert "due in 60.0 second(s)" in caplog.text
+
+        with caplog.at_level(logging.INFO):
+            middleware._spider_closed()
+        assert "Dropped 1 delayed retry request(s)" in caplog.text
+
+    asyncio.run(run())
+    assert not crawled
+    assert not middleware.delayed_queue
+
+
+def test_delayed_retry_queue_requires_scrapy(
+    monkeypatch: pytest.MonkeyPatch,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    monkeypatch.setattr(
+        "scrapy_extensions.downloadermiddlewares._CAN_HOLD_SCHEDULED_REQUESTS",
+        False,
+    )
+    middleware, spider = _middleware(
+        DELAYED_RETRY_QUEUE=True,
+        DELAYED_RETRY_CIRCUIT_BREAKER_THRESHOLD=5,
+    )
+    assert middleware.delayed_queue is None
+    assert not middleware.circuit_threshold
+    assert "requires Scrapy 2.11.2" in caplog.text
+
+    # Waits for the delay right away instead
+    result = _retry(middleware, spider, Request("https://example.com"))
+    assert isinstance(result, Request)
+    assert "delayed_retry_ready_at" not in result.meta
+
+
+@pytest.mark.filterwarnings("ignore:Passing a 'spider' argument")
+@pytest.mark.parametrize("legacy", [False, True])
+def test_delayed_retry_spider_argument(
+    monkeypatch: pytest.MonkeyPatch,
+    *,
+    legacy: bool,
+) -> None:
+    # Scrapy < 2.14 passes the spider to the middleware methods
+    if legacy:
+        monkeypatch.setattr(
+            "scrapy_extensions.downloadermiddlewares._PASS_SPIDER",
+            True,
+        )
+    middleware, spider = _middleware(RETRY_HTTP_CODES=[500])
+    request = Request("https://example.com")
+
+    for args in ((), (spider,)):
+        assert middleware.process_request(request, *args) is None
+        result = asyncio.run(
+            middleware.process_response(
+                request,
+                Response(request.url, status=500),
+                *args,
+            ),
+        )
+        assert isinstance(result, Request)
+        assert isinstance(
+            asyncio.run(
+                middleware.process_response(request, Response(request.url), *args),
+            ),
+            Response,
+        )
+        exception_result = middleware.process_exception(
+            request,
+            TimeoutError(),
+            *args,
+        )
+        assert isinstance(exception_result, Request)
+        assert middleware.process_exception(request, ValueError(), *args) is None
+
+    request = Request("https://example.com", meta={"dont_retry": True})
+    response = Response(request.url, status=429)
+    assert asyncio.run(middleware.process_response(request, response)) is response
+
+
+@pytest.mark.parametrize("queue", ["on", "off"])
+def test_delayed_retry_crawl(queue: str) -> None:
+    # A real crawl against a local server answering every URL with a 429 first
+    crawl = subprocess.run(  # noqa: S603
+        [
+            sys.executable,
+            "-m",
+            "benchmarks.retry_memory",
+            "--urls",
+            "5",
+            "--body-size",
+            "1024",
+            "--delay",
+            "0.2",
+            "--queue",
+            queue,
+        ],
+        cwd=Path(__file__).parent.parent,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    result = json.loads(crawl.stdout.splitlines()[-1])
+    # No deprecated middleware method signatures
+    assert "DelayedRetryMiddleware." not in crawl.stderr
+
+    # Every retry is downloaded again and gets its 200
+    assert result["retries"] == result["responses"] == 5
+    queued = 5 if queue == "on" else 0
+    assert result["queued"] == result["released"] == queued
+
+
+def test_circuit_breaker_window() -> None:
+    breaker = CircuitBreaker(threshold=3, window=10)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert not breaker.record_failure(0)
+    assert not breaker.record_failure(5)
+    # The first failure is out of the window again
+    assert not breaker.record_failure(10)
+    assert breaker.record_failure(12)
+    breaker.cancel_timer()
+
+
+def _record_circuit_signals(crawler: Crawler) -> list[tuple[object, str]]:
+    sent: list[tuple[object, str]] = []
+    for signal in (
+        signals.circuit_opened,
+        signals.circuit_half_opened,
+        signals.circuit_closed,
+    ):
+
+        def handler(slot: str, spider: Spider, signal: object = signal) -> None:
+            assert spider is crawler.spider
+            sent.append((signal, slot))
+
+        crawler.signals.connect(handler, signal=signal, weak=False)
+    return sent
+
+
+def _park(middleware: DelayedRetryMiddleware, request: Request) -> None:
+    parked = middleware.process_request(request)
+    assert parked is not None
+    with pytest.raises(IgnoreRequest):
+        middleware._request_scheduled(parked)
+
+
+def test_circuit_breaker_transitions() -> None:
+    middleware, crawled = _queue_middleware(
+        DELAYED_RETRY_DELAY=60,
+        DELAYED_RETRY_CIRCUIT_BREAKER_THRESHOLD=2,
+        DELAYED_RETRY_CIRCUIT_BREAKER_COOLDOWN=0.02,
+    )
+    crawler = middleware.crawler
+    sent = _record_circuit_signals(crawler)
+
+    def request(path: str) -> Request:
+        return Request(f"https://example.com/{path}")
+
+    async def respond(request: Request, status: int) -> None:
+        await middleware.process_response(request, Response(request.url, status=status))
+
+    async def run() -> None:
+        # Other slots and successes don't count
+        await respond(Request("https://example.org"), 200)
+        await respond(request("a"), 200)
+        assert not middleware.circuit_breakers
+
+        # Closed -> open after two delayed-retry codes
+        await respond(request("a"), 503)
+        assert middleware.process_request(request("b")) is None
+        middleware.process_exception(request("b"), TimeoutError())
+        breaker = middleware.circuit_breakers["example.com"]
+        assert breaker.state == CircuitBreaker.OPEN
+        assert sent == [(signals.circuit_opened, "example.com")]
+
+        # Requests to the slot are parked, others pass
+        _park(middleware, request("c"))
+        _park(middleware, request("d"))
+        assert middleware.process_request(Request("https://example.org")) is None
+        with pytest.raises(DontCloseSpider):
+            middleware._spider_idle()
+
+        # Open -> half-open after the cooldown, sending a single probe
+        await asyncio.sleep(0.03)
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        (probe,) = crawled
+        assert probe.url == "https://example.com/c"
+        assert middleware.process_request(probe) is None
+        assert probe.meta["delayed_retry_probe"]
+        _park(middleware, request("e"))
+
+        # A failed probe opens the breaker again
+        await respond(probe, 429)
+        assert breaker.state == CircuitBreaker.OPEN
+        await asyncio.sleep(0.03)
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        probe = crawled[-1]
+        assert probe.url == "https://example.com/d"
+        assert middleware.process_request(probe) is None
+
+        # Half-open -> closed once the probe succeeds, releasing the rest
+        await respond(probe, 200)
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert [request.url for request in crawled] == [
+            "https://example.com/c",
+            "https://example.com/d",
+            "https://example.com/e",
+        ]
+        assert middleware.process_request(request("f")) is None
+
+    asyncio.run(run())
+    assert [signal for signal, _ in sent] == [
+        signals.circuit_opened,
+        signals.circuit_half_opened,
+        signals.circuit_opened,
+        signals.circuit_half_opened,
+        signals.circuit_closed,
+    ]
+    stats = _stats(crawler)
+    assert stats["delayed_retry/circuit/open"] == 2
+    assert stats["delayed_retry/circuit/half_open"] == 2
+    assert stats["delayed_retry/circuit/closed"] == 1
+    assert stats["delayed_retry/circuit/parked"] == 3
+    middleware._spider_closed()
+
+
+def test_circuit_breaker_lost_probe() -> None:
+    middleware, crawled = _queue_middleware(
+        DELAYED_RETRY_CIRCUIT_BREAKER_THRESHOLD=1,
+        DELAYED_RETRY_CIRCUIT_BREAKER_COOLDOWN=0.02,
+    )
+
+    async def run() -> None:
+        request = Request("https://example.com")
+        middleware.process_exception(request, TimeoutError())
+        breaker = middleware.circuit_breakers["example.com"]
+        # Nothing to probe with yet
+        await asyncio.sleep(0.03)
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert not crawled
+
+        # The probe is sent, but gets lost
+        assert middleware.process_request(Request("https://example.com/a")) is None
+        _park(middleware, Request("https://example.com/b"))
+        # Another probe is sent after the cooldown if the first one gets lost
+        await asyncio.sleep(0.03)
+        assert [request.url for request in crawled] == ["https://example.com/b"]
+
+        # Nothing left to wait for
+        middleware._spider_idle()
+        middleware._spider_closed()
+        assert breaker.timer is None
+
+    asyncio.run(run())
+
+
+def test_circuit_breaker_requires_queue(caplog: pytest.LogCaptureFixture) -> None:
+    middleware, _ = _middleware(DELAYED_RETRY_CIRCUIT_BREAKER_THRESHOLD=5)
+    assert not middleware.circuit_threshold
+    assert "ignoring DELAYED_RETRY_CIRCUIT_BREAKER_THRESHOLD" in caplog.text
+
+
+def test_retry_budget() -> None:
+    budget = RetryBudget(ratio=0.2, window=10, min_retries=1)
+    for _ in range(10):
+        budget.record_request(0)
+    # 20% of the requests plus the minimum
+    assert [budget.try_retry(5) for _ in range(4)] == [True, True, True, False]
+    budget.record_request(9)
+    assert not budget.try_retry(9.5)
+
+    # The requests and retries at 0 expire, those at 5 and 9 don't
+    assert not budget.try_retry(10)
+    assert (budget.requests, budget.retries) == (1, 3)
+    assert [budget.try_retry(19.5) for _ in range(2)] == [True, False]
+    assert (budget.requests, budget.retries) == (0, 1)
+
+
+def test_retry_budget_drops(caplog: pytest.LogCaptureFixture) -> None:
+    middleware, crawled = _queue_middleware(
+        DELAYED_RETRY_BUDGET_RATIO=0.7,
+        DELAYED_RETRY_BUDGET_MIN_RETRIES=0,
+        DELAYED_RETRY_TIMES=1,
+    )
+    requests = [Request(f"https://example.com/{i}") for i in range(3)]
+
+    async def run() -> list[Request | Response]:
+        # A network error counts as a request, too
+        middleware.process_exception(requests[0], ValueError())
+        return [
+            await middleware.process_response(
+                request,
+                Response(request.url, status=429),
+            )
+            for request in requests
+        ]
+
+    with caplog.at_level(logging.DEBUG):
+        first, second, third = asyncio.run(run())
+    # 70% of two and three requests allow one and two retries, but not three
+    assert isinstance(first, Request)
+    assert isinstance(second, Request)
+    assert isinstance(third, Response)
+    assert "Retry budget of slot <example.com> exhausted, dropped" in caplog.text
+    assert not crawled
+
+    # Out of retries anyway, so not over budget
+    response = Response(first.url, status=429)
+    assert asyncio.run(middleware.process_response(first, response)) is response
+
+    stats = _stats(middleware.crawler)
+    assert stats["delayed_retry/budget/dropped"] == 1
+    assert stats["delayed_retry/budget/dropped/example.com"] == 1
+    assert middleware.retry_budgets["example.com"].retries == 2
+
+
+def test_retry_budget_defers(caplog: pytest.LogCaptureFixture) -> None:
+    middleware, crawled = _queue_middleware(
+        DELAYED_RETRY_BUDGET_RATIO=0.1,
+        DELAYED_RETRY_BUDGET_MIN_RETRIES=0,
+        DELAYED_RETRY_BUDGET_DEFER=True,
+    )
+    request = Request("https://example.com")
+
+    async def run() -> None:
+        retry = await middleware.process_response(
+            request,
+            Response(request.url, status=429),
+        )
+        assert isinstance(retry, Request)
+        assert retry.meta["delayed_retry_deferred"]
+        assert "delayed_retry_ready_at" not in retry.meta
+
+        # Kept until the spider is idle
+        with pytest.raises(IgnoreRequest):
+            middleware._request_scheduled(retry)
+        assert middleware.deferred_retries == [retry]
+        with caplog.at_level(logging.INFO), pytest.raises(DontCloseSpider):
+            middleware._spider_idle()
+        assert crawled == [retry]
+        assert "Sending 1 retry request(s) deferred" in caplog.text
+        middleware._spider_idle()
+
+        middleware.deferred_retries.append(retry)
+        with caplog.at_level(logging.INFO):
+            middleware._spider_closed()
+        assert "Dropped 1 delayed retry request(s)" in caplog.text
+
+    asyncio.run(run())
+    assert _stats(middleware.crawler)["delayed_retry/budget/deferred"] == 1
+
+
+def test_retry_budget_defer_requires_scrapy(
+    monkeypatch: pytest.MonkeyPatch,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    monkeypatch.setattr(
+        "scrapy_extensions.downloadermiddlewares._CAN_HOLD_SCHEDULED_REQUESTS",
+        False,
+    )
+    middleware, _ = _middleware(
+        DELAYED_RETRY_BUDGET_RATIO=0.1,
+        DELAYED_RETRY_BUDGET_DEFER=True,
+    )
+    assert not middleware.budget_defer
+    assert "dropping retries over budget instead" in caplog.text
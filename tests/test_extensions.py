@@ -0,0 +1,541 @@
+from __future__ import annotations
+
+import heapq
+import logging
+import time
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, Any, cast
+
+import pytest
+from scrapy import Request, Spider
+from scrapy.exceptions import NotConfigured
+from scrapy.http import Response
+from scrapy.utils.test import get_crawler
+from twisted.internet.task import Clock, LoopingCall
+
+from scrapy_extensions.extensions import (
+    LoopingExtension,
+    NicerAutoThrottle,
+    _ConcurrencyLimit,
+    _LatencyWindow,
+)
+from scrapy_extensions.throttlestate import SlotSnapshot, read_snapshot, write_snapshot
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from scrapy.core.downloader import Slot
+
+KEY = "example.com"
+
+
+def _throttle(**settings: Any) -> tuple[NicerAutoThrottle, Spider, Slot]:
+    """The throttle of an opened spider, with a single download slot."""
+
+    crawler = get_crawler(
+        settings_dict={
+            "AUTOTHROTTLE_ENABLED": True,
+            "AUTOTHROTTLE_HTTP_CODES": [429],
+            "AUTOTHROTTLE_START_DELAY": 1,
+            "AUTOTHROTTLE_MAX_DELAY": 10,
+            **settings,
+        },
+    )
+    # Slot's arguments differ between Scrapy versions, the throttle needs these
+    slot = cast("Slot", SimpleNamespace(concurrency=8, delay=1.0))
+    # Just enough of an engine for the throttle to find the slot
+    crawler.engine = SimpleNamespace(  # type: ignore[assignment]
+        downloader=SimpleNamespace(slots={KEY: slot}, per_slot_settings={}),
+    )
+    throttle = NicerAutoThrottle.from_crawler(crawler)
+    spider = crawler._create_spider("test")
+    throttle._spider_opened(spider)
+    return throttle, spider, slot
+
+
+def _download(
+    throttle: NicerAutoThrottle,
+    spider: Spider,
+    status: int,
+    latency: float = 0.1,
+) -> None:
+    request = Request(
+        f"https://{KEY}",
+        meta={"download_slot": KEY, "download_latency": latency},
+    )
+    # Like the downloader, the response isn't tied to its request yet
+    response = Response(request.url, status=status)
+    throttle._response_downloaded(response, request, spider)
+
+
+class _RateLimitedServer:
+    """Admits `capacity` requests per second, a fifth of that during an outage.
+
+    A token bucket holding one second's worth of requests; all others get a 429.
+    """
+
+    def __init__(self, capacity: float, outage: tuple[float, float]) -> None:
+        self.capacity = capacity
+        self.outage = outage
+        self.tokens = capacity
+        self.last = 0.0
+
+    def status(self, now: float) -> int:
+        start, end = self.outage
+        capacity = self.capacity / 5 if start <= now < end else self.capacity
+        self.tokens = min(max(capacity, 1), self.tokens + (now - self.last) * capacity)
+        self.last = now
+        if self.tokens < 1:
+            return 429
+        self.tokens -= 1
+        return 200
+
+
+def _simulate(
+    settings: dict[str, Any],
+    capacity: float = 4,
+    latency: float = 0.1,
+    duration: float = 150,
+    outage: tuple[float, float] = (30, 45),
+) -> tuple[int, float, float]:
+    """Throttled responses, requests/second after the outage and the max delay.
+
+    Requests are sent `slot.delay` seconds apart and answered `latency` seconds
+    later, which is when the throttle adjusts the delay.
+    """
+
+    throttle, spider, slot = _throttle(**settings)
+    server = _RateLimitedServer(capacity, outage)
+    responses: list[tuple[float, int]] = []
+    next_send = 0.0
+    throttled = ok_after_outage = 0
+    max_delay = slot.delay
+
+    while next_send < duration or responses:
+        if responses and (responses[0][0] <= next_send or next_send >= duration):
+            now, status = heapq.heappop(responses)
+            _download(throttle, spider, status, latency)
+            throttled += status == 429
+            ok_after_outage += status == 200 and now >= outage[1]
+            max_delay = max(max_delay, slot.delay)
+            continue
+
+        heapq.heappush(responses, (next_send + latency, server.status(next_send)))
+        next_send += max(slot.delay, 0.001)
+
+    return throttled, ok_after_outage / (duration - outage[1]), max_delay
+
+
+def test_aimd_simulation() -> None:
+    latency_throttled, latency_rate, _ = _simulate(
+        {"AUTOTHROTTLE_RECOVERY_RESPONSES": 0},
+    )
+    aimd_throttled, aimd_rate, max_delay = _simulate({})
+
+    # The latency formula keeps overshooting the rate limit
+    assert latency_throttled > 100
+    assert aimd_throttled < latency_throttled / 5
+    # AIMD backed off during the outage, but recovered most of the throughput
+    assert max_delay > 1
+    assert aimd_rate > 0.6 * latency_rate
+
+
+def test_aimd_backoff_and_recovery(caplog: pytest.LogCaptureFixture) -> None:
+    throttle, spider, slot = _throttle(
+        AUTOTHROTTLE_BACKOFF_FACTOR=3,
+        AUTOTHROTTLE_RECOVERY_RESPONSES=2,
+        AUTOTHROTTLE_RECOVERY_STEP=0.5,
+        AUTOTHROTTLE_TARGET_CONCURRENCY=1,
+    )
+
+    with caplog.at_level(logging.DEBUG):
+        _download(throttle, spider, 429)
+    assert slot.delay == 3
+    assert "Status <429> throttled from 1.0s to 3.0s" in caplog.text
+    _download(throttle, spider, 429)
+    assert slot.delay == 9
+    _download(throttle, spider, 429)
+    # Capped by AUTOTHROTTLE_MAX_DELAY
+    assert slot.delay == 10
+    assert throttle._healthy_responses == {KEY: 0}
+
+    # Every second healthy response adds 0.5 requests/second
+    _download(throttle, spider, 200)
+    assert slot.delay == 10
+    _download(throttle, spider, 200)
+    assert slot.delay == pytest.approx(1 / 0.6)
+    for _ in range(4):
+        _download(throttle, spider, 200)
+    assert slot.delay == pytest.approx(1 / 1.6)
+
+    # Until the rate reaches the 10 requests/second AutoThrottle's formula
+    # aims for, which takes over again
+    for _ in range(32):
+        _download(throttle, spider, 200)
+    assert slot.delay == pytest.approx(1 / 9.6)
+    _download(throttle, spider, 200)
+    _download(throttle, spider, 200)
+    assert slot.delay == pytest.approx(0.1)
+    assert not throttle._healthy_responses
+    _download(throttle, spider, 200, latency=0.05)
+    assert slot.delay == pytest.approx(0.075)
+
+
+def test_aimd_without_recovery() -> None:
+    throttle, spider, slot = _throttle(AUTOTHROTTLE_RECOVERY_RESPONSES=0)
+
+    _download(throttle, spider, 429)
+    assert slot.delay == 2
+    assert not throttle._healthy_responses
+    _download(throttle, spider, 200)
+    # AutoThrottle's formula halves the distance to the target of 0.1s
+    assert slot.delay == pytest.approx(1.05)
+
+
+def test_adjust_delay_response_with_request() -> None:
+    throttle, _, slot = _throttle()
+    request = Request(f"https://{KEY}", meta={"download_slot": KEY})
+    response = Response(request.url, status=429, request=request)
+
+    throttle._adjust_delay(slot, 0.1, response)
+    assert slot.delay == 2
+    assert throttle._healthy_responses == {KEY: 0}
+
+
+def test_invalid_http_codes(caplog: pytest.LogCaptureFixture) -> None:
+    throttle, _, _ = _throttle(AUTOTHROTTLE_HTTP_CODES=["429", "too many"])
+    assert not throttle.http_codes
+    assert "Invalid HTTP code" in caplog.text
+
+
+def test_concurrency_limit() -> None:
+    limit = _ConcurrencyLimit(limit=2, max_limit=8)
+
+    # Grows while the latency is stable, up to the maximum
+    concurrencies = [limit.update(0.1) for _ in range(30)]
+    assert concurrencies == sorted(concurrencies)
+    assert concurrencies[0] == 2
+    assert concurrencies[-1] == 8
+
+    assert limit.backoff(3) == 2
+    assert limit.backoff(3) == 1
+    assert limit.backoff(3) == 1
+    assert limit.limit == 1
+
+
+@pytest.mark.parametrize("capacity", [2, 4, 8])
+def test_concurrency_limit_converges(capacity: int) -> None:
+    limit = _ConcurrencyLimit(limit=1, max_limit=64)
+    concurrency = 1
+    # Requests beyond the capacity queue up at the server
+    for _ in range(500):
+        concurrency = limit.update(0.1 * max(concurrency / capacity, 1))
+    assert capacity <= concurrency <= 2 * capacity
+
+
+def test_concurrency_mode(caplog: pytest.LogCaptureFixture) -> None:
+    throttle, spider, slot = _throttle(
+        AUTOTHROTTLE_CONCURRENCY=True,
+        AUTOTHROTTLE_MAX_CONCURRENCY=16,
+    )
+
+    with caplog.at_level(logging.DEBUG):
+        _download(throttle, spider, 429)
+    assert slot.concurrency == 4
+    assert "Slot <example.com> concurrency changed from 8 to 4" in caplog.text
+    # The delay is left to AutoThrottle's formula, which ignores error pages
+    assert slot.delay == 1
+    assert not throttle._healthy_responses
+
+    for _ in range(50):
+        _download(throttle, spider, 200)
+    assert slot.concurrency == 16
+    assert slot.delay == pytest.approx(0.1)
+
+
+def test_concurrency_mode_max_concurrency() -> None:
+    throttle, spider, slot = _throttle(AUTOTHROTTLE_CONCURRENCY=True)
+
+    for _ in range(50):
+        _download(throttle, spider, 200)
+    # Defaults to the slot's concurrency
+    assert slot.concurrency == 8
+
+
+def test_concurrency_limit_slower_server() -> None:
+    limit = _ConcurrencyLimit(limit=8, max_limit=8)
+    for _ in range(10):
+        limit.update(0.1)
+
+    # Backs off at first, but recovers once the slower latency is the new normal
+    concurrencies = [limit.update(0.5) for _ in range(500)]
+    assert min(concurrencies) < 8
+    assert concurrencies[-1] == 8
+
+
+def test_latency_window() -> None:
+    window = _LatencyWindow(4)
+    for latency in (0.4, 0.1, 0.3):
+        window.add(latency)
+    assert len(window) == 3
+    assert window.quantile(0) == 0.1
+    assert window.quantile(0.5) == 0.3
+    assert window.quantile(1) == 0.4
+
+    # The oldest samples make room for new ones
+    for latency in (0.2, 0.2, 0.5):
+        window.add(latency)
+    assert len(window) == 4
+    assert window._sorted == [0.2, 0.2, 0.3, 0.5]
+    assert window.quantile(0.95) == 0.5
+
+
+def test_target_rate() -> None:
+    throttle, spider, slot = _throttle(
+        AUTOTHROTTLE_TARGET_RATE=5,
+        AUTOTHROTTLE_TARGET_CONCURRENCY=2,
+        AUTOTHROTTLE_LATENCY_WINDOW=10,
+    )
+
+    _download(throttle, spider, 200)
+    # The target rate, as the latency allows more
+    assert slot.delay == pytest.approx(0.2)
+    for _ in range(9):
+        _download(throttle, spider, 200, latency=0.6)
+    assert slot.delay == pytest.approx(0.3)
+
+    # A single slow response doesn't move the median
+    _download(throttle, spider, 200, latency=10)
+    assert slot.delay == pytest.approx(0.3)
+    assert len(throttle._latencies[KEY]) == 10
+
+    # Error pages aren't sampled, and don't lower the delay
+    _download(throttle, spider, 500, latency=0.01)
+    assert slot.delay == pytest.approx(0.3)
+    assert throttle._latencies[KEY].quantile(0) == 0.6
+    _download(throttle, spider, 429)
+    assert slot.delay == pytest.approx(0.6)
+
+
+def test_target_rate_quantile() -> None:
+    throttle, spider, slot = _throttle(
+        AUTOTHROTTLE_TARGET_RATE=10,
+        AUTOTHROTTLE_LATENCY_QUANTILE=0.95,
+        AUTOTHROTTLE_MAX_DELAY=0.5,
+    )
+
+    for latency in (0.1, 0.2, 0.3, 2.0):
+        _download(throttle, spider, 200, latency=latency)
+    # Capped by AUTOTHROTTLE_MAX_DELAY
+    assert slot.delay == 0.5
+
+
+def test_forget_idle_slots() -> None:
+    throttle, spider, _ = _throttle(AUTOTHROTTLE_TARGET_RATE=5)
+    throttle._healthy_responses["gone.example.com"] = 3
+    throttle._latencies["gone.example.com"] = _LatencyWindow(1)
+
+    for _ in range(999):
+        _download(throttle, spider, 200)
+    assert "gone.example.com" in throttle._latencies
+    _download(throttle, spider, 200)
+    assert throttle._latencies.keys() == {KEY}
+    assert not throttle._healthy_responses
+
+
+def test_shared_backoff(tmp_path: Path, caplog: pytest.LogCaptureFixture) -> None:
+    settings = {
+        "AUTOTHROTTLE_SHARED_STATE": f"sqlite:///{tmp_path / 'throttle.db'}",
+        "AUTOTHROTTLE_SHARED_STATE_INTERVAL": 60,
+        "AUTOTHROTTLE_RECOVERY_RESPONSES": 2,
+        # Long latencies mustn't raise the delay
+        "AUTOTHROTTLE_TARGET_CONCURRENCY": 100,
+    }
+    first, first_spider, first_slot = _throttle(**settings)
+    second, second_spider, second_slot = _throttle(**settings)
+
+    _download(first, first_spider, 429)
+    assert first_slot.delay == 2
+    with caplog.at_level(logging.DEBUG):
+        _download(second, second_spider, 200)
+    assert second_slot.delay == 2
+    assert (
+        "Slot <example.com> adopted shared backoff from 1.00s to 2.00s" in caplog.text
+    )
+    # And recovers like from its own backoff
+    assert second._healthy_responses == {KEY: 1}
+
+    # A throttled response to a request sent before doesn't back off again
+    _download(second, second_spider, 429, latency=10)
+    assert second_slot.delay == 2
+    # One sent afterwards does, and the other process follows once it's throttled
+    _download(second, second_spider, 429, latency=0)
+    assert second_slot.delay == 4
+    _download(first, first_spider, 200)
+    assert first_slot.delay == 2
+    _download(first, first_spider, 429, latency=10)
+    assert first_slot.delay == 4
+
+    # Already seen
+    _download(second, second_spider, 429, latency=10)
+    assert second_slot.delay == 4
+
+    first._close_shared_state()
+    second._close_shared_state()
+
+
+def test_shared_backoff_not_beyond_other_process(tmp_path: Path) -> None:
+    settings = {
+        "AUTOTHROTTLE_SHARED_STATE": str(tmp_path / "throttle.db"),
+        "AUTOTHROTTLE_TARGET_CONCURRENCY": 100,
+    }
+    first, first_spider, _ = _throttle(**settings)
+    second, second_spider, second_slot = _throttle(**settings)
+
+    second_slot.delay = 1.5
+    _download(first, first_spider, 429)
+    _download(second, second_spider, 200, latency=10)
+    assert second_slot.delay == 2
+
+    # Nothing to adopt from a process with a shorter delay
+    second_slot.delay = 5
+    first._share_backoff(KEY, 4)
+    _download(second, second_spider, 429, latency=0)
+    assert second_slot.delay == 10
+
+
+def test_shared_backoff_errors(
+    tmp_path: Path,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    with pytest.raises(NotConfigured):
+        _throttle(AUTOTHROTTLE_SHARED_STATE="ftp://localhost/throttle")
+    assert "Invalid AUTOTHROTTLE_SHARED_STATE" in caplog.text
+
+    throttle, spider, slot = _throttle(
+        AUTOTHROTTLE_SHARED_STATE=str(tmp_path / "throttle.db"),
+    )
+    throttle._close_shared_state()
+    # The store failing doesn't keep the slot from backing off
+    _download(throttle, spider, 429)
+    assert slot.delay == 2
+    assert "Unable to read the shared backoff of slot <example.com>" in caplog.text
+    assert "Unable to share the backoff of slot <example.com>" in caplog.text
+
+
+def test_warm_start(tmp_path: Path, caplog: pytest.LogCaptureFixture) -> None:
+    path = tmp_path / "throttle.json"
+    now = time.time()
+    write_snapshot(
+        path,
+        {
+            KEY: SlotSnapshot(delay=5, time=now, recovering=True),
+            # Half way back to the start delay after a half-life
+            "old.example.com": SlotSnapshot(delay=9, time=now - 3600),
+            "ancient.example.com": SlotSnapshot(delay=9, time=now - 36000),
+            "fast.example.com": SlotSnapshot(delay=0.01, time=now),
+        },
+    )
+
+    with caplog.at_level(logging.INFO):
+        throttle, spider, slot = _throttle(
+            AUTOTHROTTLE_SNAPSHOT=str(path),
+            AUTOTHROTTLE_SNAPSHOT_HALF_LIFE=3600,
+            AUTOTHROTTLE_RECOVERY_RESPONSES=2,
+            DOWNLOAD_DELAY=0.1,
+        )
+    assert "Warm started 4 slots from throttle snapshot" in caplog.text
+    downloader = cast("Any", throttle.crawler.engine).downloader
+    per_slot_settings = downloader.per_slot_settings
+    assert per_slot_settings[KEY]["delay"] == pytest.approx(5, 0.001)
+    assert per_slot_settings["old.example.com"]["delay"] == pytest.approx(5, 0.001)
+    assert per_slot_settings["ancient.example.com"]["delay"] == pytest.approx(1, 0.01)
+    # Within DOWNLOAD_DELAY and AUTOTHROTTLE_MAX_DELAY
+    assert per_slot_settings["fast.example.com"]["delay"] == pytest.approx(0.1)
+
+    # Still recovering from the last crawl's backoff
+    slot.delay = 5
+    _download(throttle, spider, 200)
+    _download(throttle, spider, 200)
+    assert slot.delay == pytest.approx(1 / 0.7)
+
+    slot.delay = 3
+    with caplog.at_level(logging.INFO):
+        throttle._save_snapshot()
+    assert "Saved 3 slots to throttle snapshot" in caplog.text
+    snapshots = read_snapshot(path)
+    # Those older than 10 half-lives have decayed to the start delay anyway
+    assert snapshots.keys() == {KEY, "old.example.com", "fast.example.com"}
+    assert snapshots[KEY].delay == 3
+    assert snapshots[KEY].recovering
+    assert snapshots["old.example.com"].delay == 9
+
+
+def test_warm_start_download_slots(tmp_path: Path) -> None:
+    path = tmp_path / "throttle.json"
+    write_snapshot(path, {KEY: SlotSnapshot(delay=5, time=time.time())})
+    throttle, _, _ = _throttle(AUTOTHROTTLE_SNAPSHOT=str(path))
+
+    # Slots configured in DOWNLOAD_SLOTS keep their settings
+    downloader = cast("Any", throttle.crawler.engine).downloader
+    downloader.per_slot_settings = {KEY: {"delay": 0.5}}
+    throttle._warm_start()
+    assert downloader.per_slot_settings == {KEY: {"delay": 0.5}}
+
+    del downloader.per_slot_settings
+    throttle._warm_start()
+
+
+def test_warm_start_errors(tmp_path: Path, caplog: pytest.LogCaptureFixture) -> None:
+    path = tmp_path / "throttle.json"
+    with caplog.at_level(logging.INFO):
+        throttle, _, _ = _throttle(AUTOTHROTTLE_SNAPSHOT=str(path))
+    assert "No throttle snapshot at" in caplog.text
+
+    path.write_text("{")
+    throttle._warm_start()
+    assert "Unable to read throttle snapshot" in caplog.text
+
+    path.unlink()
+    path.mkdir()
+    throttle._save_snapshot()
+    assert "Unable to save throttle snapshot" in caplog.text
+
+
+def test_looping_extension(caplog: pytest.LogCaptureFixture) -> None:
+    crawler = get_crawler()
+    spider = crawler._create_spider("test")
+    spiders: list[Spider] = []
+
+    def task(spider: Spider) -> None:
+        spiders.append(spider)
+
+    extension = LoopingExtension()
+    extension.setup_looping_task(task, crawler, 10)
+
+    extension._spider_closed()
+    assert "No task was started" in caplog.text
+
+    clock = Clock()
+    extension._task = LoopingCall(task, spider=spider)
+    extension._task.clock = clock  # type: ignore[assignment]
+    extension._spider_opened(spider)
+    clock.pump([10, 10])
+    assert spiders == [spider, spider]
+    extension._spider_closed()
+    assert not extension._task.running
+    extension._spider_closed()
+
+
+def test_looping_extension_creates_task() -> None:
+    crawler = get_crawler()
+    spider = crawler._create_spider("test")
+    extension = LoopingExtension()
+    extension.setup_looping_task(print, crawler, 10)
+
+    extension._spider_opened(spider)
+    assert extension._task is not None
+    assert extension._task.running
+    assert extension._task.kw == {"spider": spider}
+    extension._spider_closed()
+    assert not extension._task.running
@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import subprocess
+import sys
+
+import pytest
+
+import scrapy_extensions
+from scrapy_extensions.pipelines import BlurHashPipeline
+
+
+def test_lazy_imports() -> None:
+    code = (
+        "import sys, scrapy_extensions; "
+        "assert 'scrapy_extensions.pipelines' not in sys.modules; "
+        "scrapy_extensions.BlurHashPipeline; "
+        "assert 'scrapy_extensions.pipelines' in sys.modules"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)  # noqa: S603
+
+
+def test_getattr() -> None:
+    assert scrapy_extensions.BlurHashPipeline is BlurHashPipeline
+    for name in scrapy_extensions.__all__:
+        assert getattr(scrapy_extensions, name).__name__ == name
+
+    with pytest.raises(AttributeError, match="no attribute 'Missing'"):
+        scrapy_extensions.Missing  # noqa: B018
+
+
+def test_dir() -> None:
+    assert set(scrapy_extensions.__all__) <= set(dir(scrapy_extensions))
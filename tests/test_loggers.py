@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+from scrapy.http import Response
+from scrapy.utils.test import get_crawler
+
+from scrapy_extensions.loggers import QuietLogFormatter
+
+
+def test_quiet_log_formatter() -> None:
+    formatter = QuietLogFormatter()
+    response = Response("https://example.com")
+
+    spider = get_crawler()._create_spider("test")
+    assert formatter.scraped({"id": 1}, response, spider) is None
+
+    spider = get_crawler(settings_dict={"LOG_SCRAPED_ITEMS": True})._create_spider(
+        "test",
+    )
+    result = formatter.scraped({"id": 1}, response, spider)
+    assert result is not None
+    assert result["args"] == {"src": response, "item": {"id": 1}}
@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+import pytest
+from scrapy import Request
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.test import get_crawler
+
+from scrapy_extensions.middlewares import AuthHeaderMiddleware
+
+
+def test_auth_header_middleware() -> None:
+    with pytest.raises(NotConfigured):
+        AuthHeaderMiddleware.from_crawler(get_crawler())
+
+    crawler = get_crawler(
+        settings_dict={
+            "AUTH_HEADER_ENABLED": True,
+            "AUTH_HEADER_NAME": "X-Auth",
+            "AUTH_TOKEN_ATTR": "token",
+        },
+    )
+    middleware = AuthHeaderMiddleware.from_crawler(crawler)
+    spider = crawler._create_spider("test")
+
+    request = Request("https://example.com")
+    middleware.process_request(request, spider)
+    assert "X-Auth" not in request.headers
+
+    spider.token = "secret"  # type: ignore[attr-defined]
+    middleware.process_request(request, spider)
+    assert request.headers["X-Auth"] == b"Bearer secret"
+
+    # Explicit headers are kept
+    request = Request("https://example.com", headers={"X-Auth": "Basic abc"})
+    middleware.process_request(request, spider)
+    assert request.headers["X-Auth"] == b"Basic abc"
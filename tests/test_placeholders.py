@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import base64
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from scrapy_extensions.placeholders import (
+    PLACEHOLDER_ENCODERS,
+    average_color,
+    calculate_placeholders,
+    dhash,
+    lqip,
+    phash,
+    placeholder_image,
+    thumbhash,
+)
+from scrapy_extensions.utils import calculate_blurhash
+from tests.conftest import encode, picture
+
+
+def _distance(first: str, second: str) -> int:
+    return (int(first, 16) ^ int(second, 16)).bit_count()
+
+
+def test_placeholder_image() -> None:
+    image = placeholder_image(BytesIO(encode(picture(400, 300))), (100, 100))
+    assert image.mode == "RGB"
+    assert image.size == (134, 100)
+
+    # Transparency is kept
+    image = placeholder_image(picture(400, 300, mode="RGBA"), (100, 100))
+    assert image.mode == "RGBA"
+    assert image.size == (134, 100)
+    image = placeholder_image(picture(40, 30, mode="RGBA"), (100, 100))
+    assert image.size == (40, 30)
+
+
+def test_thumbhash() -> None:
+    # Same as the reference implementation's `rgba_to_thumb_hash`
+    assert thumbhash(picture(80, 60)) == "IegFFYq5j0pllYeXVtiKmQl/age0"
+
+    # Header flags: alpha in the third, landscape in the fifth byte
+    for image, has_alpha, is_landscape in (
+        (picture(80, 60), 0, 1),
+        (picture(60, 80, mode="RGBA"), 1, 0),
+        (picture(mode="L"), 0, 1),
+    ):
+        value = base64.b64decode(thumbhash(image))
+        assert value[2] >> 7 == has_alpha
+        assert value[4] >> 7 == is_landscape
+
+    # Fully transparent
+    assert base64.b64decode(thumbhash(Image.new("RGBA", (10, 10))))[2] >> 7 == 1
+
+
+def test_average_color() -> None:
+    assert average_color(Image.new("RGB", (4, 4), (255, 128, 0))) == "#ff8000"
+    half = Image.new("RGBA", (2, 1), (255, 0, 0, 255))
+    half.putpixel((1, 0), (0, 0, 255, 0))
+    # Transparent pixels don't count
+    assert average_color(half) == "#ff0000"
+    assert average_color(Image.new("RGBA", (4, 4))) == "#000000"
+
+
+def test_lqip() -> None:
+    prefix = "data:image/webp;base64,"
+    value = lqip(picture(80, 60), size=8)
+    assert value.startswith(prefix)
+    with Image.open(BytesIO(base64.b64decode(value.removeprefix(prefix)))) as image:
+        assert image.format == "WEBP"
+        assert image.size == (8, 6)
+
+
+def test_perceptual_hashes_of_similar_images() -> None:
+    image = picture(256, 192)
+    # Recompressed and scaled down, as a near-duplicate found elsewhere would be
+    similar = Image.open(BytesIO(encode(image, "JPEG"))).resize((200, 150))
+    different = picture(256, 192, seed=1)
+
+    for perceptual_hash in (phash, dhash):
+        value = perceptual_hash(image)
+        assert len(value) == 16
+        assert int(value, 16) >= 0
+        assert _distance(value, perceptual_hash(similar)) <= 6
+        assert _distance(value, perceptual_hash(different)) > 6
+
+
+def test_calculate_placeholders() -> None:
+    image = picture(400, 300)
+    placeholders = calculate_placeholders(BytesIO(encode(image)), x_components=3)
+
+    assert list(placeholders) == list(PLACEHOLDER_ENCODERS)
+    assert placeholders["blurhash"] == calculate_blurhash(image, 3, 4)
+    # All encoders share a single decode, large enough for the BlurHash
+    assert placeholders["thumbhash"] == thumbhash(image.reduce(2))
+    assert placeholders["average_color"].startswith("#")
+    assert placeholders["lqip"].startswith("data:image/webp;base64,")
+
+    placeholders = calculate_placeholders(image, encoders=["dhash", "phash"])
+    shared = image.reduce(3)
+    assert placeholders == {"dhash": dhash(shared), "phash": phash(shared)}
+
+    with pytest.raises(ValueError, match="Unknown placeholder encoders"):
+        calculate_placeholders(image, encoders=["blurhash", "unknown"])
@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import logging
+import sqlite3
+import sys
+import time
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, Any
+
+import pytest
+from scrapy.settings import Settings
+
+from scrapy_extensions.throttlestate import (
+    Backoff,
+    RedisThrottleState,
+    SlotSnapshot,
+    SQLiteThrottleState,
+    read_snapshot,
+    throttle_state_from_settings,
+    write_snapshot,
+)
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+class FakeRedis:
+    """Stands in for `redis.Redis`, with the commands the throttle state uses."""
+
+    def __init__(self, url: str = "") -> None:
+        self.url = url
+        self.values: dict[str, tuple[bytes, float]] = {}
+        self.closed = False
+
+    @classmethod
+    def from_url(cls, url: str) -> FakeRedis:
+        return cls(url)
+
+    def get(self, name: str) -> bytes | None:
+        value, expires = self.values.get(name, (None, 0))
+        return value if time.time() < expires else None
+
+    def set(self, name: str, value: str, ex: int) -> None:
+        self.values[name] = (value.encode(), time.time() + ex)
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def test_sqlite_throttle_state(tmp_path: Path) -> None:
+    path = tmp_path / "state" / "throttle.db"
+    state = SQLiteThrottleState(path, ttl=60)
+    other = SQLiteThrottleState.from_uri(f"sqlite:///{path}")
+    now = time.time()
+
+    assert state.last_backoff("example.com") is None
+    state.record_backoff("example.com", Backoff(2.0, now - 1))
+    # Other processes see it right away
+    assert other.last_backoff("example.com") == Backoff(2.0, now - 1)
+    other.record_backoff("example.com", Backoff(4.0, now))
+    assert state.last_backoff("example.com") == Backoff(4.0, now)
+
+    # Expired backoffs are ignored, and deleted when the file is opened
+    state.record_backoff("example.org", Backoff(1.0, now - 61))
+    assert state.last_backoff("example.org") is None
+    state.close()
+    other.close()
+    state = SQLiteThrottleState.from_uri(str(path))
+    with sqlite3.connect(path) as connection:
+        assert connection.execute("SELECT key FROM backoff").fetchall() == [
+            ("example.com",),
+        ]
+    state.close()
+
+
+def test_sqlite_throttle_state_locked(
+    tmp_path: Path,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    path = tmp_path / "throttle.db"
+    state = SQLiteThrottleState(path, timeout=0.01)
+    state.record_backoff("example.com", Backoff(2.0, time.time()))
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+
+    # Doesn't wait for the other process' write to finish
+    start = time.monotonic()
+    with caplog.at_level(logging.DEBUG):
+        state.record_backoff("example.com", Backoff(4.0, time.time()))
+    assert time.monotonic() - start < 1
+    assert "is locked, not recording backoff of slot <example.com>" in caplog.text
+    # WAL still lets it read
+    assert state.last_backoff("example.com").delay == 2  # type: ignore[union-attr]
+
+    other.execute("ROLLBACK")
+    other.close()
+    state.close()
+
+    # Readers are only locked out while a checkpoint or recovery runs
+    def locked(*args: object) -> None:
+        msg = "database is locked"
+        raise sqlite3.OperationalError(msg)
+
+    state._connection = SimpleNamespace(execute=locked)  # type: ignore[assignment]
+    with caplog.at_level(logging.DEBUG):
+        assert state.last_backoff("example.com") is None
+    assert "is locked, not reading" in caplog.text
+
+
+def test_sqlite_throttle_state_errors(tmp_path: Path) -> None:
+    with pytest.raises(ValueError, match="Unsupported throttle state URI"):
+        SQLiteThrottleState.from_uri("http://localhost/throttle.db")
+
+    state = SQLiteThrottleState(tmp_path / "throttle.db")
+    state._connection.execute("DROP TABLE backoff")
+    # Only locks are skipped
+    with pytest.raises(sqlite3.OperationalError):
+        state.last_backoff("example.com")
+    with pytest.raises(sqlite3.OperationalError):
+        state.record_backoff("example.com", Backoff(1.0, time.time()))
+    state.close()
+
+
+def test_redis_throttle_state(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setitem(sys.modules, "redis", SimpleNamespace(Redis=FakeRedis))
+    state = RedisThrottleState.from_uri("redis://localhost:6379/0", ttl=0.2)
+    client = state.client
+    assert client.url == "redis://localhost:6379/0"
+
+    assert state.last_backoff("example.com") is None
+    state.record_backoff("example.com", Backoff(2.5, 1234.5))
+    assert state.last_backoff("example.com") == Backoff(2.5, 1234.5)
+    # Redis expires entries after at least a second
+    assert client.values["scrapy_extensions:throttle:example.com"][1] > time.time()
+
+    client.values["scrapy_extensions:throttle:example.org"] = (
+        b"1.0 1.0",
+        time.time() - 1,
+    )
+    assert state.last_backoff("example.org") is None
+
+    state.close()
+    assert client.closed
+
+
+def test_redis_throttle_state_plain_client() -> None:
+    values: dict[str, Any] = {}
+    client = SimpleNamespace(
+        get=values.get,
+        set=lambda name, value, ex: values.__setitem__(name, value),
+    )
+    state = RedisThrottleState(client, prefix="throttle:")
+
+    state.record_backoff("example.com", Backoff(2.0, 1.0))
+    assert values == {"throttle:example.com": "2.0 1.0"}
+    assert state.last_backoff("example.com") == Backoff(2.0, 1.0)
+    # Without a `close` method
+    state.close()
+
+
+def test_throttle_state_from_settings(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    assert throttle_state_from_settings(Settings()) is None
+
+    state = throttle_state_from_settings(
+        Settings(
+            {
+                "AUTOTHROTTLE_SHARED_STATE": str(tmp_path / "throttle.db"),
+                "AUTOTHROTTLE_SHARED_STATE_TTL": 30,
+            },
+        ),
+    )
+    assert isinstance(state, SQLiteThrottleState)
+    assert state.ttl == 30
+    state.close()
+
+    monkeypatch.setitem(sys.modules, "redis", SimpleNamespace(Redis=FakeRedis))
+    state = throttle_state_from_settings(
+        Settings({"AUTOTHROTTLE_SHARED_STATE": "redis://localhost"}),
+    )
+    assert isinstance(state, RedisThrottleState)
+
+    # Other stores by class or import path
+    for backend in (
+        RedisThrottleState,
+        "scrapy_extensions.throttlestate.RedisThrottleState",
+    ):
+        state = throttle_state_from_settings(
+            Settings(
+                {
+                    "AUTOTHROTTLE_SHARED_STATE": "redis://localhost",
+                    "AUTOTHROTTLE_SHARED_STATE_BACKEND": backend,
+                },
+            ),
+        )
+        assert isinstance(state, RedisThrottleState)
+
+
+def test_snapshots(tmp_path: Path) -> None:
+    path = tmp_path / "snapshots" / "throttle.json"
+    snapshots = {
+        "example.com": SlotSnapshot(delay=2.5, time=1234.5, recovering=True),
+        "example.org": SlotSnapshot(delay=0.5, time=1234.5),
+    }
+
+    write_snapshot(path, snapshots)
+    assert read_snapshot(path) == snapshots
+    write_snapshot(path, {})
+    assert read_snapshot(str(path)) == {}
+    # Replaced atomically, without leaving temporary files behind
+    assert [file.name for file in path.parent.iterdir()] == ["throttle.json"]
+
+    # Older snapshots don't have the recovering flag
+    path.write_text('{"example.com": {"delay": 1, "time": 2}}')
+    assert read_snapshot(path) == {"example.com": SlotSnapshot(1.0, 2.0)}
@@ -0,0 +1,388 @@
+from __future__ import annotations
+
+import asyncio
+import random
+import sys
+from io import BytesIO
+from typing import TYPE_CHECKING
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from scrapy_extensions import utils
+from scrapy_extensions.utils import (
+    BlurHashCache,
+    HammingIndex,
+    _base83,
+    _blurhash_basis,
+    _popcount,
+    _scratch_buffer,
+    asyncio_available,
+    blurhash_components,
+    calculate_blurhash,
+    calculate_blurhash_batch,
+    decoding,
+    fits_decode_budget,
+    limit_decodes,
+    missing_dependencies,
+    reduced_image,
+)
+from tests.conftest import components, encode, picture
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+async def _asyncio_available_in_loop() -> bool:
+    return asyncio_available()
+
+
+def test_asyncio_available(monkeypatch: pytest.MonkeyPatch) -> None:
+    # The tests install the asyncio reactor
+    assert asyncio_available()
+    assert asyncio.run(_asyncio_available_in_loop())
+
+    # Scrapy < 2.14
+    monkeypatch.setitem(sys.modules, "scrapy.utils.asyncio", None)
+    assert asyncio_available()
+
+
+def test_asyncio_available_without_reactor(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr("scrapy.utils.reactor.is_reactor_installed", lambda: False)
+    assert not asyncio_available()
+
+
+@pytest.mark.parametrize(
+    ("size", "expected"),
+    [
+        ((400, 400), (4, 4)),
+        ((800, 400), (4, 2)),
+        ((400, 800), (2, 4)),
+        ((4000, 100), (4, 1)),
+        ((0, 100), (4, 4)),
+    ],
+)
+def test_blurhash_components(
+    size: tuple[int, int],
+    expected: tuple[int, int],
+) -> None:
+    assert blurhash_components(size) == expected
+
+
+def test_blurhash_components_upper_bounds() -> None:
+    assert blurhash_components((900, 300), x_components=9, y_components=2) == (9, 2)
+    assert blurhash_components((300, 900), x_components=9, y_components=2) == (3, 2)
+
+
+def test_calculate_blurhash_components() -> None:
+    image = picture(256, 64)
+    assert components(calculate_blurhash(image, 3, 5)) == (3, 5)
+    assert components(calculate_blurhash(image, 6, 6, adaptive=True)) == (6, 2)
+
+
+@pytest.mark.parametrize(
+    ("image_format", "expected"),
+    [
+        # Draft mode decodes JPEGs at 1/8 scale
+        ("JPEG", (250, 125)),
+        # Anything else is reduced by an integer factor
+        ("PNG", (200, 100)),
+    ],
+)
+def test_reduced_image(image_format: str, expected: tuple[int, int]) -> None:
+    image = Image.open(BytesIO(encode(picture(2000, 1000), image_format)))
+
+    reduced = reduced_image(image, (128, 96))
+    assert reduced.size == expected
+    assert reduced.mode == "RGB"
+
+
+@pytest.mark.parametrize(
+    ("mode", "reduce_first"),
+    [("L", True), ("RGBA", True), ("CMYK", True), ("P", False), ("1", False)],
+)
+def test_reduced_image_modes(mode: str, *, reduce_first: bool) -> None:
+    image = picture(400, 200, mode=mode)
+
+    reduced = reduced_image(image, (128, 96))
+    # Reduced in the original mode if possible, which is cheaper
+    expected = (
+        image.reduce(2).convert("RGB")
+        if reduce_first
+        else image.convert("RGB").reduce(2)
+    )
+    assert reduced.tobytes() == expected.tobytes()
+    assert reduced.mode == "RGB"
+
+    assert reduced_image(image, (128, 96), mode="RGBA").mode == "RGBA"
+
+
+def test_reduced_image_transparency() -> None:
+    image = picture(400, 200, mode="L")
+    image.info["transparency"] = 0
+
+    reduced = reduced_image(image, (128, 96), mode="RGBA")
+    assert reduced.tobytes() == image.convert("RGBA").reduce(2).tobytes()
+
+
+def test_reduced_image_too_small() -> None:
+    image = picture(100, 50, mode="L")
+
+    reduced = reduced_image(image, (128, 96))
+    assert reduced.size == image.size
+    assert reduced.mode == "RGB"
+
+
+def test_missing_dependencies(monkeypatch: pytest.MonkeyPatch) -> None:
+    assert missing_dependencies() == []
+
+    # Not importable, e.g., installed without the `blurhash` option
+    monkeypatch.setitem(sys.modules, "numba", None)
+    monkeypatch.setattr("scrapy_extensions.utils.find_spec", lambda name: None)
+    assert missing_dependencies() == ["numba", "blurhash_numba"]
+    # Neither is needed by the float32 encoder
+    assert missing_dependencies(numba=False) == []
+
+    monkeypatch.setitem(sys.modules, "PIL.Image", None)
+    assert missing_dependencies(numba=False) == ["PIL.Image"]
+
+
+def test_fits_decode_budget(monkeypatch: pytest.MonkeyPatch) -> None:
+    large_png = BytesIO(encode(picture(1000, 500)))
+    large_jpeg = BytesIO(encode(picture(1000, 500), "JPEG"))
+    size = (128, 128)
+
+    assert fits_decode_budget(large_png, size)
+    assert not fits_decode_budget(large_png, size, max_pixels=250_000)
+    assert fits_decode_budget(large_png, size, max_pixels=500_000)
+    # Decoded at 1/2 scale
+    assert fits_decode_budget(large_jpeg, size, max_pixels=125_000)
+    assert not fits_decode_budget(large_jpeg, size, max_pixels=124_999)
+
+    # 4 bytes per pixel in RGB, 1 in greyscale
+    assert not fits_decode_budget(large_png, size, max_bytes=1_000_000)
+    grey = BytesIO(encode(picture(1000, 500, mode="L")))
+    assert fits_decode_budget(grey, size, max_bytes=500_000)
+
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 1000)
+    assert not fits_decode_budget(large_png, size, max_pixels=10**9)
+
+
+def test_limit_decodes(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(utils, "_DECODE_SEMAPHORE", None)
+    with decoding():
+        pass
+
+    limit_decodes(1)
+    semaphore = utils._DECODE_SEMAPHORE
+    assert semaphore is not None
+    with decoding():
+        # The only slot is taken
+        assert not semaphore.acquire(blocking=False)
+    assert semaphore.acquire(blocking=False)
+    semaphore.release()
+
+    limit_decodes(None)
+    assert utils._DECODE_SEMAPHORE is None
+
+
+def test_calculate_blurhash_draft(tmp_path: Path) -> None:
+    path = tmp_path / "image.jpg"
+    path.write_bytes(encode(picture(2000, 1500), "JPEG"))
+
+    blurhash = calculate_blurhash(path)
+    with path.open("rb") as file:
+        assert calculate_blurhash(file) == blurhash
+    with Image.open(path) as image:
+        assert calculate_blurhash(image, draft=False) == blurhash
+
+
+def test_calculate_blurhash_batch() -> None:
+    images = [
+        picture(64, 48, seed=0),
+        picture(200, 50, seed=1),
+        picture(64, 48, mode="L", seed=2),
+        picture(48, 64, mode="RGBA", seed=3),
+    ]
+
+    for adaptive in (False, True):
+        assert calculate_blurhash_batch(images, adaptive=adaptive) == [
+            calculate_blurhash(image, adaptive=adaptive) for image in images
+        ]
+    # Double precision, one image at a time
+    assert calculate_blurhash_batch(images, float32=False) == [
+        calculate_blurhash(image) for image in images
+    ]
+    assert calculate_blurhash_batch([]) == []
+
+
+def test_calculate_blurhash_batch_single_component() -> None:
+    # Only the average colour, no AC components
+    (blurhash,) = calculate_blurhash_batch([picture()], 1, 1)
+    assert blurhash == calculate_blurhash(picture(), 1, 1)
+    assert len(blurhash) == 6
+
+
+def test_calculate_blurhash_batch_dark() -> None:
+    from PIL import Image
+
+    # Dark colours are on the linear part of the sRGB curve
+    images = [Image.new("RGB", (32, 32), (1, 2, 3)), picture().point(lambda v: v // 32)]
+    assert calculate_blurhash_batch(images) == [
+        calculate_blurhash(image) for image in images
+    ]
+    # Round trips exactly
+    assert calculate_blurhash_batch(images[:1], 1, 1) == ["00" + _base83(0x010203, 4)]
+
+
+@pytest.mark.parametrize("components", [(1, 1), (4, 3), (4, 4), (9, 9)])
+def test_calculate_blurhash_float32(components: tuple[int, int]) -> None:
+    for seed in range(30):
+        image = picture(64 + seed, 48, mode="RGBA" if seed % 5 else "RGB", seed=seed)
+        assert calculate_blurhash(image, *components, float32=True) == (
+            calculate_blurhash(image, *components)
+        )
+
+
+def test_blurhash_basis() -> None:
+    basis = _blurhash_basis(128, 4)
+    assert basis.shape == (4, 128)
+    assert basis.dtype == np.float32
+    assert not basis.flags.writeable
+    assert _blurhash_basis(128, 4) is basis
+    np.testing.assert_allclose(basis[0], 1)
+    np.testing.assert_allclose(basis[1, 64], 0, atol=1e-6)
+
+
+def test_scratch_buffer() -> None:
+    buffer = _scratch_buffer((2, 8, 3))
+    assert buffer.shape == (2, 8, 3)
+    # Reused for smaller shapes, grown for larger ones
+    assert np.shares_memory(_scratch_buffer((4, 3)), buffer)
+    assert _scratch_buffer((4, 8, 3)).shape == (4, 8, 3)
+
+
+def _flip(value: int, bits: list[int]) -> int:
+    for bit in bits:
+        value ^= 1 << bit
+    return value
+
+
+def test_hamming_index_query() -> None:
+    rng = random.Random(42)
+    index = HammingIndex()
+    values = [rng.getrandbits(64) for _ in range(2000)]
+    for i, value in enumerate(values):
+        index.add(value, f"key{i}")
+    assert len(index) == len(values)
+
+    near = _flip(values[7], [0, 17, 40])
+    assert index.query(near, max_distance=3) == [("key7", 3)]
+    assert index.query(near, max_distance=2) == []
+    assert index.query(values[7], max_distance=0) == [("key7", 0)]
+
+
+def test_hamming_index_query_sorted_by_distance() -> None:
+    index = HammingIndex()
+    index.add(_flip(0, [1, 2, 3]), "far")
+    index.add(_flip(0, [1]), "near")
+    index.add(0, "same")
+
+    assert index.query(0, max_distance=8) == [("same", 0), ("near", 1), ("far", 3)]
+
+
+def test_hamming_index_grows() -> None:
+    index = HammingIndex(chunks=8)
+    for value in range(3000):
+        index.add(value << 20, str(value))
+
+    assert index.query(2999 << 20, max_distance=0) == [("2999", 0)]
+
+
+def test_hamming_index_invalid_chunks() -> None:
+    with pytest.raises(ValueError, match="chunks"):
+        HammingIndex(chunks=5)
+
+
+def test_hamming_index_persisted(tmp_path: Path) -> None:
+    path = tmp_path / "index" / "hashes.db"
+    index = HammingIndex.from_uri(f"sqlite:///{path}")
+    index.commit_interval = 2
+    # Hashes with the highest bit set don't fit SQLite's signed integers
+    index.add(1 << 63 | 5, "high")
+    index.add(5, "low")
+    index.add(6, "pending")
+    index.close()
+    index.close()
+
+    reopened = HammingIndex.from_uri(str(path))
+    assert len(reopened) == 3
+    assert reopened.query(1 << 63 | 5, max_distance=0) == [("high", 0)]
+    assert reopened.query(5, max_distance=1) == [("low", 0), ("high", 1)]
+    # Written on close, although fewer than `commit_interval`
+    assert reopened.query(6, max_distance=0) == [("pending", 0)]
+    reopened.close()
+
+
+def test_hamming_index_in_memory_close() -> None:
+    index = HammingIndex()
+    index.add(1, "one")
+    index.commit()
+    index.close()
+    assert index.path is None
+
+
+def test_hamming_index_invalid_uri() -> None:
+    with pytest.raises(ValueError, match="Unsupported"):
+        HammingIndex.from_uri("redis://localhost")
+
+
+def test_popcount_without_bitwise_count(monkeypatch: pytest.MonkeyPatch) -> None:
+    values = np.array([0, 1, 0xFF, 2**64 - 1], dtype=np.uint64)
+    expected = [0, 1, 8, 64]
+    assert _popcount(values).tolist() == expected
+
+    # NumPy < 2.0
+    monkeypatch.delattr(np, "bitwise_count", raising=False)
+    assert _popcount(values).tolist() == expected
+
+
+def test_blurhash_cache_key() -> None:
+    keys = {
+        BlurHashCache.key("abc", 4, 3),
+        BlurHashCache.key("abc", 3, 4),
+        BlurHashCache.key("abc", 4, 3, adaptive=True),
+        BlurHashCache.key("abc", 4, 3, float32=True),
+        BlurHashCache.key("abc", 4, 3, adaptive=True, float32=True),
+    }
+    assert len(keys) == 5
+    assert BlurHashCache.key("abc", 4, 3) == "abc:4x3"
+
+
+def test_blurhash_cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    clock = iter(range(100))
+    monkeypatch.setattr("scrapy_extensions.utils.time.time", lambda: next(clock))
+    path = tmp_path / "cache" / "blurhash.db"
+    cache = BlurHashCache.from_uri(f"sqlite:///{path}", max_entries=2)
+    cache.commit_interval = 3
+
+    cache.set("one", "LEHV6nWB2yk8")
+    cache.set("two", "L6PZfSi_.AyE")
+    assert cache.get("one") == "LEHV6nWB2yk8"  # Commits, but nothing to evict
+    cache.set("three", "LKO2?U%2Tw=w")
+    assert cache.get("missing") is None
+    cache.close()
+
+    # "two" was the least recently used entry
+    reopened = BlurHashCache.from_uri(str(path))
+    assert reopened.get("one") == "LEHV6nWB2yk8"
+    assert reopened.get("two") is None
+    assert reopened.get("three") == "LKO2?U%2Tw=w"
+    assert reopened.evict() == 0
+    reopened.close()
+
+
+def test_blurhash_cache_invalid_uri() -> None:
+    with pytest.raises(ValueError, match="Unsupported"):
+        BlurHashCache.from_uri("redis://localhost")